@@ -0,0 +1,534 @@
+# benchmarks/MockNepseServer.py
+"""Local stand-in for nepalstock.com used by the offline benchmarks
+
+Emulates the token handshake (salts + obfuscated tokens decoded by the bundled
+css.wasm), the paginated floorsheet and today-price endpoints, the security and
+company lists, the graph/list endpoints and company news/reports with their
+attachments, with configurable latency and error injection.
+"""
+
+import gzip
+import hashlib
+import json
+import random
+import string
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from nepse_scraper.TokenUtils import TokenParser
+
+SECTORS = [
+    "Commercial Banks",
+    "Development Banks",
+    "Finance",
+    "Hotels And Tourism",
+    "Hydro Power",
+    "Investment",
+    "Life Insurance",
+    "Manufacturing And Processing",
+    "Microfinance",
+    "Mutual Fund",
+    "Non Life Insurance",
+    "Others",
+    "Tradings",
+]
+
+INDEX_IDS = (51, 52, 53, 54, 55, 56, 57, 58, 59, 60, 61, 62, 63, 64, 65, 66, 67)
+
+
+class MockNepseData:
+    """Deterministic synthetic market for a single business day"""
+
+    def __init__(self, securities=300, floorsheet_records=20000, seed=7):
+        self.random = random.Random(seed)
+        self.business_date = date.today()
+
+        self.securities = []
+        self.companies = []
+        for index in range(securities):
+            security_id = 100 + index
+            symbol = "".join(self.random.choices(string.ascii_uppercase, k=4))
+            symbol = f"{symbol}{index}"
+            self.securities.append(
+                {
+                    "id": security_id,
+                    "symbol": symbol,
+                    "securityName": f"{symbol} Limited",
+                    "name": f"{symbol} Limited",
+                    "activeStatus": "A",
+                }
+            )
+            self.companies.append(
+                {
+                    "id": 1000 + index,
+                    "companyName": f"{symbol} Limited",
+                    "symbol": symbol,
+                    "securityName": f"{symbol} Limited",
+                    "status": "A",
+                    "sectorName": SECTORS[index % len(SECTORS)],
+                    "instrumentType": "Equity",
+                }
+            )
+        self.security_by_id = {s["id"]: s for s in self.securities}
+        self.base_price = {
+            s["id"]: round(self.random.uniform(100, 2000), 1) for s in self.securities
+        }
+
+        self.floorsheet = self._buildFloorSheet(floorsheet_records)
+        self.files = {}
+        self.news = [
+            self.newsItem(s["id"], 50000 + index)
+            for index, s in enumerate(self.securities[::5])
+        ]
+        self.reports = {
+            s["id"]: [self.report(s["id"], quarter) for quarter in (1, 2)]
+            for s in self.securities
+        }
+        self.floorsheet_by_security = {}
+        for record in self.floorsheet:
+            self.floorsheet_by_security.setdefault(record["stockId"], []).append(record)
+
+    def _buildFloorSheet(self, count):
+        records = []
+        opening = datetime.combine(self.business_date, datetime.min.time()).replace(
+            hour=11
+        )
+        for offset in range(count):
+            security = self.securities[self.random.randrange(len(self.securities))]
+            rate = round(
+                self.base_price[security["id"]] * self.random.uniform(0.97, 1.03), 1
+            )
+            quantity = self.random.randint(10, 5000)
+            trade_time = opening + timedelta(milliseconds=offset * 700)
+            records.append(
+                {
+                    "id": None,
+                    "contractId": 2026000000000 + count - offset,
+                    "contractType": None,
+                    "stockSymbol": security["symbol"],
+                    "buyerMemberId": f"{self.random.randint(1, 90)}",
+                    "sellerMemberId": f"{self.random.randint(1, 90)}",
+                    "contractQuantity": quantity,
+                    "contractRate": rate,
+                    "contractAmount": round(rate * quantity, 2),
+                    "businessDate": f"{self.business_date}",
+                    "tradeBookId": 100000 + offset,
+                    "stockId": security["id"],
+                    "buyerBrokerName": "Mock Broker",
+                    "sellerBrokerName": "Mock Broker",
+                    "tradeTime": trade_time.isoformat(timespec="milliseconds"),
+                    "securityName": security["securityName"],
+                }
+            )
+        return records
+
+    def _document(self, kind, entry_id):
+        file_path = f"/{kind}/{self.business_date}/{entry_id}.pdf"
+        self.files[file_path] = f"%PDF-1.4 mock {file_path}\n".encode() * 2048
+        return {"id": entry_id, "filePath": file_path, "encryptedId": None}
+
+    def newsItem(self, security_id, news_id):
+        return {
+            "id": news_id,
+            "newsHeadline": f"Notice {news_id}",
+            "newsBody": f"Announcement of security {security_id}",
+            "securityId": security_id,
+            "addedDate": f"{self.business_date}",
+            "modifiedDate": f"{self.business_date}",
+            "applicationDocumentDetailsList": [self._document("news", news_id)],
+        }
+
+    def report(self, security_id, quarter):
+        report_id = security_id * 100 + quarter
+        return {
+            "id": report_id,
+            "fiscalReport": {"quarterMaster": {"quarterName": f"Q{quarter}"}},
+            "modifiedDate": f"{self.business_date}",
+            "applicationDocumentDetailsList": [self._document("reports", report_id)],
+        }
+
+    def todayPrices(self):
+        prices = []
+        for security in self.securities:
+            base = self.base_price[security["id"]]
+            prices.append(
+                {
+                    "id": security["id"],
+                    "businessDate": f"{self.business_date}",
+                    "securityId": security["id"],
+                    "symbol": security["symbol"],
+                    "securityName": security["securityName"],
+                    "openPrice": base,
+                    "highPrice": round(base * 1.02, 1),
+                    "lowPrice": round(base * 0.98, 1),
+                    "closePrice": round(base * 1.01, 1),
+                    "totalTradedQuantity": 10000,
+                    "totalTradedValue": round(base * 10000, 2),
+                    "previousDayClosePrice": base,
+                    "totalTrades": 100,
+                    "lastUpdatedPrice": round(base * 1.01, 1),
+                }
+            )
+        return prices
+
+    def priceHistory(self, security_id, start_date, end_date):
+        base = self.base_price[security_id]
+        rows = []
+        day = end_date
+        while day >= start_date:
+            if day.weekday() not in (4, 5):
+                drift = 1 + ((day.toordinal() * 7919 + security_id) % 200 - 100) / 2000
+                close = round(base * drift, 1)
+                rows.append(
+                    {
+                        "businessDate": f"{day}",
+                        "totalTrades": 100,
+                        "totalTradedQuantity": 10000,
+                        "totalTradedValue": round(close * 10000, 2),
+                        "highPrice": round(close * 1.02, 1),
+                        "lowPrice": round(close * 0.98, 1),
+                        "closePrice": close,
+                    }
+                )
+            day -= timedelta(days=1)
+        return rows
+
+    def indexGraph(self, index_id):
+        opening = int(
+            datetime.combine(self.business_date, datetime.min.time())
+            .replace(hour=11)
+            .timestamp()
+        )
+        return [
+            [opening + minute * 60, round(2000 + index_id + minute * 0.25, 2)]
+            for minute in range(240)
+        ]
+
+    def marketDepth(self, security_id):
+        base = self.base_price[security_id]
+
+        def levels(is_buy):
+            step = -0.1 if is_buy else 0.1
+            return [
+                {
+                    "stockId": security_id,
+                    "orderBookOrderPrice": round(base + step * (level + 1), 1),
+                    "quantity": 100 * (level + 1),
+                    "orderCount": level + 1,
+                    "isBuy": 1 if is_buy else 2,
+                    "buyQuantity": 0,
+                    "sellQuantity": 0,
+                }
+                for level in range(5)
+            ]
+
+        return {
+            "totalBuyQty": 1500,
+            "marketDepth": {
+                "buyMarketDepthList": levels(True),
+                "sellMarketDepthList": levels(False),
+            },
+            "totalSellQty": 1500,
+        }
+
+
+def _paged(content, page, size, total_key=None):
+    total_pages = max(1, -(-len(content) // size))
+    body = {
+        "content": content[page * size : (page + 1) * size],
+        "pageable": {"pageNumber": page, "pageSize": size},
+        "totalElements": len(content),
+        "totalPages": total_pages,
+        "last": page >= total_pages - 1,
+        "number": page,
+        "size": size,
+        "first": page == 0,
+    }
+    return {total_key: body} if total_key else body
+
+
+class MockNepseServer:
+    """Threaded HTTP server emulating the NEPSE api surface used by NepseScraper
+
+    latency_ms/jitter_ms delay every response, error_rate injects 502 responses
+    and drop_rate closes the connection without responding. max_page_size caps
+    the `size` query parameter the same way the real server clamps it. With
+    etags every 200 response carries an ETag and matching If-None-Match
+    requests are answered with 304. With compress bodies above 1KB are gzip
+    encoded for clients that accept it.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency_ms=0,
+        jitter_ms=0,
+        error_rate=0.0,
+        drop_rate=0.0,
+        max_page_size=500,
+        token_ttl=45,
+        etags=True,
+        compress=True,
+        securities=300,
+        floorsheet_records=20000,
+        seed=7,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.max_page_size = max_page_size
+        self.token_ttl = token_ttl
+        self.etags = etags
+        self.compress = compress
+        self.data = MockNepseData(securities, floorsheet_records, seed)
+        self.token_parser = TokenParser()
+        self.random = random.Random(seed)
+        self.valid_tokens = {}
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handlerClass())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def attach(self, scraper):
+        """Point an existing NepseScraper at this server"""
+        scraper.setBaseURL(self.url)
+        return scraper
+
+    ############################################### TOKEN FLOW ###############################################
+    def issueToken(self):
+        salts = [self.random.randint(1000, 99999) for _ in range(5)]
+        response = {f"salt{index + 1}": salt for index, salt in enumerate(salts)}
+        alphabet = string.ascii_letters + string.digits
+        response["accessToken"] = "".join(self.random.choices(alphabet, k=240))
+        response["refreshToken"] = "".join(self.random.choices(alphabet, k=240))
+        response["serverTime"] = int(time.time() * 1000)
+        response["isDisplayActive"] = False
+        response["popupDocFor"] = "ALL"
+
+        access_token, _ = self.token_parser.parse_token_response(response)
+        with self._lock:
+            self.valid_tokens[access_token] = time.time() + self.token_ttl
+        return response
+
+    def isAuthorized(self, authorization):
+        if not authorization or not authorization.startswith("Salter "):
+            return False
+        expiry = self.valid_tokens.get(authorization[len("Salter ") :])
+        return expiry is not None and expiry > time.time()
+
+    ############################################### ROUTING ###############################################
+    def route(self, method, path, query, authorization):
+        """Return (status, body) for a request; body is JSON serialisable"""
+        data = self.data
+        if path == "/api/authenticate/prove":
+            return 200, self.issueToken()
+
+        if not self.isAuthorized(authorization):
+            return 401, {"message": "Unauthorized"}
+
+        size = min(int(query.get("size", ["500"])[0]), self.max_page_size)
+        page = int(query.get("page", ["0"])[0])
+        segments = path.rstrip("/").split("/")
+        tail = segments[-1]
+
+        if path == "/api/nots/nepse-data/market-open":
+            return 200, {
+                "isOpen": "OPEN",
+                "asOf": datetime.now().replace(microsecond=0).isoformat(),
+                "id": 42,
+            }
+        if path == "/api/nots/company/list":
+            return 200, data.companies
+        if path == "/api/nots/security":
+            return 200, data.securities
+        if path == "/api/nots/nepse-data/floorsheet":
+            return 200, _paged(data.floorsheet, page, size, "floorsheets")
+        if path.startswith("/api/nots/security/floorsheet/"):
+            records = data.floorsheet_by_security.get(int(tail), [])
+            if not records:
+                return 200, None
+            return 200, _paged(records, page, size, "floorsheets")
+        if path == "/api/nots/nepse-data/today-price":
+            return 200, _paged(data.todayPrices(), page, size)
+        if path.startswith("/api/nots/market/history/security/"):
+            end_date = date.fromisoformat(query.get("endDate", [f"{date.today()}"])[0])
+            start_date = date.fromisoformat(
+                query.get("startDate", [f"{end_date - timedelta(days=365)}"])[0]
+            )
+            return 200, _paged(
+                data.priceHistory(int(tail), start_date, end_date), page, size
+            )
+        if path.startswith("/api/nots/graph/index/"):
+            return 200, data.indexGraph(int(tail))
+        if path.startswith("/api/nots/market/graphdata/daily/"):
+            base = data.base_price[int(tail)]
+            return 200, [
+                {"time": point[0], "contractRate": round(base + point[1] % 7, 1)}
+                for point in data.indexGraph(0)
+            ]
+        if path.rstrip("/") == "/api/nots/news/media/company-news":
+            return 200, data.news
+        if path.startswith("/api/nots/application/reports/"):
+            return 200, data.reports.get(int(tail), [])
+        if path == "/api/nots/security/fetchFiles":
+            content = data.files.get(query.get("fileLocation", [""])[0])
+            if content is None:
+                return 404, {"message": "Not Found"}
+            return 200, content
+        if path.startswith("/api/nots/nepse-data/marketdepth/"):
+            return 200, data.marketDepth(int(tail))
+        if path.startswith("/api/nots/security/") and tail.isdigit():
+            security = data.security_by_id.get(int(tail))
+            if security is None:
+                return 400, {"message": "Bad Request"}
+            return 200, {
+                "securityDailyTradeDto": data.todayPrices()[int(tail) - 100],
+                "security": security,
+            }
+        if path == "/api/nots/lives-market":
+            return 200, [
+                {
+                    "securityId": row["securityId"],
+                    "symbol": row["symbol"],
+                    "lastTradedPrice": row["closePrice"],
+                    "totalTradeQuantity": row["totalTradedQuantity"],
+                    "percentageChange": 1.0,
+                    "lastUpdatedDateTime": datetime.now().isoformat(),
+                }
+                for row in data.todayPrices()
+            ]
+        if path == "/api/nots/nepse-index" or path == "/api/nots":
+            return 200, [
+                {
+                    "id": index_id,
+                    "index": f"Index {index_id}",
+                    "close": 2000.0 + index_id,
+                    "currentValue": 2001.0 + index_id,
+                    "change": 1.0,
+                    "perChange": 0.05,
+                }
+                for index_id in INDEX_IDS
+            ]
+        if path.startswith("/api/nots/"):
+            return 200, []
+        return 404, {"message": "Not Found"}
+
+    def _handlerClass(server):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self, method):
+                with server._lock:
+                    server.request_count += 1
+
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+
+                delay = server.latency_ms + server.random.uniform(0, server.jitter_ms)
+                if delay:
+                    time.sleep(delay / 1000)
+
+                if server.drop_rate and server.random.random() < server.drop_rate:
+                    self.close_connection = True
+                    self.connection.shutdown(2)
+                    return
+
+                if server.error_rate and server.random.random() < server.error_rate:
+                    status, body = 502, {"message": "Bad Gateway"}
+                else:
+                    parts = urlsplit(self.path)
+                    status, body = server.route(
+                        method,
+                        parts.path,
+                        parse_qs(parts.query, keep_blank_values=True),
+                        self.headers.get("Authorization"),
+                    )
+
+                content_type = "application/json"
+                if isinstance(body, bytes):
+                    encoded, content_type = body, "application/pdf"
+                else:
+                    encoded = json.dumps(body).encode()
+                etag = None
+                if server.etags and status == 200:
+                    etag = f'"{hashlib.sha1(encoded).hexdigest()}"'
+                    if self.headers.get("If-None-Match") == etag:
+                        status, encoded = 304, b""
+                content_encoding = None
+                if (
+                    server.compress
+                    and len(encoded) > 1024
+                    and "gzip" in self.headers.get("Accept-Encoding", "")
+                ):
+                    encoded = gzip.compress(encoded, compresslevel=5)
+                    content_encoding = "gzip"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                if etag:
+                    self.send_header("ETag", etag)
+                if content_encoding:
+                    self.send_header("Content-Encoding", content_encoding)
+                self.send_header("Content-Length", f"{len(encoded)}")
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="mock nepalstock.com server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--floorsheet-records", type=int, default=20000)
+    args = parser.parse_args()
+
+    mock = MockNepseServer(
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        floorsheet_records=args.floorsheet_records,
+    )
+    print(f"serving mock NEPSE api at {mock.url}")
+    mock.httpd.serve_forever()
@@ -0,0 +1,283 @@
+# nepse_scraper/AnalyticsUtils.py
+
+import numpy as np
+
+from nepse_scraper.RecordUtils import floorSheetRecords
+
+
+def floorSheetColumns(records):
+    """Convert floorsheet record dicts into a dict of NumPy columns
+
+    `records` may be a list of records, a page yielded by iterFloorSheetPages or
+    a getFloorSheet/getFloorSheetOf result.
+    """
+    records = floorSheetRecords(records)
+    return {
+        "contract_id": np.fromiter(
+            (r["contractId"] for r in records), np.int64, len(records)
+        ),
+        "symbol": np.array([r["stockSymbol"] for r in records], dtype=object),
+        "buyer": np.fromiter(
+            (int(r["buyerMemberId"]) for r in records), np.int32, len(records)
+        ),
+        "seller": np.fromiter(
+            (int(r["sellerMemberId"]) for r in records), np.int32, len(records)
+        ),
+        "quantity": np.fromiter(
+            (r["contractQuantity"] for r in records), np.float64, len(records)
+        ),
+        "rate": np.fromiter(
+            (r["contractRate"] for r in records), np.float64, len(records)
+        ),
+        "trade_time": np.array(
+            [r.get("tradeTime") or "NaT" for r in records], dtype="datetime64[ms]"
+        ),
+    }
+
+
+def _grow(array, size):
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
+
+
+class FloorSheetAnalytics:
+    """Incremental VWAP, broker flow and OHLC aggregates over floorsheet pages
+
+    Pages can be fed in any order as they arrive; contracts already seen are
+    skipped. Per-symbol and per-broker sums are maintained with bincount on every
+    update, so `vwap` and `brokerFlows` are O(symbols)/O(brokers). Trades are kept
+    in growable columns for `ohlcBars` and symbol filtered flows.
+    """
+
+    def __init__(self, capacity=1 << 16):
+        self.size = 0
+        self.symbol_codes = {}
+        self.symbols = []
+        self.contract_ids = set()
+
+        self.contract_id = np.zeros(capacity, np.int64)
+        self.symbol = np.zeros(capacity, np.int32)
+        self.buyer = np.zeros(capacity, np.int32)
+        self.seller = np.zeros(capacity, np.int32)
+        self.quantity = np.zeros(capacity, np.float64)
+        self.rate = np.zeros(capacity, np.float64)
+        self.trade_time = np.zeros(capacity, "datetime64[ms]")
+
+        self.symbol_quantity = np.zeros(0, np.float64)
+        self.symbol_amount = np.zeros(0, np.float64)
+        self.symbol_trades = np.zeros(0, np.int64)
+        self.broker_buy_quantity = np.zeros(0, np.float64)
+        self.broker_buy_amount = np.zeros(0, np.float64)
+        self.broker_sell_quantity = np.zeros(0, np.float64)
+        self.broker_sell_amount = np.zeros(0, np.float64)
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return f"<FloorSheetAnalytics: {self.size} trades, {len(self.symbols)} symbols>"
+
+    ############################################### INGESTION ###############################################
+    def update(self, records):
+        """Add floorsheet records (list, page or result dict); returns trades added"""
+        return self.updateColumns(floorSheetColumns(records))
+
+    def updateColumns(self, columns):
+        """Add trades given as columns (see floorSheetColumns)"""
+        contract_ids = columns["contract_id"]
+        fresh = np.fromiter(
+            (int(c) not in self.contract_ids for c in contract_ids),
+            bool,
+            len(contract_ids),
+        )
+        # duplicates inside the same batch
+        _, first_index = np.unique(contract_ids, return_index=True)
+        unique_mask = np.zeros(len(contract_ids), bool)
+        unique_mask[first_index] = True
+        keep = fresh & unique_mask
+        if not keep.any():
+            return 0
+
+        count = int(keep.sum())
+        self.contract_ids.update(contract_ids[keep].tolist())
+
+        symbol_codes = np.fromiter(
+            (self._symbolCode(symbol) for symbol in columns["symbol"][keep]),
+            np.int32,
+            count,
+        )
+        buyer = columns["buyer"][keep]
+        seller = columns["seller"][keep]
+        quantity = columns["quantity"][keep]
+        rate = columns["rate"][keep]
+        amount = quantity * rate
+
+        start, end = self.size, self.size + count
+        for name, values in (
+            ("contract_id", contract_ids[keep]),
+            ("symbol", symbol_codes),
+            ("buyer", buyer),
+            ("seller", seller),
+            ("quantity", quantity),
+            ("rate", rate),
+            ("trade_time", columns["trade_time"][keep]),
+        ):
+            column = _grow(getattr(self, name), end)
+            column[start:end] = values
+            setattr(self, name, column)
+        self.size = end
+
+        symbol_count = len(self.symbols)
+        self.symbol_quantity = self._accumulate(
+            self.symbol_quantity, symbol_codes, quantity, symbol_count
+        )
+        self.symbol_amount = self._accumulate(
+            self.symbol_amount, symbol_codes, amount, symbol_count
+        )
+        self.symbol_trades = self._accumulate(
+            self.symbol_trades, symbol_codes, None, symbol_count
+        )
+
+        broker_count = int(max(buyer.max(), seller.max())) + 1
+        self.broker_buy_quantity = self._accumulate(
+            self.broker_buy_quantity, buyer, quantity, broker_count
+        )
+        self.broker_buy_amount = self._accumulate(
+            self.broker_buy_amount, buyer, amount, broker_count
+        )
+        self.broker_sell_quantity = self._accumulate(
+            self.broker_sell_quantity, seller, quantity, broker_count
+        )
+        self.broker_sell_amount = self._accumulate(
+            self.broker_sell_amount, seller, amount, broker_count
+        )
+        return count
+
+    def _symbolCode(self, symbol):
+        code = self.symbol_codes.get(symbol)
+        if code is None:
+            code = self.symbol_codes[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return code
+
+    @staticmethod
+    def _accumulate(totals, codes, weights, length):
+        length = max(length, len(totals))
+        increment = np.bincount(codes, weights=weights, minlength=length)
+        if len(totals) < length:
+            totals = np.concatenate(
+                [totals, np.zeros(length - len(totals), totals.dtype)]
+            )
+        totals += increment.astype(totals.dtype, copy=False)
+        return totals
+
+    ############################################### AGGREGATES ###############################################
+    def vwap(self, symbol=None):
+        """Volume weighted average price per symbol (or for one symbol)"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            vwap = self.symbol_amount / self.symbol_quantity
+        if symbol is not None:
+            code = self.symbol_codes.get(symbol.upper())
+            return None if code is None else float(vwap[code])
+        return dict(zip(self.symbols, vwap.tolist()))
+
+    def symbolTotals(self):
+        """Traded quantity, turnover and trade count per symbol"""
+        return {
+            symbol: {
+                "quantity": float(self.symbol_quantity[code]),
+                "amount": float(self.symbol_amount[code]),
+                "trades": int(self.symbol_trades[code]),
+            }
+            for code, symbol in enumerate(self.symbols)
+        }
+
+    def brokerFlows(self, symbol=None):
+        """Per-broker buy/sell quantity and amount, optionally for a single symbol"""
+        if symbol is None:
+            buy_quantity = self.broker_buy_quantity
+            buy_amount = self.broker_buy_amount
+            sell_quantity = self.broker_sell_quantity
+            sell_amount = self.broker_sell_amount
+        else:
+            code = self.symbol_codes.get(symbol.upper())
+            if code is None:
+                return {}
+            mask = self.symbol[: self.size] == code
+            buyer = self.buyer[: self.size][mask]
+            seller = self.seller[: self.size][mask]
+            quantity = self.quantity[: self.size][mask]
+            amount = quantity * self.rate[: self.size][mask]
+            length = len(self.broker_buy_quantity)
+            buy_quantity = np.bincount(buyer, quantity, length)
+            buy_amount = np.bincount(buyer, amount, length)
+            sell_quantity = np.bincount(seller, quantity, length)
+            sell_amount = np.bincount(seller, amount, length)
+
+        active = np.flatnonzero((buy_quantity > 0) | (sell_quantity > 0))
+        return {
+            int(broker): {
+                "buy_quantity": float(buy_quantity[broker]),
+                "sell_quantity": float(sell_quantity[broker]),
+                "buy_amount": float(buy_amount[broker]),
+                "sell_amount": float(sell_amount[broker]),
+                "net_quantity": float(buy_quantity[broker] - sell_quantity[broker]),
+                "net_amount": float(buy_amount[broker] - sell_amount[broker]),
+            }
+            for broker in active
+        }
+
+    def ohlcBars(self, symbol=None, interval_seconds=60):
+        """Intraday OHLCV bars
+
+        Returns a dict of equal length arrays: symbol, time (bar start), open,
+        high, low, close, volume, turnover and trades, sorted by symbol then time.
+        """
+        n = self.size
+        symbol_codes = self.symbol[:n]
+        trade_time = self.trade_time[:n].astype(np.int64)
+        mask = trade_time != np.iinfo(np.int64).min
+        if symbol is not None:
+            code = self.symbol_codes.get(symbol.upper())
+            mask &= symbol_codes == (-1 if code is None else code)
+
+        index = np.flatnonzero(mask)
+        interval_ms = int(interval_seconds * 1000)
+        bar = trade_time[index] // interval_ms
+        # sort by symbol, bar and trade time; contract id breaks ties
+        order = np.lexsort(
+            (self.contract_id[index], trade_time[index], bar, symbol_codes[index])
+        )
+        index, bar = index[order], bar[order]
+        codes = symbol_codes[index]
+
+        boundary = np.ones(len(index), bool)
+        boundary[1:] = (codes[1:] != codes[:-1]) | (bar[1:] != bar[:-1])
+        starts = np.flatnonzero(boundary)
+        if not len(starts):
+            empty = np.zeros(0)
+            return {
+                "symbol": np.zeros(0, object),
+                "time": np.zeros(0, "datetime64[ms]"),
+                **{k: empty for k in ("open", "high", "low", "close", "volume")},
+                "turnover": empty,
+                "trades": np.zeros(0, np.int64),
+            }
+        ends = np.append(starts[1:], len(index)) - 1
+
+        rate = self.rate[index]
+        quantity = self.quantity[index]
+        return {
+            "symbol": np.array(self.symbols, dtype=object)[codes[starts]],
+            "time": (bar[starts] * interval_ms).astype("datetime64[ms]"),
+            "open": rate[starts],
+            "high": np.maximum.reduceat(rate, starts),
+            "low": np.minimum.reduceat(rate, starts),
+            "close": rate[ends],
+            "volume": np.add.reduceat(quantity, starts),
+            "turnover": np.add.reduceat(quantity * rate, starts),
+            "trades": np.diff(np.append(starts, len(index))),
+        }
@@ -0,0 +1,395 @@
+# nepse_scraper/ArchiveUtils.py
+
+import json
+import os
+
+import numpy as np
+
+from nepse_scraper.RecordUtils import floorSheetRecords
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("contract_id", "<i8"),
+        ("business_date", "<M8[D]"),
+        ("trade_time", "<M8[ms]"),
+        ("security_id", "<i4"),
+        ("buyer", "<i2"),
+        ("seller", "<i2"),
+        ("quantity", "<f8"),
+        ("rate", "<f8"),
+        ("amount", "<f8"),
+    ]
+)
+INDEX_DTYPE = np.dtype(
+    [
+        ("business_date", "<M8[D]"),
+        ("security_id", "<i4"),
+        ("start", "<i8"),
+        ("stop", "<i8"),
+    ]
+)
+ARCHIVE_VERSION = 2
+
+
+def _date(value):
+    return None if value is None else np.datetime64(f"{value}", "D")
+
+
+def _sortRows(rows):
+    order = np.lexsort(
+        (
+            rows["contract_id"],
+            rows["trade_time"],
+            rows["security_id"],
+            rows["business_date"],
+        )
+    )
+    return rows[order]
+
+
+def _groups(rows, offset):
+    """Index entries of sorted rows written at row `offset`"""
+    boundaries = np.flatnonzero(
+        (rows["business_date"][1:] != rows["business_date"][:-1])
+        | (rows["security_id"][1:] != rows["security_id"][:-1])
+    )
+    starts = np.concatenate([[0], boundaries + 1])
+    stops = np.concatenate([boundaries + 1, [len(rows)]])
+    groups = np.zeros(len(starts), INDEX_DTYPE)
+    groups["business_date"] = rows["business_date"][starts]
+    groups["security_id"] = rows["security_id"][starts]
+    groups["start"] = starts + offset
+    groups["stop"] = stops + offset
+    return groups
+
+
+def _appendFile(path, content):
+    with open(path, "ab") as append_file:
+        append_file.write(content)
+        append_file.flush()
+        os.fsync(append_file.fileno())
+
+
+def _replace(path, write):
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as temporary_file:
+        write(temporary_file)
+        temporary_file.flush()
+        os.fsync(temporary_file.fileno())
+    os.replace(temporary_path, path)
+
+
+class FloorSheetArchive:
+    """Append-only floorsheet archive of fixed-width rows read through a memmap
+
+    `directory` holds floorsheet.<generation>.bin (RECORD_DTYPE rows),
+    index.<generation>.bin (INDEX_DTYPE entries, the row range of every
+    (business_date, security_id) group) and archive.json with the committed row
+    count, generation and security id to symbol map. An append writes its rows
+    sorted by date, security and trade time, so the rows of a date range are one
+    slice of the memmap; `compact` merges the groups that page by page appends
+    split up.
+
+    Both .bin files only ever grow by an append, and the contract ids of every
+    date an append touched are kept in memory for deduplication, so archiving a
+    day page by page costs time proportional to the pages, not to the day so far.
+
+    archive.json is replaced last, so rows and index entries of an interrupted
+    append are never visible and are truncated when the archive is opened again.
+    """
+
+    META_FILE = "archive.json"
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.rows = 0
+        self.generation = 0
+        self.symbols = {}
+        self._index = np.zeros(256, INDEX_DTYPE)
+        self._groups = 0
+        self._contract_ids = {}
+        self._records = None
+
+        if os.path.exists(self._path(self.META_FILE)):
+            self._load()
+        self._truncate()
+
+    def __len__(self):
+        return self.rows
+
+    def __repr__(self):
+        return (
+            f"<FloorSheetArchive: {self.directory}, {self.rows} rows, "
+            f"{len(self.dates())} dates>"
+        )
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _dataPath(self, generation=None):
+        generation = self.generation if generation is None else generation
+        return self._path(f"floorsheet.{generation}.bin")
+
+    def _indexPath(self, generation=None):
+        generation = self.generation if generation is None else generation
+        return self._path(f"index.{generation}.bin")
+
+    @property
+    def index(self):
+        """INDEX_DTYPE entries of the committed groups, in append order"""
+        return self._index[: self._groups]
+
+    def _setIndex(self, index):
+        self._index = np.zeros(max(256, 2 * len(index)), INDEX_DTYPE)
+        self._index[: len(index)] = index
+        self._groups = len(index)
+
+    def _appendIndex(self, groups):
+        count = self._groups + len(groups)
+        if count > len(self._index):
+            grown = np.zeros(2 * count, INDEX_DTYPE)
+            grown[: self._groups] = self.index
+            self._index = grown
+        self._index[self._groups : count] = groups
+        self._groups = count
+
+    ############################################### PERSISTENCE ###############################################
+    def _load(self):
+        with open(self._path(self.META_FILE), "r") as meta_file:
+            meta = json.load(meta_file)
+        if meta["version"] != ARCHIVE_VERSION:
+            raise ValueError(
+                f"{self.directory} is archive version {meta['version']}, "
+                f"expected {ARCHIVE_VERSION}"
+            )
+        self.rows = meta["rows"]
+        self.generation = meta["generation"]
+        self.symbols = {int(k): v for k, v in meta["symbols"].items()}
+        index_path = self._indexPath()
+        entries = os.path.getsize(index_path) // INDEX_DTYPE.itemsize
+        index = np.fromfile(index_path, INDEX_DTYPE, count=entries)
+        # entries are appended in row order, the committed ones are a prefix
+        self._setIndex(index[: np.searchsorted(index["stop"], self.rows, "right")])
+
+    def _truncate(self):
+        for path, size in (
+            (self._dataPath(), self.rows * RECORD_DTYPE.itemsize),
+            (self._indexPath(), self._groups * INDEX_DTYPE.itemsize),
+        ):
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _commit(self, rows, groups):
+        _appendFile(self._dataPath(), rows.tobytes())
+        _appendFile(self._indexPath(), groups.tobytes())
+        self._writeMeta(self.rows + len(rows), self.generation)
+        self.rows += len(rows)
+        self._appendIndex(groups)
+        self._records = None
+
+    def _writeMeta(self, rows, generation):
+        meta = {
+            "version": ARCHIVE_VERSION,
+            "rows": rows,
+            "generation": generation,
+            "symbols": {f"{k}": v for k, v in self.symbols.items()},
+        }
+        _replace(
+            self._path(self.META_FILE), lambda f: f.write(json.dumps(meta).encode())
+        )
+
+    ############################################### INGESTION ###############################################
+    def append(self, records):
+        """Archive floorsheet records (list, page or result dict); returns rows added
+
+        Contracts that are already archived are skipped, so re-appending a
+        partially archived day only adds the missing trades.
+        """
+        records = floorSheetRecords(records)
+        if not records:
+            return 0
+        count = len(records)
+        rows = np.zeros(count, RECORD_DTYPE)
+        rows["contract_id"] = np.fromiter(
+            (r["contractId"] for r in records), np.int64, count
+        )
+        rows["business_date"] = np.array(
+            [r["businessDate"] for r in records], "datetime64[D]"
+        )
+        rows["trade_time"] = np.array(
+            [r.get("tradeTime") or "NaT" for r in records], "datetime64[ms]"
+        )
+        rows["security_id"] = np.fromiter(
+            (r["stockId"] for r in records), np.int32, count
+        )
+        rows["buyer"] = np.fromiter(
+            (int(r["buyerMemberId"]) for r in records), np.int16, count
+        )
+        rows["seller"] = np.fromiter(
+            (int(r["sellerMemberId"]) for r in records), np.int16, count
+        )
+        rows["quantity"] = np.fromiter(
+            (r["contractQuantity"] for r in records), np.float64, count
+        )
+        rows["rate"] = np.fromiter(
+            (r["contractRate"] for r in records), np.float64, count
+        )
+        rows["amount"] = np.fromiter(
+            (
+                r.get("contractAmount") or r["contractQuantity"] * r["contractRate"]
+                for r in records
+            ),
+            np.float64,
+            count,
+        )
+        for record in records:
+            self.symbols.setdefault(int(record["stockId"]), record["stockSymbol"])
+
+        _, first_index = np.unique(rows["contract_id"], return_index=True)
+        rows = rows[np.sort(first_index)]
+        archived = set()
+        for business_date in np.unique(rows["business_date"]):
+            archived |= self._archivedContracts(business_date)
+        if archived:
+            fresh = np.fromiter(
+                (c not in archived for c in rows["contract_id"].tolist()),
+                bool,
+                len(rows),
+            )
+            rows = rows[fresh]
+        if not len(rows):
+            return 0
+
+        rows = _sortRows(rows)
+        self._commit(rows, _groups(rows, self.rows))
+        for business_date in np.unique(rows["business_date"]):
+            on_date = rows["contract_id"][rows["business_date"] == business_date]
+            self._contract_ids[business_date].update(on_date.tolist())
+        return len(rows)
+
+    def _archivedContracts(self, business_date):
+        """Contract ids archived for a date, read from the rows once per date"""
+        contract_ids = self._contract_ids.get(business_date)
+        if contract_ids is None:
+            archived = self.select(business_date, business_date)
+            contract_ids = self._contract_ids[business_date] = set(
+                archived["contract_id"].tolist()
+            )
+        return contract_ids
+
+    def compact(self):
+        """Rewrite the rows in (date, security, trade time) order
+
+        Afterwards every (business_date, security_id) group is a single slice.
+        The rewrite goes into the next generation's files one date at a time and
+        only becomes visible when archive.json is replaced.
+        """
+        if not self.rows:
+            return
+        generation = self.generation + 1
+        groups = []
+        offset = 0
+        with open(self._dataPath(generation), "wb") as data_file:
+            for business_date in self.dates():
+                rows = _sortRows(self.select(business_date, business_date))
+                data_file.write(rows.tobytes())
+                groups.append(_groups(rows, offset))
+                offset += len(rows)
+            data_file.flush()
+            os.fsync(data_file.fileno())
+        index = np.concatenate(groups)
+        _replace(self._indexPath(generation), lambda f: f.write(index.tobytes()))
+        self._writeMeta(self.rows, generation)
+
+        previous = self.generation
+        self.generation = generation
+        self._setIndex(index)
+        self._records = None
+        for path in (self._dataPath(previous), self._indexPath(previous)):
+            os.remove(path)
+
+    ############################################### QUERIES ###############################################
+    @property
+    def records(self):
+        """Read-only memmap of every archived row"""
+        if self._records is None:
+            if not self.rows:
+                return np.zeros(0, RECORD_DTYPE)
+            self._records = np.memmap(
+                self._dataPath(),
+                RECORD_DTYPE,
+                mode="r",
+                shape=(self.rows,),
+            )
+        return self._records
+
+    def dates(self):
+        return np.unique(self.index["business_date"])
+
+    def securityIDs(self, symbols):
+        """Security ids of symbols (str or list); ints are passed through"""
+        if isinstance(symbols, (str, int)):
+            symbols = [symbols]
+        ids = {symbol: security_id for security_id, symbol in self.symbols.items()}
+        return [
+            s if isinstance(s, int) else ids[s.upper()]
+            for s in symbols
+            if isinstance(s, int) or s.upper() in ids
+        ]
+
+    def ranges(self, start_date=None, end_date=None, symbols=None):
+        """Merged [start, stop) row ranges of the matching groups"""
+        index = self.index
+        mask = np.ones(len(index), bool)
+        if start_date is not None:
+            mask &= index["business_date"] >= _date(start_date)
+        if end_date is not None:
+            mask &= index["business_date"] <= _date(end_date)
+        if symbols is not None:
+            mask &= np.isin(index["security_id"], self.securityIDs(symbols))
+        starts, stops = index["start"][mask], index["stop"][mask]
+        if not len(starts):
+            return []
+        breaks = np.flatnonzero(starts[1:] != stops[:-1]) + 1
+        return list(
+            zip(
+                starts[np.concatenate([[0], breaks])].tolist(),
+                stops[np.concatenate([breaks - 1, [len(stops) - 1]])].tolist(),
+            )
+        )
+
+    def iterSlices(self, start_date=None, end_date=None, symbols=None):
+        """Yield zero-copy memmap slices of the matching rows"""
+        records = self.records
+        for start, stop in self.ranges(start_date, end_date, symbols):
+            yield records[start:stop]
+
+    def select(self, start_date=None, end_date=None, symbols=None):
+        """Matching rows, a memmap view when they are contiguous and a copy otherwise
+
+        Dates are inclusive; symbols is a symbol, a security id or a list of them.
+        """
+        slices = list(self.iterSlices(start_date, end_date, symbols))
+        if not slices:
+            return np.zeros(0, RECORD_DTYPE)
+        if len(slices) == 1:
+            return slices[0]
+        return np.concatenate(slices)
+
+    def columns(self, rows):
+        """Rows as the columns FloorSheetAnalytics.updateColumns expects"""
+        security_ids, inverse = np.unique(rows["security_id"], return_inverse=True)
+        names = np.array(
+            [self.symbols.get(int(security_id)) for security_id in security_ids],
+            dtype=object,
+        )
+        return {
+            "contract_id": np.asarray(rows["contract_id"]),
+            "symbol": names[inverse],
+            "buyer": rows["buyer"].astype(np.int32),
+            "seller": rows["seller"].astype(np.int32),
+            "quantity": np.asarray(rows["quantity"]),
+            "rate": np.asarray(rows["rate"]),
+            "trade_time": np.asarray(rows["trade_time"]),
+        }
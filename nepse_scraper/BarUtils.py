@@ -0,0 +1,267 @@
+# nepse_scraper/BarUtils.py
+
+import warnings
+from datetime import date, timedelta
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from nepse_scraper.RecordUtils import fieldValue, resultRecords
+
+FIELDS = ("open", "high", "low", "close", "volume", "turnover")
+OPEN, HIGH, LOW, CLOSE, VOLUME, TURNOVER = range(len(FIELDS))
+
+# numpy day 0 (1970-01-01) is a Thursday, NEPSE weeks run Sunday to Thursday
+_SUNDAY_OFFSET = 3
+
+
+class DailyBarStore:
+    """Dense (symbol x date x field) daily OHLCV array
+
+    Symbols are laid out in SecurityRegistry order (new symbols are appended) and
+    the date axis is kept sorted; missing bars are NaN. Price history ingestion
+    only ever adds the dates that are not already present, and `refresh` asks
+    the server only for the dates after the last stored bar of each symbol.
+    """
+
+    def __init__(self, registry=None, symbol_capacity=512, date_capacity=512):
+        self.symbols = []
+        self.symbol_index = {}
+        self.dates = np.zeros(0, "datetime64[D]")
+        self._data = np.full((symbol_capacity, date_capacity, len(FIELDS)), np.nan)
+        if registry is not None:
+            for symbol in registry.symbols():
+                self._symbolRow(symbol)
+
+    def __repr__(self):
+        return f"<DailyBarStore: {len(self.symbols)} symbols x {len(self.dates)} dates>"
+
+    @property
+    def data(self):
+        """View of the populated (symbols, dates, FIELDS) block"""
+        return self._data[: len(self.symbols), : len(self.dates)]
+
+    def field(self, name):
+        """(symbols, dates) matrix of a single field, e.g. field("close")"""
+        return self.data[:, :, FIELDS.index(name)]
+
+    ############################################### LAYOUT ###############################################
+    def _symbolRow(self, symbol):
+        row = self.symbol_index.get(symbol)
+        if row is None:
+            row = len(self.symbols)
+            # grown before the symbol is added, _resize copies the used rows
+            if row >= self._data.shape[0]:
+                self._resize(symbols=2 * self._data.shape[0])
+            self.symbol_index[symbol] = row
+            self.symbols.append(symbol)
+        return row
+
+    def _resize(self, symbols=None, dates=None):
+        symbols = symbols or self._data.shape[0]
+        dates = dates or self._data.shape[1]
+        grown = np.full((symbols, dates, len(FIELDS)), np.nan)
+        used_symbols, used_dates = len(self.symbols), len(self.dates)
+        grown[:used_symbols, :used_dates] = self._data[:used_symbols, :used_dates]
+        self._data = grown
+
+    def _dateColumns(self, new_dates):
+        """Insert any unseen dates and return the column of every given date"""
+        new_dates = np.asarray(new_dates, "datetime64[D]")
+        unseen = np.setdiff1d(new_dates, self.dates)
+        if len(unseen):
+            count = len(self.dates)
+            if count + len(unseen) > self._data.shape[1]:
+                self._resize(dates=max(2 * self._data.shape[1], count + len(unseen)))
+            if count == 0 or unseen[0] > self.dates[-1]:
+                # common case, appending newer dates
+                self.dates = np.concatenate([self.dates, unseen])
+            else:
+                merged = np.union1d(self.dates, unseen)
+                positions = np.searchsorted(merged, self.dates)
+                block = np.full((self._data.shape[0], len(merged), len(FIELDS)), np.nan)
+                block[:, positions] = self._data[:, :count]
+                self._data[:, : len(merged)] = block
+                self.dates = merged
+        return np.searchsorted(self.dates, new_dates)
+
+    def _write(self, rows, dates, values):
+        columns = self._dateColumns(dates)
+        self._data[rows, columns] = values
+
+    ############################################### INGESTION ###############################################
+    def ingestCompanyPriceVolumeHistory(self, symbol, result):
+        """Add the bars of a getCompanyPriceVolumeHistory result"""
+        records = resultRecords(result)
+        if not records:
+            return 0
+        row = self._symbolRow(symbol.upper())
+        values = np.array(
+            [
+                (
+                    fieldValue(r, "openPrice"),
+                    fieldValue(r, "highPrice"),
+                    fieldValue(r, "lowPrice"),
+                    fieldValue(r, "closePrice"),
+                    fieldValue(r, "totalTradedQuantity"),
+                    fieldValue(r, "totalTradedValue"),
+                )
+                for r in records
+            ],
+            np.float64,
+        )
+        self._write(row, [r["businessDate"] for r in records], values)
+        return len(records)
+
+    def ingestPriceVolumeHistory(self, result):
+        """Add one day for the whole universe from a getPriceVolumeHistory result"""
+        records = resultRecords(result)
+        if not records:
+            return 0
+        rows = np.array([self._symbolRow(r["symbol"]) for r in records])
+        values = np.array(
+            [
+                (
+                    fieldValue(r, "openPrice"),
+                    fieldValue(r, "highPrice"),
+                    fieldValue(r, "lowPrice"),
+                    fieldValue(r, "closePrice"),
+                    fieldValue(r, "totalTradedQuantity"),
+                    fieldValue(r, "totalTradedValue"),
+                )
+                for r in records
+            ],
+            np.float64,
+        )
+        self._write(rows, [r["businessDate"] for r in records], values)
+        return len(records)
+
+    def ingestDailyScripPriceGraph(self, symbol, result, business_date=None):
+        """Collapse the intraday points of getDailyScripPriceGraph into one bar"""
+        prices = []
+        for point in resultRecords(result):
+            if isinstance(point, dict):
+                prices.append(point.get("contractRate", point.get("value")))
+            else:
+                prices.append(point[1])
+        prices = np.array([p for p in prices if p is not None], np.float64)
+        if not len(prices):
+            return 0
+        row = self._symbolRow(symbol.upper())
+        values = np.array(
+            [[prices[0], prices.max(), prices.min(), prices[-1], np.nan, np.nan]]
+        )
+        self._write(row, [f"{business_date or date.today()}"], values)
+        return 1
+
+    def lastDate(self, symbol):
+        """Latest date with a close for `symbol`, or None"""
+        row = self.symbol_index.get(symbol.upper())
+        if row is None:
+            return None
+        present = np.flatnonzero(~np.isnan(self.data[row, :, CLOSE]))
+        return self.dates[present[-1]].astype(date) if len(present) else None
+
+    def refresh(self, nepse, symbols=None, lookback_days=365):
+        """Fetch only the dates after each symbol's last bar"""
+        symbols = symbols or self.symbols
+        today = date.today()
+        added = 0
+        for symbol in symbols:
+            last = self.lastDate(symbol)
+            start_date = (
+                last + timedelta(days=1)
+                if last
+                else today - timedelta(days=lookback_days)
+            )
+            if start_date > today:
+                continue
+            result = nepse.getCompanyPriceVolumeHistory(
+                symbol, start_date=start_date, end_date=today
+            )
+            added += self.ingestCompanyPriceVolumeHistory(symbol, result)
+        return added
+
+    ############################################### RESAMPLING ###############################################
+    def _buckets(self, rule):
+        days = self.dates.astype(np.int64)
+        if rule == "W":
+            keys = (days - _SUNDAY_OFFSET) // 7
+            starts = (keys * 7 + _SUNDAY_OFFSET).astype("datetime64[D]")
+        elif rule == "M":
+            months = self.dates.astype("datetime64[M]")
+            keys = months.astype(np.int64)
+            starts = months.astype("datetime64[D]")
+        else:
+            raise ValueError(f"rule must be 'W' or 'M', not {rule!r}")
+        boundaries = np.flatnonzero(np.diff(keys, prepend=keys[:1] - 1))
+        return boundaries, starts[boundaries]
+
+    def resample(self, rule="W"):
+        """Aggregate into weekly ("W", Sunday start) or monthly ("M") bars
+
+        Returns (period_start_dates, array of shape (symbols, periods, FIELDS)).
+        """
+        data = self.data
+        if not len(self.dates):
+            return self.dates, data
+        boundaries, starts = self._buckets(rule)
+
+        valid = ~np.isnan(data[:, :, CLOSE])
+        positions = np.arange(len(self.dates))
+        first = np.minimum.reduceat(
+            np.where(valid, positions, len(positions)), boundaries, axis=1
+        )
+        last = np.maximum.reduceat(np.where(valid, positions, -1), boundaries, axis=1)
+        has_bar = last >= 0
+        rows = np.arange(len(self.symbols))[:, None]
+
+        out = np.full((len(self.symbols), len(boundaries), len(FIELDS)), np.nan)
+        first_open = data[rows, np.minimum(first, len(positions) - 1), OPEN]
+        last_close = data[rows, np.maximum(last, 0), CLOSE]
+        out[:, :, OPEN] = np.where(has_bar, first_open, np.nan)
+        out[:, :, CLOSE] = np.where(has_bar, last_close, np.nan)
+        out[:, :, HIGH] = np.fmax.reduceat(data[:, :, HIGH], boundaries, axis=1)
+        out[:, :, LOW] = np.fmin.reduceat(data[:, :, LOW], boundaries, axis=1)
+        for index in (VOLUME, TURNOVER):
+            summed = np.add.reduceat(
+                np.nan_to_num(data[:, :, index]), boundaries, axis=1
+            )
+            out[:, :, index] = np.where(has_bar, summed, np.nan)
+        return starts, out
+
+    ############################################### ROLLING WINDOWS ###############################################
+    def rolling(self, window, field="close", func="mean"):
+        """Trailing window statistic per symbol; the first window-1 dates are NaN
+
+        `func` is one of mean, std, min, max or sum; NaN bars are ignored and a
+        window with no bars yields NaN.
+        """
+        values = self.field(field)
+        out = np.full(values.shape, np.nan)
+        if values.shape[1] < window:
+            return out
+        windows = sliding_window_view(values, window, axis=1)
+        reducer = {
+            "mean": np.nanmean,
+            "std": np.nanstd,
+            "min": np.nanmin,
+            "max": np.nanmax,
+            "sum": np.nansum,
+        }[func]
+        with np.errstate(all="ignore"), warnings.catch_warnings():
+            # all-NaN windows are expected for symbols without bars
+            warnings.simplefilter("ignore", RuntimeWarning)
+            out[:, window - 1 :] = reducer(windows, axis=-1)
+        if func == "sum":
+            empty = np.isnan(windows).all(axis=-1)
+            out[:, window - 1 :][empty] = np.nan
+        return out
+
+    def returns(self, field="close", periods=1):
+        """Simple returns over `periods` bars"""
+        values = self.field(field)
+        out = np.full(values.shape, np.nan)
+        with np.errstate(all="ignore"):
+            out[:, periods:] = values[:, periods:] / values[:, :-periods] - 1
+        return out
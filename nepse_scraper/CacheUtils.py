@@ -0,0 +1,119 @@
+# nepse_scraper/CacheUtils.py
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+FRESH = "fresh"
+NOT_MODIFIED = "not_modified"
+UNCHANGED = "unchanged"
+MISS = "miss"
+
+
+def contentHash(content):
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """Validators and bodies of conditional GET responses
+
+    For every cached url the ETag/Last-Modified validators (when the server sends
+    them) and a hash of the body are kept next to the body bytes. A request is
+    answered without touching the network while the entry is younger than
+    `max_age` seconds; after that it is revalidated with If-None-Match /
+    If-Modified-Since, and a 304 is answered from the cached body.
+
+    Every answer is decoded from the bytes again, so callers each get their own
+    objects and changing one cannot corrupt the cache; json.loads of the body
+    is several times cheaper than a deepcopy of the parsed object.
+    """
+
+    def __init__(self, max_age=0, max_entries=256):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return f"<ResponseCache: {len(self)} entries, max_age={self.max_age}>"
+
+    def get(self, url):
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                self.entries.move_to_end(url)
+            return entry
+
+    def isFresh(self, entry):
+        return (time.time() - entry["stored_at"]) < self.max_age
+
+    @staticmethod
+    def conditionalHeaders(entry):
+        headers = {}
+        if entry is None:
+            return headers
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    @staticmethod
+    def load(entry):
+        """A new copy of the data of a cached entry"""
+        return json.loads(entry["content"])
+
+    def notModified(self, url, entry):
+        """Data of a 304 answered url; the entry becomes fresh again
+
+        `entry` is the one the request was revalidated with, it is stored again
+        when it was evicted while the request was in flight.
+        """
+        with self._lock:
+            current = self.entries.get(url)
+            if current is None:
+                current = self.entries[url] = entry
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            current["stored_at"] = time.time()
+        return self.load(current)
+
+    def parse(self, url, response):
+        """Parse a 2xx response and store its body
+
+        Returns (data, UNCHANGED | MISS), UNCHANGED when the body is the one
+        already cached although the server did not answer 304.
+        """
+        content = response.content
+        digest = contentHash(content)
+        with self._lock:
+            entry = self.entries.get(url)
+        outcome = (
+            UNCHANGED if entry is not None and entry["content_hash"] == digest else MISS
+        )
+        data = json.loads(content)
+
+        with self._lock:
+            self.entries[url] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "content_hash": digest,
+                "content": content,
+                "stored_at": time.time(),
+            }
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return data, outcome
+
+    def invalidate(self, url=None):
+        with self._lock:
+            if url is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(url, None)
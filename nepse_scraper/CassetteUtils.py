@@ -0,0 +1,111 @@
+# nepse_scraper/CassetteUtils.py
+
+import gzip
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from nepse_scraper.Errors import NepseCassetteMiss
+
+RECORD = "record"
+REPLAY = "replay"
+
+TOKEN_PATH = "/api/authenticate/prove"
+
+
+def cassetteKey(method, url, payload=None):
+    """Stable key for a request
+
+    The host is dropped so that a cassette recorded against nepalstock.com can be
+    replayed against any base url, and the POST payload `id` is dropped because it
+    is derived from the day, the dummy id and the token salts.
+    """
+    parts = urlsplit(url)
+    path = f"{parts.path}?{parts.query}" if parts.query else parts.path
+    if payload:
+        payload = {k: v for k, v in payload.items() if k != "id"}
+    body = json.dumps(payload, sort_keys=True) if payload else ""
+    return f"{method} {path} {body}".rstrip()
+
+
+class Cassette:
+    """gzip compressed store of responses for record/replay runs
+
+    In record mode every successful response passed through `record` is kept in
+    memory and written out by `save`. In replay mode responses are served from
+    memory in the order they were recorded; once a key's responses are exhausted
+    the last one is served again, so polling loops keep working.
+    """
+
+    def __init__(self, path, mode=REPLAY):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"mode must be '{RECORD}' or '{REPLAY}', not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.entries = defaultdict(list)
+        self.cursors = defaultdict(int)
+        self._lock = threading.Lock()
+
+        if mode == REPLAY or os.path.exists(path):
+            self.load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.mode == RECORD:
+            self.save()
+
+    def __len__(self):
+        return sum(len(responses) for responses in self.entries.values())
+
+    def __repr__(self):
+        return f"<Cassette: {self.path}, mode={self.mode}, responses={len(self)}>"
+
+    @property
+    def isReplaying(self):
+        return self.mode == REPLAY
+
+    def load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as cassette_file:
+            content = json.load(cassette_file)
+        self.entries = defaultdict(list, content["entries"])
+        self.cursors = defaultdict(int)
+
+    def save(self):
+        temporary_path = f"{self.path}.tmp"
+        with gzip.open(temporary_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump({"version": 1, "entries": self.entries}, f)
+        os.replace(temporary_path, self.path)
+
+    def record(self, method, url, payload, http_status, data):
+        with self._lock:
+            self.entries[cassetteKey(method, url, payload)].append(
+                {"http_status": http_status, "data": data}
+            )
+
+    def replay(self, method, url, payload, meta):
+        """Return a recorded {"data", "meta"} result for the request"""
+        key = cassetteKey(method, url, payload)
+        with self._lock:
+            responses = self.entries.get(key)
+            if not responses:
+                meta["status"] = "error"
+                raise NepseCassetteMiss(f"No recorded response for {key}", meta=meta)
+            cursor = self.cursors[key]
+            self.cursors[key] = cursor + 1
+            entry = responses[min(cursor, len(responses) - 1)]
+
+        data = entry["data"]
+        if urlsplit(url).path == TOKEN_PATH:
+            # rebase the recorded token onto the replay clock so it is considered
+            # valid instead of forcing a refresh before every replayed request
+            data = {**data, "serverTime": int(time.time() * 1000)}
+
+        meta["status"] = "ok"
+        meta["http_status"] = entry["http_status"]
+        meta["replayed"] = True
+        return {"data": data, "meta": meta}
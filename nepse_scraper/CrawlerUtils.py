@@ -0,0 +1,191 @@
+# nepse_scraper/CrawlerUtils.py
+
+import json
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import httpx
+
+from nepse_scraper.CacheUtils import contentHash
+from nepse_scraper.Errors import ScrapingError
+from nepse_scraper.SchedulerUtils import BULK, requestPriority
+
+CRAWLER_VERSION = 1
+
+# failures of a single symbol or attachment that leave the rest of a crawl intact
+_FETCH_ERRORS = (ScrapingError, httpx.HTTPError, OSError)
+
+
+def _entries(data):
+    if isinstance(data, dict):
+        return data.get("content", [])
+    return data or []
+
+
+def _fingerprint(entry):
+    return contentHash(json.dumps(entry, sort_keys=True).encode())
+
+
+def _attachments(entry):
+    documents = entry.get("applicationDocumentDetailsList") or []
+    return [document["filePath"] for document in documents if document.get("filePath")]
+
+
+def _localName(file_path):
+    """Unique file name of an attachment, keeping its original name readable"""
+    return f"{contentHash(file_path.encode())[:12]}-{posixpath.basename(file_path)}"
+
+
+class NewsReportCrawler:
+    """Incremental crawler of company news, financial reports and their attachments
+
+    The id and a content hash of every news item and report seen are kept in
+    `<directory>/crawler.json`, so a run only returns the entries that are new or
+    changed since the previous one. Reports of all companies are requested
+    concurrently with BULK priority, and the attachments of the returned entries
+    are streamed into `<directory>/attachments` in parallel. Attachments that
+    fail to download are retried by the next run.
+    """
+
+    STATE_FILE = "crawler.json"
+    ATTACHMENT_DIRECTORY = "attachments"
+
+    def __init__(self, nepse, directory, workers=8, download_attachments=True):
+        self.nepse = nepse
+        self.directory = directory
+        self.workers = workers
+        self.download_attachments = download_attachments
+        self.attachment_directory = os.path.join(directory, self.ATTACHMENT_DIRECTORY)
+        self.state_path = os.path.join(directory, self.STATE_FILE)
+        self.state = {
+            "version": CRAWLER_VERSION,
+            "news": {},
+            "reports": {},
+            "attachments": {},
+            "pending_attachments": [],
+        }
+        self.errors = {}
+
+        os.makedirs(self.attachment_directory, exist_ok=True)
+        if os.path.exists(self.state_path):
+            self.load()
+
+    def __repr__(self):
+        reports = sum(len(seen) for seen in self.state["reports"].values())
+        return (
+            f"<NewsReportCrawler: {self.directory}, news={len(self.state['news'])}, "
+            f"reports={reports}, attachments={len(self.state['attachments'])}>"
+        )
+
+    ############################################### PERSISTENCE ###############################################
+    def save(self):
+        temporary_path = f"{self.state_path}.tmp"
+        with open(temporary_path, "w") as state_file:
+            json.dump(self.state, state_file)
+        os.replace(temporary_path, self.state_path)
+
+    def load(self):
+        with open(self.state_path, "r") as state_file:
+            self.state.update(json.load(state_file))
+
+    ############################################### CRAWLING ###############################################
+    @staticmethod
+    def _changed(seen, entries):
+        """Entries that are not in `seen` or whose content changed; updates `seen`"""
+        changed = []
+        for entry in entries:
+            key = f"{entry.get('id')}"
+            fingerprint = _fingerprint(entry)
+            if seen.get(key) != fingerprint:
+                seen[key] = fingerprint
+                changed.append(entry)
+        return changed
+
+    def crawlNews(self):
+        """News items added or modified since the last crawl"""
+        data = self.nepse.getCompaniesNews()["data"]
+        return self._changed(self.state["news"], _entries(data))
+
+    def crawlReports(self, symbols=None):
+        """{symbol: reports added or modified since the last crawl}
+
+        Symbols whose request failed are left out and listed in self.errors; they
+        are crawled again by the next run.
+        """
+        security_ids = self.nepse.getSecurityIDKeyMap()["data"]
+        symbols = [s.upper() for s in symbols] if symbols else sorted(security_ids)
+        url = self.nepse.api_end_points["company_financial_report_url"]
+
+        def fetch(symbol):
+            with requestPriority(BULK):
+                return self.nepse.requestGETAPI(url=f"{url}{security_ids[symbol]}")
+
+        reports = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(fetch, symbol): symbol
+                for symbol in symbols
+                if symbol in security_ids
+            }
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    data = future.result()["data"]
+                except _FETCH_ERRORS as e:
+                    self.errors[symbol] = f"{e}"
+                    continue
+                seen = self.state["reports"].setdefault(symbol, {})
+                changed = self._changed(seen, _entries(data))
+                if changed:
+                    reports[symbol] = changed
+        return reports
+
+    def downloadAttachments(self, entries):
+        """Stream the attachments of `entries` and earlier failed ones to disk
+
+        Returns the paths written; already downloaded files are skipped.
+        """
+        downloaded = self.state["attachments"]
+        file_paths = {p for entry in entries for p in _attachments(entry)}
+        file_paths.update(self.state["pending_attachments"])
+        file_paths = sorted(p for p in file_paths if p not in downloaded)
+
+        def download(file_path):
+            destination = os.path.join(self.attachment_directory, _localName(file_path))
+            with requestPriority(BULK):
+                return self.nepse.downloadFile(file_path, destination)["data"]["path"]
+
+        written = []
+        pending = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(download, p): p for p in file_paths}
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    path = future.result()
+                except _FETCH_ERRORS as e:
+                    self.errors[file_path] = f"{e}"
+                    pending.append(file_path)
+                    continue
+                downloaded[file_path] = os.path.basename(path)
+                written.append(path)
+        self.state["pending_attachments"] = sorted(pending)
+        return written
+
+    def crawl(self, symbols=None):
+        """Crawl news and reports, download their attachments and save the state"""
+        self.errors = {}
+        news = self.crawlNews()
+        reports = self.crawlReports(symbols)
+        attachments = []
+        if self.download_attachments:
+            entries = news + [r for changed in reports.values() for r in changed]
+            attachments = self.downloadAttachments(entries)
+        self.save()
+        return {
+            "news": news,
+            "reports": reports,
+            "attachments": attachments,
+            "errors": dict(self.errors),
+        }
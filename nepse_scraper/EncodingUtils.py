@@ -0,0 +1,64 @@
+# nepse_scraper/EncodingUtils.py
+
+import importlib.util
+import json
+
+import httpx
+
+IDENTITY = "identity"
+
+# file suffix used when a raw body is written out as is
+ENCODING_SUFFIXES = {
+    IDENTITY: "",
+    "gzip": ".gz",
+    "deflate": ".zz",
+    "br": ".br",
+    "zstd": ".zst",
+}
+
+
+def supportedEncodings():
+    """Content codings the installed httpx can decode
+
+    br needs brotli/brotlicffi and zstd needs zstandard (the `compression`
+    extra); httpx only decodes them when those packages are installed.
+    """
+    encodings = ["gzip", "deflate"]
+    if any(_installed(name) for name in ("brotli", "brotlicffi")):
+        encodings.append("br")
+    if _installed("zstandard"):
+        encodings.append("zstd")
+    return encodings
+
+
+def _installed(name):
+    return importlib.util.find_spec(name) is not None
+
+
+def negotiateAcceptEncoding(accept_encoding):
+    """Filter an Accept-Encoding value down to the decodable codings
+
+    Advertising a coding that cannot be decoded would make the server pick it
+    and the response fail to parse.
+    """
+    supported = set(supportedEncodings())
+    offered = [coding.strip() for coding in accept_encoding.split(",")]
+    return ", ".join(
+        coding for coding in offered if coding.split(";")[0].strip() in supported
+    )
+
+
+def decodeBody(body, content_encoding=IDENTITY):
+    """Decompress a raw body returned with raw=True"""
+    if not content_encoding or content_encoding == IDENTITY:
+        return body
+    return httpx.Response(
+        200, headers={"Content-Encoding": content_encoding}, content=body
+    ).content
+
+
+def loadRawJSON(result):
+    """Parse the data of a raw=True result"""
+    return json.loads(
+        decodeBody(result["data"], result["meta"].get("content_encoding"))
+    )
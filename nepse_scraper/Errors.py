@@ -23,3 +23,11 @@ class NepseNetworkError(ScrapingError):
 
 class NepseTokenExpired(ScrapingError):
     pass
+
+
+class NepseCassetteMiss(ScrapingError):
+    pass
+
+
+class NepseCursorMismatch(ScrapingError):
+    pass
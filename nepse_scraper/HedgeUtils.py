@@ -0,0 +1,191 @@
+# nepse_scraper/HedgeUtils.py
+
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from nepse_scraper.MetricsUtils import Histogram
+
+# idempotent GETs polled during market hours (MetricsUtils.endpointLabel form)
+HEDGEABLE_ENDPOINTS = (
+    "/api/nots/lives-market",
+    "/api/nots/nepse-index",
+    "/api/nots/nepse-data/market-open",
+    "/api/nots/nepse-data/marketdepth/{id}/",
+)
+
+NOT_HEDGED = "not_hedged"
+PRIMARY_WON = "primary_won"
+HEDGE_WON = "hedge_won"
+SATURATED = "saturated"
+_OUTCOMES = (NOT_HEDGED, PRIMARY_WON, HEDGE_WON, SATURATED)
+
+_LATENCY_BOUNDS_MS = (10, 25, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 1500)
+_LATENCY_BOUNDS_MS += (2000, 3000, 5000, 10000, 30000)
+
+
+def _accepted(future):
+    """Whether a finished send answered with a usable response"""
+    if future.exception() is not None:
+        return False
+    status_code = future.result().status_code
+    return 200 <= status_code < 300 or status_code == 304
+
+
+def _discard(future):
+    """Close the response of a send that lost the race, once it has one"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class HedgePolicy:
+    """When to send a duplicate of a slow idempotent GET
+
+    The hedge delay of an endpoint is the `percentile` of its recent response
+    times, clamped to [min_delay_ms, max_delay_ms]; until `min_samples` responses
+    have been seen `initial_delay_ms` is used. The latency histograms are reset
+    every `window` samples so the delay follows the market's current state.
+
+    The sends run on a pool of `max_workers` threads. A loser that is still on
+    the wire keeps its thread, so when the pool cannot take both sends of
+    another call, that call is sent once on the calling thread instead of
+    queueing behind hung requests (outcome SATURATED).
+    """
+
+    def __init__(
+        self,
+        percentile=0.95,
+        min_delay_ms=50,
+        max_delay_ms=2000,
+        initial_delay_ms=500,
+        min_samples=20,
+        window=500,
+        endpoints=HEDGEABLE_ENDPOINTS,
+        max_workers=8,
+    ):
+        self.percentile = percentile
+        self.min_delay_ms = min_delay_ms
+        self.max_delay_ms = max_delay_ms
+        self.initial_delay_ms = initial_delay_ms
+        self.min_samples = min_samples
+        self.window = window
+        self.endpoints = frozenset(endpoints)
+        self.max_workers = max_workers
+        self.in_flight = 0
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="nepse-hedge"
+        )
+        self.latencies = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<HedgePolicy: p{self.percentile * 100:g}, endpoints={len(self.endpoints)}>"
+
+    def isHedgeable(self, method, endpoint):
+        return method == "GET" and endpoint in self.endpoints
+
+    def delayFor(self, endpoint):
+        """Seconds to wait for the primary response before hedging"""
+        with self._lock:
+            histogram = self.latencies.get(endpoint)
+            if histogram is None or histogram.count < self.min_samples:
+                delay_ms = self.initial_delay_ms
+            else:
+                delay_ms = histogram.quantile(self.percentile)
+        return min(max(delay_ms, self.min_delay_ms), self.max_delay_ms) / 1000
+
+    def observe(self, endpoint, response_time_ms, outcome):
+        with self._lock:
+            histogram = self.latencies.get(endpoint)
+            if histogram is None or histogram.count >= self.window:
+                histogram = self.latencies[endpoint] = Histogram(_LATENCY_BOUNDS_MS)
+            histogram.observe(response_time_ms)
+            counts = self.counts.setdefault(endpoint, dict.fromkeys(_OUTCOMES, 0))
+            counts[outcome] += 1
+
+    def stats(self):
+        """Per endpoint counts; duplicate_rate is the share of requests sent twice"""
+        with self._lock:
+            stats = {}
+            for endpoint, counts in self.counts.items():
+                total = sum(counts.values())
+                duplicates = counts[PRIMARY_WON] + counts[HEDGE_WON]
+                stats[endpoint] = {
+                    **counts,
+                    "requests": total,
+                    "duplicates": duplicates,
+                    "duplicate_rate": round(duplicates / total, 4) if total else 0.0,
+                }
+            return stats
+
+    def _reserve(self):
+        """Claim workers for both sends of a call, False when the pool is full"""
+        with self._lock:
+            if self.in_flight + 2 > self.max_workers:
+                return False
+            self.in_flight += 2
+            return True
+
+    def _release(self, *_):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _submit(self, send):
+        # the caller's context carries the profiler phase and scheduler state
+        future = self.executor.submit(contextvars.copy_context().run, send)
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, endpoint, send_primary, send_hedge):
+        """Return (response, outcome) of whichever of the two sends answers first
+
+        send_hedge is only called when send_primary has not answered within
+        delayFor(endpoint). Only a 2xx or 304 response wins the race; an error
+        or any other status of one of them is ignored while the other can still
+        answer, and is returned or raised when neither succeeds. The loser is
+        cancelled if it has not started yet and its response closed otherwise;
+        a send already on the wire keeps its worker until it completes.
+        """
+        start_time = time.perf_counter()
+        if not self._reserve():
+            response = send_primary()
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            self.observe(endpoint, elapsed_ms, SATURATED)
+            return response, SATURATED
+
+        primary = self._submit(send_primary)
+        done, _ = wait([primary], timeout=self.delayFor(endpoint))
+        if done:
+            # the worker claimed for the hedge is not needed
+            self._release()
+            outcome = NOT_HEDGED
+            response = primary.result()
+        else:
+            hedge = self._submit(send_hedge)
+            pending = {primary, hedge}
+            winner = failed = None
+            while pending and winner is None:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if winner is None and _accepted(future):
+                        winner = future
+                    elif failed is None:
+                        failed = future
+                    else:
+                        _discard(future)
+            for future in pending:
+                future.cancel()
+                future.add_done_callback(_discard)
+            if winner is None:
+                winner = failed
+            elif failed is not None:
+                _discard(failed)
+            outcome = PRIMARY_WON if winner is primary else HEDGE_WON
+            response = winner.result()
+        self.observe(endpoint, (time.perf_counter() - start_time) * 1000, outcome)
+        return response, outcome
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,223 @@
+# nepse_scraper/MetricsUtils.py
+
+import bisect
+import re
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+SIZE_BUCKETS_BYTES = (1 << 10, 1 << 12, 1 << 14, 1 << 16, 1 << 18, 1 << 20, 1 << 22)
+
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpointLabel(url):
+    """Collapse a request url to a low cardinality label
+
+    >>> endpointLabel("https://www.nepalstock.com/api/nots/security/131?size=500")
+    '/api/nots/security/{id}'
+    """
+    return _NUMERIC_SEGMENT.sub("/{id}", urlsplit(url).path)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate the q-quantile by linear interpolation inside the bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.bounds[index - 1] if index else (self.min or 0)
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                fraction = (rank - cumulative) / bucket_count
+                return min(lower + (upper - lower) * fraction, self.max)
+            cumulative += bucket_count
+        return self.max
+
+    def toDict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([*self.bounds, "+Inf"], self.counts)),
+        }
+
+
+class MetricsRegistry:
+    """Thread safe store of labelled counters and histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, f"{v}") for k, v in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[self._key(name, labels)] += value
+
+    def observe(self, name, value, bounds=LATENCY_BUCKETS_MS, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(bounds)
+            histogram.observe(value)
+
+    def getHistogram(self, name, **labels):
+        return self.histograms.get(self._key(name, labels))
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.counters.items()
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), **histogram.toDict()}
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+            }
+
+    def toPrometheus(self, prefix="nepse_"):
+        """Render the registry in the Prometheus text exposition format"""
+
+        def render_labels(labels, extra=()):
+            pairs = [*labels, *extra]
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{prefix}{name}{render_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(
+                    [*histogram.bounds, "+Inf"], histogram.counts
+                ):
+                    cumulative += bucket_count
+                    le = render_labels(labels, (("le", bound),))
+                    lines.append(f"{prefix}{name}_bucket{le} {cumulative}")
+                lines.append(
+                    f"{prefix}{name}_sum{render_labels(labels)} {histogram.sum}"
+                )
+                lines.append(
+                    f"{prefix}{name}_count{render_labels(labels)} {histogram.count}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+class Instrumentation:
+    """Event hooks for the request pipeline, aggregated into a MetricsRegistry
+
+    Events emitted by NepseScraper and TokenManager:
+        request        endpoint, method, status, http_status, response_time_ms,
+                       retry_count, bytes
+        retry          endpoint, method, reason
+        token_refresh  duration_ms, source ("network" or "store")
+        wasm_parse     duration_ms
+        cache          endpoint, result ("fresh", "not_modified", "unchanged"
+                       or "miss")
+        schedule       endpoint, priority, wait_ms
+        hedge          endpoint, outcome ("primary_won", "hedge_won" or "saturated")
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else MetricsRegistry()
+        self.hooks = defaultdict(list)
+
+    def addHook(self, event, callback):
+        self.hooks[event].append(callback)
+        return callback
+
+    def removeHook(self, event, callback):
+        self.hooks[event].remove(callback)
+
+    def emit(self, event, **fields):
+        recorder = getattr(self, f"_record_{event}", None)
+        if recorder is not None:
+            recorder(**fields)
+        for callback in self.hooks.get(event, ()):
+            callback(event, fields)
+
+    def _record_request(
+        self,
+        endpoint,
+        method,
+        status,
+        http_status,
+        response_time_ms,
+        retry_count,
+        bytes,
+    ):
+        registry = self.registry
+        registry.inc(
+            "requests_total",
+            endpoint=endpoint,
+            method=method,
+            status=status,
+            http_status=http_status,
+        )
+        registry.observe(
+            "request_latency_ms", response_time_ms, endpoint=endpoint, method=method
+        )
+        if bytes:
+            registry.inc("response_bytes_total", bytes, endpoint=endpoint)
+            registry.observe(
+                "response_size_bytes", bytes, SIZE_BUCKETS_BYTES, endpoint=endpoint
+            )
+
+    def _record_retry(self, endpoint, method, reason):
+        self.registry.inc("retries_total", endpoint=endpoint, reason=reason)
+
+    def _record_token_refresh(self, duration_ms, source):
+        self.registry.inc("token_refresh_total", source=source)
+        self.registry.observe("token_refresh_ms", duration_ms, source=source)
+
+    def _record_wasm_parse(self, duration_ms):
+        self.registry.observe("wasm_parse_ms", duration_ms)
+
+    def _record_cache(self, endpoint, result):
+        self.registry.inc("cache_lookups_total", endpoint=endpoint, result=result)
+
+    def _record_schedule(self, endpoint, priority, wait_ms):
+        self.registry.inc("scheduled_requests_total", priority=priority)
+        self.registry.observe("scheduler_wait_ms", wait_ms, priority=priority)
+
+    def _record_hedge(self, endpoint, outcome):
+        self.registry.inc("hedged_requests_total", endpoint=endpoint, outcome=outcome)
@@ -0,0 +1,478 @@
+# nepse_scraper/NepseCli.py
+
+import argparse
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+import os
+import sys
+import time
+
+from tqdm import tqdm
+
+from nepse_scraper.EncodingUtils import ENCODING_SUFFIXES
+from nepse_scraper.Errors import NepseCursorMismatch
+from nepse_scraper.NepseLib import NepseScraper
+from nepse_scraper.PaginationUtils import PageCursor
+
+FORMATS = ("json", "jsonl", "csv", "parquet", "raw", "archive")
+COMPRESSIONS = {"gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz"}
+
+
+class _TextWriter:
+    resumable = True
+    raw = False
+
+    def __init__(self, path, compression, append, state):
+        self.is_stdout = path is None
+        if self.is_stdout:
+            self.file = io.TextIOWrapper(
+                sys.stdout.buffer, encoding="utf-8", newline=""
+            )
+        else:
+            opener = COMPRESSIONS.get(compression, open)
+            self.file = opener(
+                path, "at" if append else "wt", encoding="utf-8", newline=""
+            )
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.flush()
+        if self.is_stdout:
+            self.file.detach()
+        else:
+            self.file.close()
+
+
+class _JSONWriter(_TextWriter):
+    """Streams a JSON array; cannot be appended to, so no resume support"""
+
+    resumable = False
+
+    def __init__(self, path, compression, append, state):
+        super().__init__(path, compression, append, state)
+        self.file.write("[")
+        self.separator = ""
+
+    def write(self, records, page):
+        chunks = []
+        for record in records:
+            chunks.append(self.separator + json.dumps(record))
+            self.separator = ","
+        return self.file.write("".join(chunks))
+
+    def close(self):
+        self.file.write("]\n")
+        super().close()
+
+
+class _JSONLWriter(_TextWriter):
+    def write(self, records, page):
+        return self.file.write("".join(json.dumps(record) + "\n" for record in records))
+
+
+class _CSVWriter(_TextWriter):
+    def __init__(self, path, compression, append, state):
+        super().__init__(path, compression, append, state)
+        self.state = state
+
+    def write(self, records, page):
+        if not records:
+            return 0
+        buffer = io.StringIO()
+        write_header = self.state["fieldnames"] is None
+        if write_header:
+            self.state["fieldnames"] = list(records[0])
+        writer = csv.DictWriter(
+            buffer, fieldnames=self.state["fieldnames"], extrasaction="ignore"
+        )
+        if write_header:
+            writer.writeheader()
+        writer.writerows(records)
+        return self.file.write(buffer.getvalue())
+
+
+class _ParquetWriter:
+    """Writes one part file per page into the output directory"""
+
+    resumable = True
+    raw = False
+
+    def __init__(self, path, compression, append, state):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as exc:
+            raise SystemExit(
+                "parquet output requires pyarrow (pip install pyarrow)"
+            ) from exc
+        if path is None:
+            raise SystemExit("parquet output requires --output-file DIRECTORY")
+        self.pyarrow = pyarrow
+        self.parquet = pyarrow.parquet
+        self.path = path
+        self.compression = {None: "snappy", "gzip": "gzip"}.get(compression, "zstd")
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, records, page):
+        if not records:
+            return 0
+        table = self.pyarrow.Table.from_pylist(records)
+        part_path = os.path.join(self.path, f"part-{page:05d}.parquet")
+        self.parquet.write_table(table, part_path, compression=self.compression)
+        return os.path.getsize(part_path)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _RawWriter:
+    """Writes every page body as received, still compressed, into the output
+    directory; nothing is decoded so row counts are not known
+    """
+
+    resumable = True
+    raw = True
+
+    def __init__(self, path, compression, append, state):
+        if path is None:
+            raise SystemExit("raw output requires --output-file DIRECTORY")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, body, page, content_encoding):
+        suffix = ENCODING_SUFFIXES.get(content_encoding, f".{content_encoding}")
+        part_path = os.path.join(self.path, f"part-{page:05d}.json{suffix}")
+        with open(part_path, "wb") as part_file:
+            part_file.write(body)
+        return len(body)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _ArchiveWriter:
+    """Appends the records to a FloorSheetArchive in the output directory;
+    already archived contracts are skipped, so resumed pages are not duplicated
+    """
+
+    resumable = True
+    raw = False
+
+    def __init__(self, path, compression, append, state):
+        try:
+            from nepse_scraper.ArchiveUtils import FloorSheetArchive
+        except ImportError as exc:
+            raise SystemExit(
+                "archive output requires numpy (pip install nepse_scraper[analytics])"
+            ) from exc
+        if path is None:
+            raise SystemExit("archive output requires --output-file DIRECTORY")
+        self.archive = FloorSheetArchive(path)
+
+    def write(self, records, page):
+        return self.archive.append(records) * self.archive.records.dtype.itemsize
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+WRITERS = {
+    "json": _JSONWriter,
+    "jsonl": _JSONLWriter,
+    "csv": _CSVWriter,
+    "parquet": _ParquetWriter,
+    "raw": _RawWriter,
+    "archive": _ArchiveWriter,
+}
+
+
+class FloorSheetDump:
+    """Streams floorsheet pages into a file as they arrive
+
+    Progress is checkpointed to `<output>.progress.json` after every page has
+    been flushed, so an interrupted dump restarted with resume=True only fetches
+    the pages that are still missing, after checking that the floorsheet has
+    not shifted since. Pages that keep failing after `page_retries` are skipped
+    and reported, and the checkpoint is kept for a later resume.
+    """
+
+    def __init__(
+        self,
+        nepse,
+        output_file=None,
+        output_format="json",
+        compression=None,
+        symbol=None,
+        business_date=None,
+        workers=1,
+        resume=False,
+        show_progress=True,
+        page_retries=2,
+    ):
+        self.nepse = nepse
+        self.output_file = output_file
+        self.output_format = output_format
+        self.compression = compression
+        self.symbol = symbol
+        self.business_date = business_date
+        self.workers = workers
+        self.resume = resume
+        self.show_progress = show_progress
+        self.page_retries = page_retries
+        self.state_path = f"{output_file}.progress.json" if output_file else None
+
+    def _loadState(self):
+        if not (self.resume and self.state_path and os.path.exists(self.state_path)):
+            return None
+        with open(self.state_path, "r") as state_file:
+            state = json.load(state_file)
+        if (state["symbol"], state["business_date"], state["format"]) != (
+            self.symbol,
+            self.business_date,
+            self.output_format,
+        ):
+            raise SystemExit(
+                f"{self.state_path} belongs to a different dump, refusing to resume"
+            )
+        return state
+
+    def _saveState(self, state):
+        if self.state_path is None:
+            return
+        temporary_path = f"{self.state_path}.tmp"
+        with open(temporary_path, "w") as state_file:
+            json.dump(state, state_file)
+        os.replace(temporary_path, self.state_path)
+
+    def run(self):
+        writer_class = WRITERS[self.output_format]
+        if self.resume and not writer_class.resumable:
+            raise SystemExit(f"--resume is not supported for {self.output_format}")
+
+        state = self._loadState()
+        append = state is not None
+        if state is None:
+            state = {
+                "symbol": self.symbol,
+                "business_date": self.business_date,
+                "format": self.output_format,
+                "total_pages": None,
+                "page_size": None,
+                "completed_pages": [],
+                "contract_ids": {},
+                "rows": 0,
+                "bytes": 0,
+                "fieldnames": None,
+            }
+
+        cursor = PageCursor(
+            page_size=state["page_size"],
+            total_pages=state["total_pages"],
+            completed=state["completed_pages"],
+            contract_ids=state.get("contract_ids"),
+        )
+
+        writer = writer_class(self.output_file, self.compression, append, state)
+        progress = tqdm(
+            total=state["total_pages"],
+            initial=len(state["completed_pages"]),
+            unit="page",
+            disable=not self.show_progress,
+            file=sys.stderr,
+        )
+        start_time = time.perf_counter()
+        rows = 0
+        written_bytes = 0
+
+        try:
+            for page in self.nepse.iterFloorSheetPages(
+                symbol=self.symbol,
+                business_date=self.business_date,
+                cursor=cursor,
+                page_retries=self.page_retries,
+                workers=self.workers,
+                raw=writer.raw,
+            ):
+                if writer.raw:
+                    written = writer.write(
+                        page["body"], page["page"], page["meta"]["content_encoding"]
+                    )
+                    page_rows = 0
+                else:
+                    written = writer.write(page["records"], page["page"])
+                    page_rows = len(page["records"])
+                writer.flush()
+
+                rows += page_rows
+                written_bytes += written
+                if state["total_pages"] is None:
+                    state["total_pages"] = page["total_pages"]
+                    state["page_size"] = page["page_size"]
+                    progress.total = page["total_pages"]
+                state["completed_pages"].append(page["page"])
+                state["contract_ids"] = cursor.contract_ids
+                state["rows"] += page_rows
+                state["bytes"] += written
+                self._saveState(state)
+
+                elapsed = max(time.perf_counter() - start_time, 1e-9)
+                progress.set_postfix(
+                    rows_s=f"{rows / elapsed:,.0f}",
+                    MB_s=f"{written_bytes / elapsed / 1e6:.2f}",
+                    refresh=False,
+                )
+                progress.update(1)
+        except NepseCursorMismatch as e:
+            raise SystemExit(f"{e}, restart the dump without --resume")
+        finally:
+            progress.close()
+            writer.close()
+
+        elapsed = max(time.perf_counter() - start_time, 1e-9)
+        missing_pages = sorted(cursor.missing)
+        if not missing_pages and self.state_path and os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        summary = {
+            "rows": state["rows"],
+            "pages": len(state["completed_pages"]),
+            "missing_pages": missing_pages,
+            "seconds": round(elapsed, 2),
+            "rows_per_s": round(rows / elapsed, 1),
+            "mb_per_s": round(written_bytes / elapsed / 1e6, 3),
+        }
+        print(json.dumps(summary), file=sys.stderr)
+        return summary
+
+
+def _guessCompression(output_file, compression):
+    if compression != "auto":
+        return None if compression == "none" else compression
+    if output_file is None:
+        return None
+    return COMPRESSION_SUFFIXES.get(os.path.splitext(output_file)[1])
+
+
+def _parseArgs(argv=None):
+    from nepse_scraper import __version__
+
+    parser = argparse.ArgumentParser(
+        prog="nepse-cli", description="cmdline interface to nepalstock.com"
+    )
+    parser.add_argument(
+        "-v", "--version", action="version", version=f"nepse-cli {__version__}"
+    )
+    parser.add_argument(
+        "--show-status",
+        action="store_true",
+        help="dumps Nepse status to the standard output",
+    )
+    parser.add_argument(
+        "--get-floorsheet",
+        action="store_true",
+        help="dumps Nepse's floorsheet to the standard output or --output-file",
+    )
+    parser.add_argument(
+        "--symbol", help="restricts --get-floorsheet to the floorsheet of a symbol"
+    )
+    parser.add_argument(
+        "--business-date",
+        help="business date (YYYY-MM-DD) used together with --symbol",
+    )
+    parser.add_argument(
+        "--output-file", metavar="FILE", help="sets the output file for dumping"
+    )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="json",
+        help="output format, parquet and raw (undecoded page bodies) write a "
+        "directory of part files, archive a memory mappable FloorSheetArchive",
+    )
+    parser.add_argument(
+        "--to-csv", action="store_true", help="shorthand for --format csv"
+    )
+    parser.add_argument(
+        "--compression",
+        choices=("auto", "none", *COMPRESSIONS),
+        default="auto",
+        help="output compression, auto picks it from the file extension",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of floorsheet pages fetched concurrently",
+    )
+    parser.add_argument(
+        "--page-retries",
+        type=int,
+        default=2,
+        help="retries of a failing page before it is skipped and reported",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continues an interrupted dump into the same --output-file",
+    )
+    parser.add_argument(
+        "--hide-progressbar",
+        action="store_true",
+        help="sets the visibility of progress bar to False",
+    )
+    parser.add_argument(
+        "--no-tls-verify",
+        action="store_true",
+        help="disables TLS certificate verification",
+    )
+    args = parser.parse_args(argv)
+    if not (args.show_status or args.get_floorsheet):
+        parser.print_help()
+        parser.exit()
+    if args.to_csv:
+        args.format = "csv"
+    return args
+
+
+def main(argv=None):
+    args = _parseArgs(argv)
+
+    nepse = NepseScraper(tls_verify=not args.no_tls_verify)
+
+    if args.show_status:
+        print(json.dumps(nepse.getMarketStatus()["data"], indent=2))
+
+    if args.get_floorsheet:
+        summary = FloorSheetDump(
+            nepse,
+            output_file=args.output_file,
+            output_format=args.format,
+            compression=_guessCompression(args.output_file, args.compression),
+            symbol=args.symbol.upper() if args.symbol else None,
+            business_date=args.business_date,
+            workers=args.workers,
+            resume=args.resume,
+            show_progress=not args.hide_progressbar,
+            page_retries=args.page_retries,
+        ).run()
+        if summary["missing_pages"]:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
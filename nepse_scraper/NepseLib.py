@@ -1,22 +1,37 @@
 # nepse/NepseLib.py
 
+import atexit
+import contextlib
+import contextvars
+import itertools
 import json
+import os
 import pathlib
 import time
 import uuid
-from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import date, datetime, timedelta, timezone
+from urllib.parse import quote
 
 import httpx
 
+from nepse_scraper.CacheUtils import FRESH, NOT_MODIFIED, ResponseCache
 from nepse_scraper.DummyIDUtils import DummyIDManager
-from nepse_scraper.TokenUtils import TokenManager
+from nepse_scraper.EncodingUtils import IDENTITY, loadRawJSON, negotiateAcceptEncoding
 from nepse_scraper.Errors import (
+    NepseCursorMismatch,
     NepseInvalidClientRequest,
     NepseInvalidServerResponse,
     NepseNetworkError,
     NepseTokenExpired,
 )
+from nepse_scraper.HedgeUtils import NOT_HEDGED
+from nepse_scraper.MetricsUtils import Instrumentation, endpointLabel
+from nepse_scraper.PaginationUtils import PageCursor, PageSizeController
+from nepse_scraper.ProfileUtils import Profiler, phase, profileDirectoryFromEnv
+from nepse_scraper.RegistryUtils import SecurityRegistry
+from nepse_scraper.RequestUtils import PreparedRequest, RequestBuilder, buildChain
+from nepse_scraper.TokenUtils import TokenManager
 
 
 def _sanitize_headers(headers):
@@ -29,6 +44,25 @@ def _sanitize_headers(headers):
     return safe
 
 
+def _sized_url(url, page_size):
+    return f"{url}{'&' if '?' in url else '?'}size={page_size}"
+
+
+def _paged_url(url, page_size, page_num):
+    url = _sized_url(url, page_size)
+    return f"{url}&page={page_num}" if page_num else url
+
+
+def _returned_page_size(result):
+    """Page size the server actually used, taken from the Spring page body"""
+    if "page_size" in result:
+        return result["page_size"]
+    data = result["data"]
+    if not isinstance(data, dict):
+        return None
+    return (data.get("floorsheets") or data).get("size")
+
+
 def _create_meta_skeleton(method, url, headers, payload=None):
     """Initialize metadata structure for every request"""
     return {
@@ -50,6 +84,7 @@ def _create_meta_skeleton(method, url, headers, payload=None):
 
 class _Nepse:
     def __init__(self, token_manager, dummy_id_manager):
+        self.instrumentation = Instrumentation()
         self.token_manager = token_manager(self)
 
         self.dummy_id_manager = dummy_id_manager(
@@ -57,17 +92,26 @@ class _Nepse:
             date_function=datetime.now,
         )
         self._tls_verify = True
-        self.company_symbol_id_keymap = None
-        self.security_symbol_id_keymap = None
+        self._local_address = None
+        self.client = None
+        self.hedge_client = None
+        self.cassette = None
+        self.response_cache = ResponseCache()
+        # opt-in, a default scheduler would cap the concurrency of every caller
+        self.scheduler = None
+        self.hedging = None
+        self.security_registry = SecurityRegistry()
         self.company_list = None
         self.security_list = None
-        self.sector_scrips = None
-        self.floor_sheet_size = 500
+        self.pagination = PageSizeController()
         self.base_url = "https://www.nepalstock.com"
 
         self.load_json_api_end_points()
         self.load_json_dummy_data()
         self.load_json_header()
+        self.request_builder = RequestBuilder(
+            self.base_url, self.api_end_points, self.headers
+        )
 
     ############################################### PRIVATE METHODS###############################################
     def getDummyID(self):
@@ -79,6 +123,9 @@ class _Nepse:
             self.headers = json.load(json_file)
             self.headers["Host"] = self.base_url.replace("https://", "")
             self.headers["Referer"] = self.base_url.replace("https://", "")
+            self.headers["Accept-Encoding"] = negotiateAcceptEncoding(
+                self.headers["Accept-Encoding"]
+            )
 
     def load_json_api_end_points(self):
         json_file_path = f"{pathlib.Path(__file__).parent}/data/API_ENDPOINTS.json"
@@ -99,10 +146,12 @@ class _Nepse:
     def init_client(self, tls_verify):
         pass
 
-    def requestGETAPI(self, url, include_authorization_headers=True):
+    def requestGETAPI(
+        self, url, include_authorization_headers=True, conditional=False, raw=False
+    ):
         pass
 
-    def requestPOSTAPI(self, url, payload_generator):
+    def requestPOSTAPI(self, url, payload_generator, raw=False):
         pass
 
     def getPOSTPayloadIDForScrips(self):
@@ -119,6 +168,66 @@ class _Nepse:
         self._tls_verify = flag
         self.init_client(tls_verify=flag)
 
+    def getMetrics(self):
+        """Aggregated request, retry and token metrics collected so far"""
+        return self.instrumentation.registry.snapshot()
+
+    def setSecurityRegistry(self, security_registry):
+        """Use a shared and/or disk persisted SecurityRegistry for symbol lookups"""
+        self.security_registry = security_registry
+
+    def setTokenStore(self, token_store):
+        """Reuse tokens across processes, e.g. setTokenStore(FileTokenStore(path))"""
+        self.token_manager.setTokenStore(token_store)
+
+    def setCassette(self, cassette):
+        """Record responses into, or replay them from, a Cassette (None disables)"""
+        self.cassette = cassette
+
+    def setResponseCache(self, response_cache):
+        """Cache for conditional requests of reference data (None disables)"""
+        self.response_cache = response_cache
+
+    def setRequestScheduler(self, scheduler):
+        """Prioritise live calls over bulk pulls, e.g. setRequestScheduler(RequestScheduler())
+
+        Off by default; while set, at most the scheduler's `max_concurrency`
+        requests are in flight at once. None disables it again.
+        """
+        self.scheduler = scheduler
+
+    def setRequestHedging(self, hedging):
+        """Duplicate slow live GETs on a second connection with a HedgePolicy (None disables)"""
+        self.hedging = hedging
+        self.init_client(tls_verify=self._tls_verify)
+
+    def profile(self, memory=True, cprofile=False, directory=None):
+        """Profiler recording the calls made on this scraper while it is active
+
+        `with nepse.profile() as profiler: ...`; with `directory` the report is
+        also written there when profiling stops.
+        """
+        return Profiler(self, memory=memory, cprofile=cprofile, directory=directory)
+
+    def setPaginationController(self, pagination):
+        """Share or persist learned page sizes, e.g. PageSizeController(path=...)"""
+        self.pagination = pagination
+
+    def setBaseURL(self, base_url):
+        """Send requests to another host, e.g. a mirror or a local test server"""
+        self.base_url = base_url.rstrip("/")
+        host = self.base_url.split("://", 1)[-1]
+        self.headers["Host"] = host
+        self.headers["Referer"] = host
+        self.request_builder = RequestBuilder(
+            self.base_url, self.api_end_points, self.headers
+        )
+
+    def setLocalAddress(self, local_address):
+        """Bind outgoing connections to a local source address (egress IP)"""
+        self._local_address = local_address
+        self.init_client(tls_verify=self._tls_verify)
+
     # --- Simple GET endpoints ---
     def getMarketStatus(self):
         return self.requestGETAPI(
@@ -188,12 +297,15 @@ class _Nepse:
     # --- POST endpoints ---
     def getPriceVolumeHistory(self, business_date=None):
         if business_date:
-            url = f"{self.api_end_points['todays_price']}?size=500&businessDate={business_date}"
+            url = f"{self.api_end_points['todays_price']}?businessDate={business_date}"
         else:
-            url = f"{self.api_end_points['todays_price']}?size=500"
-        return self.requestPOSTAPI(
-            url=url,
-            payload_generator=self.getPOSTPayloadIDForFloorSheet,
+            url = self.api_end_points["todays_price"]
+        return self._requestAllPages(
+            "todays_price",
+            lambda page_size, page_num: self.requestPOSTAPI(
+                url=_paged_url(url, page_size, page_num),
+                payload_generator=self.getPOSTPayloadIDForFloorSheet,
+            ),
         )
 
     def getDailyNepseIndexGraph(self):
@@ -301,10 +413,30 @@ class _Nepse:
 
 class NepseScraper(_Nepse):
     MAX_RETRIES = 3
+    PAGE_RETRY_BACKOFF = 0.5
+    DOWNLOAD_CHUNK_SIZE = 1 << 16
 
-    def __init__(self):
+    def __init__(self, tls_verify=True, local_address=None):
         super().__init__(TokenManager, DummyIDManager)
+        self._tls_verify = tls_verify
+        self._local_address = local_address
         self.init_client(tls_verify=self._tls_verify)
+        self.middlewares = [
+            self._metricsMiddleware,
+            self._cassetteMiddleware,
+            self._cacheMiddleware,
+            self._scheduleMiddleware,
+            self._retryMiddleware,
+            self._authMiddleware,
+        ]
+        self._request_chain = buildChain(self.middlewares, self._send)
+
+        profile_directory = profileDirectoryFromEnv()
+        if profile_directory is not None:
+            profiler = self.profile(
+                directory=os.path.join(profile_directory, f"{os.getpid()}-{id(self):x}")
+            ).start()
+            atexit.register(profiler.stop)
 
     ############################################### PRIVATE METHODS###############################################
     def getPOSTPayloadIDForScrips(self):
@@ -332,93 +464,387 @@ class NepseScraper(_Nepse):
 
     def getAuthorizationHeaders(self):
         access_token = self.token_manager.getAccessToken()
-        headers = {
-            "Authorization": f"Salter {access_token}",
-            "Content-Type": "application/json",
-            **self.headers,
-        }
-        return headers
+        return dict(self.request_builder.headers(access_token))
 
     def init_client(self, tls_verify):
-        self.client = httpx.Client(verify=tls_verify, http2=True, timeout=100)
+        # the replaced clients would keep their connection pools open
+        for client in (self.client, self.hedge_client):
+            if client is not None:
+                client.close()
+        self.client = self._new_client(tls_verify)
+        # hedges need their own connection, on self.client they would share the
+        # http2 connection of the request they are meant to overtake
+        self.hedge_client = (
+            self._new_client(tls_verify) if self.hedging is not None else None
+        )
 
-    def _execute_request(self, method, url, headers, payload=None):
-        """Core execution with metadata capture and retry logic"""
-        full_url = self.get_full_url(url) if not url.startswith("http") else url
-        meta = _create_meta_skeleton(method, full_url, headers, payload)
+    def _new_client(self, tls_verify):
+        transport = (
+            httpx.HTTPTransport(
+                verify=tls_verify, http2=True, local_address=self._local_address
+            )
+            if self._local_address
+            else None
+        )
+        return httpx.Client(
+            verify=tls_verify, http2=True, timeout=100, transport=transport
+        )
 
-        start_time = time.perf_counter()
-        retry_count = 0
-        last_exception = None
+    def _execute_request(
+        self,
+        method,
+        url,
+        authorized=True,
+        payload_generator=None,
+        conditional=False,
+        raw=False,
+        destination=None,
+    ):
+        """Prepare a request from the prebuilt templates and run it through the chain
+
+        With `conditional` the response is revalidated against self.response_cache
+        and an unchanged body is served from the cached body. With `raw`
+        the body is returned as the bytes received, still content encoded, and
+        meta carries content_encoding/content_type (see EncodingUtils.decodeBody).
+        With `destination` the body is streamed into that file and data is
+        {"path", "bytes"}.
+        """
+        with phase("request"):
+            builder = self.request_builder
+            full_url, endpoint = builder.resolve(url)
+            access_token = self.token_manager.getAccessToken() if authorized else None
+            headers = builder.headers(access_token)
+            payload = body = None
+            if payload_generator is not None:
+                with phase("payload"):
+                    payload_id = payload_generator()
+                payload, body = {"id": payload_id}, builder.payloadBody(payload_id)
+            with phase("meta"):
+                meta = _create_meta_skeleton(method, full_url, headers, payload)
+
+            request = PreparedRequest(
+                method,
+                full_url,
+                endpoint,
+                headers,
+                access_token=access_token,
+                payload=payload,
+                body=body,
+                payload_generator=payload_generator,
+                conditional=conditional and not raw and self.response_cache is not None,
+                raw=raw,
+                destination=destination,
+                meta=meta,
+            )
+            return self._request_chain(request)
+
+    def addMiddleware(self, middleware, index=0):
+        """Insert a middleware(request, call_next) into the request chain
+
+        Index 0 is the outermost position, in front of the metrics middleware.
+        """
+        self.middlewares.insert(index, middleware)
+        self._request_chain = buildChain(self.middlewares, self._send)
+
+    ############################################### MIDDLEWARE ###############################################
+    def _metricsMiddleware(self, request, call_next):
+        meta = request.meta
+        try:
+            return call_next(request)
+        finally:
+            if meta["status"] == "pending":
+                meta["status"] = "error"
+            self.instrumentation.emit(
+                "request",
+                endpoint=request.endpoint,
+                method=request.method,
+                status=meta["status"],
+                http_status=meta["http_status"],
+                response_time_ms=round(
+                    (time.perf_counter() - request.start_time) * 1000, 2
+                ),
+                retry_count=request.retry_count,
+                bytes=request.bytes_received,
+            )
 
-        while retry_count < self.MAX_RETRIES:
-            try:
-                if method == "GET":
-                    response = self.client.get(full_url, headers=headers)
-                else:
-                    response = self.client.post(
-                        full_url, headers=headers, data=json.dumps(payload)
-                    )
+    def _cassetteMiddleware(self, request, call_next):
+        cassette = self.cassette
+        if cassette is None or request.destination is not None:
+            return call_next(request)
+        if cassette.isReplaying:
+            result = cassette.replay(
+                request.method, request.url, request.payload, request.meta
+            )
+            if request.raw:
+                result["data"] = json.dumps(result["data"]).encode()
+                request.meta["content_encoding"] = IDENTITY
+            return result
+
+        result = call_next(request)
+        if result["meta"].get("cache") not in (FRESH, NOT_MODIFIED):
+            cassette.record(
+                request.method,
+                request.url,
+                request.payload,
+                result["meta"]["http_status"],
+                loadRawJSON(result) if request.raw else result["data"],
+            )
+        return result
 
-                meta["response_time_ms"] = round(
-                    (time.perf_counter() - start_time) * 1000, 2
+    def _cacheMiddleware(self, request, call_next):
+        if not request.conditional:
+            return call_next(request)
+        cache = self.response_cache
+        meta = request.meta
+        entry = request.cache_entry = cache.get(request.url)
+        if entry is not None:
+            if cache.isFresh(entry):
+                meta["status"] = "ok"
+                meta["cache"] = FRESH
+                self.instrumentation.emit(
+                    "cache", endpoint=request.endpoint, result=FRESH
                 )
-                meta["http_status"] = response.status_code
-                meta["retry_count"] = retry_count
-
-                if 200 <= response.status_code < 300:
-                    meta["status"] = "ok"
-                    return {"data": response.json(), "meta": meta}
-                elif response.status_code == 400:
-                    meta["status"] = "error"
-                    raise NepseInvalidClientRequest("Bad Request", meta=meta)
-                elif response.status_code == 401:
-                    meta["status"] = "error"
-                    raise NepseTokenExpired("Token Expired", meta=meta)
-                elif response.status_code == 502:
-                    meta["status"] = "error"
-                    raise NepseInvalidServerResponse("Bad Gateway", meta=meta)
-                else:
-                    meta["status"] = "error"
-                    raise NepseNetworkError(f"HTTP {response.status_code}", meta=meta)
+                with phase("decode"):
+                    data = cache.load(entry)
+                return {"data": data, "meta": meta}
+            request.addHeaders(cache.conditionalHeaders(entry))
+
+        result = call_next(request)
+        if meta["http_status"] == 304:
+            with phase("decode"):
+                result["data"] = cache.notModified(request.url, request.cache_entry)
+            meta["cache"] = NOT_MODIFIED
+        else:
+            with phase("decode"):
+                data, meta["cache"] = cache.parse(request.url, request.response)
+            result["data"] = data
+        self.instrumentation.emit(
+            "cache", endpoint=request.endpoint, result=meta["cache"]
+        )
+        return result
 
+    def _scheduleMiddleware(self, request, call_next):
+        if not request.authorized:
+            # the token handshake runs while the refresh lock is held, and slot
+            # holders retrying a 401 wait on that lock; queueing it for a slot
+            # could deadlock them, so it is not scheduled
+            return call_next(request)
+        with self._requestSlot(request.endpoint) as (priority, waited):
+            if priority is not None:
+                request.meta["priority"] = priority
+                self.instrumentation.emit(
+                    "schedule",
+                    endpoint=request.endpoint,
+                    priority=priority,
+                    wait_ms=round(waited * 1000, 2),
+                )
+            return call_next(request)
+
+    def _retryMiddleware(self, request, call_next):
+        while True:
+            try:
+                return call_next(request)
             except (
                 httpx.RemoteProtocolError,
                 httpx.ReadError,
                 httpx.ConnectError,
                 NepseTokenExpired,
             ) as e:
-                retry_count += 1
-                last_exception = e
-
-                if isinstance(e, NepseTokenExpired) and retry_count < self.MAX_RETRIES:
-                    self.token_manager.update()
-                    continue
-                elif retry_count >= self.MAX_RETRIES:
-                    meta["retry_count"] = retry_count
-                    meta["status"] = "error"
+                if isinstance(e, NepseTokenExpired) and not request.authorized:
+                    # the token request itself was refused, a refresh cannot help
+                    raise
+                request.retry_count += 1
+                self.instrumentation.emit(
+                    "retry",
+                    endpoint=request.endpoint,
+                    method=request.method,
+                    reason=type(e).__name__,
+                )
+                if request.retry_count >= self.MAX_RETRIES:
+                    request.meta["retry_count"] = request.retry_count
+                    request.meta["status"] = "error"
                     raise NepseNetworkError(
-                        f"Failed after {retry_count} retries: {str(e)}", meta=meta
+                        f"Failed after {request.retry_count} retries: {str(e)}",
+                        meta=request.meta,
                     ) from e
-                # Otherwise loop continues for network errors
+                if isinstance(e, NepseTokenExpired):
+                    # _authMiddleware picks the new token up on the next attempt
+                    self.token_manager.update()
 
-    def requestGETAPI(self, url, include_authorization_headers=True):
-        headers = (
-            self.getAuthorizationHeaders()
-            if include_authorization_headers
-            else self.headers
+    def _authMiddleware(self, request, call_next):
+        """Swap the Authorization header and payload id after a token rotation"""
+        access_token = self.token_manager.access_token
+        if request.authorized and access_token not in (None, request.access_token):
+            request.access_token = access_token
+            request.headers = self.request_builder.headers(access_token)
+            if request.extra_headers:
+                request.headers = {**request.headers, **request.extra_headers}
+            if request.payload_generator is not None:
+                payload_id = request.payload_generator()
+                request.payload = {"id": payload_id}
+                request.body = self.request_builder.payloadBody(payload_id)
+                request.meta["request"]["payload"] = request.payload
+        return call_next(request)
+
+    def _send(self, request):
+        """Innermost handler: put the request on the wire and map the status"""
+        meta = request.meta
+        with phase("network"):
+            if request.raw:
+                response, body = self._streamRaw(request)
+                received = len(body)
+            elif request.destination is not None:
+                response, received = self._streamToFile(request)
+            else:
+                if request.method != "GET":
+                    response = self.client.post(
+                        request.url, headers=request.headers, content=request.body
+                    )
+                elif (
+                    self.hedging is not None
+                    and self.hedge_client is not None
+                    and self.hedging.isHedgeable(request.method, request.endpoint)
+                ):
+                    response = self._hedgedGet(
+                        request.url, request.headers, request.endpoint
+                    )
+                else:
+                    response = self.client.get(request.url, headers=request.headers)
+                body = response.content
+                received = len(body)
+
+        request.response = response
+        meta["response_time_ms"] = round(
+            (time.perf_counter() - request.start_time) * 1000, 2
         )
-        return self._execute_request("GET", url, headers)
+        meta["http_status"] = response.status_code
+        meta["retry_count"] = request.retry_count
+        request.bytes_received += received
+
+        status_code = response.status_code
+        if 200 <= status_code < 300 or (
+            status_code == 304 and request.cache_entry is not None
+        ):
+            meta["status"] = "ok"
+            if request.raw:
+                meta["content_encoding"] = response.headers.get(
+                    "Content-Encoding", IDENTITY
+                )
+                meta["content_type"] = response.headers.get("Content-Type")
+                return {"data": body, "meta": meta}
+            if request.destination is not None:
+                data = {"path": request.destination, "bytes": received}
+                return {"data": data, "meta": meta}
+            # conditional responses are parsed by _cacheMiddleware
+            if request.conditional:
+                return {"data": None, "meta": meta}
+            with phase("decode"):
+                data = response.json()
+            return {"data": data, "meta": meta}
+
+        meta["status"] = "error"
+        if status_code == 400:
+            raise NepseInvalidClientRequest("Bad Request", meta=meta)
+        elif status_code == 401:
+            raise NepseTokenExpired("Token Expired", meta=meta)
+        elif status_code == 502:
+            raise NepseInvalidServerResponse("Bad Gateway", meta=meta)
+        raise NepseNetworkError(f"HTTP {status_code}", meta=meta)
+
+    def _requestSlot(self, endpoint):
+        if self.scheduler is None:
+            return contextlib.nullcontext((None, 0.0))
+        return self.scheduler.slot(endpoint)
+
+    def _hedgedGet(self, full_url, headers, endpoint):
+        """GET that is repeated on self.hedge_client when the first send is slow"""
+        response, outcome = self.hedging.run(
+            endpoint,
+            lambda: self.client.get(full_url, headers=headers),
+            lambda: self.hedge_client.get(full_url, headers=headers),
+        )
+        if outcome != NOT_HEDGED:
+            self.instrumentation.emit("hedge", endpoint=endpoint, outcome=outcome)
+        return response
+
+    def _streamToFile(self, request):
+        """Send a GET and write the decoded body into request.destination
+
+        The file appears under its name only once the body is complete.
+        """
+        temporary_path = f"{request.destination}.part"
+        try:
+            with self.client.stream(
+                "GET", request.url, headers=request.headers
+            ) as response:
+                if not 200 <= response.status_code < 300:
+                    return response, len(response.read())
+                written = 0
+                with open(temporary_path, "wb") as destination_file:
+                    for chunk in response.iter_bytes(self.DOWNLOAD_CHUNK_SIZE):
+                        written += destination_file.write(chunk)
+            os.replace(temporary_path, request.destination)
+            return response, written
+        finally:
+            # left behind only when the download failed part way
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def _streamRaw(self, request):
+        """Send a request and read the body without decoding it"""
+        with self.client.stream(
+            request.method, request.url, headers=request.headers, content=request.body
+        ) as response:
+            return response, b"".join(response.iter_raw())
+
+    def requestGETAPI(
+        self, url, include_authorization_headers=True, conditional=False, raw=False
+    ):
+        return self._execute_request(
+            "GET",
+            url,
+            authorized=include_authorization_headers,
+            conditional=conditional,
+            raw=raw,
+        )
+
+    def requestPOSTAPI(self, url, payload_generator, raw=False):
+        return self._execute_request(
+            "POST", url, payload_generator=payload_generator, raw=raw
+        )
+
+    def _getSecurityRegistry(self, force_update=False):
+        registry = self.security_registry
+        if force_update or registry.isStale():
+            registry.update(
+                self.getCompanyList()["data"], self.getSecurityList()["data"]
+            )
+        return registry
 
-    def requestPOSTAPI(self, url, payload_generator):
-        headers = self.getAuthorizationHeaders()
-        payload = {"id": payload_generator()}
-        return self._execute_request("POST", url, headers, payload)
+    def _getSecurityID(self, symbol):
+        security_id = self._getSecurityRegistry().security_id_by_symbol.get(symbol)
+        if security_id is None:
+            raise NepseInvalidClientRequest(f"Symbol {symbol} not found")
+        return security_id
+
+    def _registryResult(self, data, **extra_meta):
+        return {
+            "data": data,
+            "meta": {
+                "source": "nepalstock",
+                "fetched_at": datetime.now(timezone.utc).isoformat(),
+                "status": "ok",
+                "http_status": 200,
+                "request_id": str(uuid.uuid4()),
+                **extra_meta,
+            },
+        }
 
     ############################################### PUBLIC METHODS###############################################
     def getCompaniesNews(self):
         return self.requestGETAPI(
             url=self.api_end_points["companies_news_url"],
+            conditional=True,
         )
 
     def getCompanyFinancialReports(
@@ -426,22 +852,25 @@ class NepseScraper(_Nepse):
         symbol: str,
     ):
         symbol = symbol.upper()
-        company_id_result = self.getSecurityIDKeyMap()
-        # company_id_result is now {"data": {...}, "meta": {...}}
-        company_id_map = company_id_result["data"]
+        company_id = self._getSecurityRegistry().security_id_by_symbol.get(symbol)
 
-        if symbol not in company_id_map:
+        if company_id is None:
             meta = _create_meta_skeleton("GET", "N/A", {})
             meta["status"] = "error"
             raise NepseInvalidClientRequest(f"Symbol {symbol} not found", meta=meta)
 
-        company_id = company_id_map[symbol]
         url = f"{self.api_end_points['company_financial_report_url']}{company_id}"
         return self.requestGETAPI(url=url)
 
+    def downloadFile(self, file_path, destination):
+        """Stream a news or report attachment (its filePath) into `destination`"""
+        url = f"{self.api_end_points['file_download_url']}{quote(file_path)}"
+        return self._execute_request("GET", url, destination=destination)
+
     def getCompanyList(self):
         result = self.requestGETAPI(
             url=self.api_end_points["company_list_url"],
+            conditional=True,
         )
         # Cache the data portion for internal use, keep wrapped for return
         self.company_list = result["data"]
@@ -450,104 +879,44 @@ class NepseScraper(_Nepse):
     def getSecurityList(self):
         result = self.requestGETAPI(
             url=self.api_end_points["security_list_url"],
+            conditional=True,
         )
         self.security_list = result["data"]
         return result
 
     def getSectorScrips(self):
-        if self.sector_scrips is None:
-            company_list_result = self.getCompanyList()
-            company_info_dict = {
-                company_info["symbol"]: company_info
-                for company_info in company_list_result["data"]
-            }
-
-            security_list_result = self.getSecurityList()
-            sector_scrips = defaultdict(list)
-
-            for security_info in security_list_result["data"]:
-                symbol = security_info["symbol"]
-                if company_info_dict.get(symbol):
-                    company_info = company_info_dict[symbol]
-                    sector_name = company_info["sectorName"]
-                    sector_scrips[sector_name].append(symbol)
-                else:
-                    sector_scrips["Promoter Share"].append(symbol)
-
-            self.sector_scrips = dict(sector_scrips)
-
-        # Construct aggregate metadata
-        fetched_at = datetime.now(timezone.utc).isoformat()
-        return {
-            "data": dict(self.sector_scrips),
-            "meta": {
-                "source": "nepalstock",
-                "fetched_at": fetched_at,
-                "status": "ok",
-                "http_status": 200,
-                "request_id": str(uuid.uuid4()),
-                "notes": "Derived from company_list and security_list",
-            },
-        }
+        return self._registryResult(
+            self._getSecurityRegistry().getSectorScrips(),
+            notes="Derived from company_list and security_list",
+        )
 
     def getCompanyIDKeyMap(self, force_update=False):
-        if self.company_symbol_id_keymap is None or force_update:
-            company_list_result = self.getCompanyList()
-            company_list = company_list_result["data"]
-            self.company_symbol_id_keymap = {
-                company["symbol"]: company["id"] for company in company_list
-            }
-
-        return {
-            "data": self.company_symbol_id_keymap,
-            "meta": {
-                "source": "nepalstock",
-                "fetched_at": datetime.now(timezone.utc).isoformat(),
-                "status": "ok",
-                "http_status": 200,
-                "request_id": str(uuid.uuid4()),
-            },
-        }
+        return self._registryResult(
+            self._getSecurityRegistry(force_update).company_id_by_symbol
+        )
 
     def getSecurityIDKeyMap(self, force_update=False):
-        if self.security_symbol_id_keymap is None or force_update:
-            security_list_result = self.getSecurityList()
-            security_list = security_list_result["data"]
-            self.security_symbol_id_keymap = {
-                security["symbol"]: security["id"] for security in security_list
-            }
-
-        return {
-            "data": self.security_symbol_id_keymap,
-            "meta": {
-                "source": "nepalstock",
-                "fetched_at": datetime.now(timezone.utc).isoformat(),
-                "status": "ok",
-                "http_status": 200,
-                "request_id": str(uuid.uuid4()),
-            },
-        }
+        return self._registryResult(
+            self._getSecurityRegistry(force_update).security_id_by_symbol
+        )
 
     def getCompanyPriceVolumeHistory(self, symbol, start_date=None, end_date=None):
         end_date = end_date if end_date else date.today()
         start_date = start_date if start_date else (end_date - timedelta(days=365))
         symbol = symbol.upper()
 
-        id_map_result = self.getSecurityIDKeyMap()
-        if symbol not in id_map_result["data"]:
-            raise NepseInvalidClientRequest(f"Symbol {symbol} not found")
-
-        company_id = id_map_result["data"][symbol]
-        url = f"{self.api_end_points['company_price_volume_history']}{company_id}?size=500&startDate={start_date}&endDate={end_date}"
-        return self.requestGETAPI(url=url)
+        company_id = self._getSecurityID(symbol)
+        url = f"{self.api_end_points['company_price_volume_history']}{company_id}?startDate={start_date}&endDate={end_date}"
+        return self._requestAllPages(
+            "company_price_volume_history",
+            lambda page_size, page_num: self.requestGETAPI(
+                url=_paged_url(url, page_size, page_num)
+            ),
+        )
 
     def getDailyScripPriceGraph(self, symbol):
         symbol = symbol.upper()
-        id_map_result = self.getSecurityIDKeyMap()
-        if symbol not in id_map_result["data"]:
-            raise NepseInvalidClientRequest(f"Symbol {symbol} not found")
-
-        company_id = id_map_result["data"][symbol]
+        company_id = self._getSecurityID(symbol)
         return self.requestPOSTAPI(
             url=f"{self.api_end_points['company_daily_graph']}{company_id}",
             payload_generator=self.getPOSTPayloadIDForScrips,
@@ -555,154 +924,340 @@ class NepseScraper(_Nepse):
 
     def getCompanyDetails(self, symbol):
         symbol = symbol.upper()
-        id_map_result = self.getSecurityIDKeyMap()
-        if symbol not in id_map_result["data"]:
-            raise NepseInvalidClientRequest(f"Symbol {symbol} not found")
-
-        company_id = id_map_result["data"][symbol]
+        company_id = self._getSecurityID(symbol)
         return self.requestPOSTAPI(
             url=f"{self.api_end_points['company_details']}{company_id}",
             payload_generator=self.getPOSTPayloadIDForScrips,
         )
 
-    def getFloorSheet(self, delay: float = 0.2):
-        """Aggregated scraper with request chain for paginated floorsheet"""
-        url = f"{self.api_end_points['floor_sheet']}?size={self.floor_sheet_size}&sort=contractId,desc"
-
-        all_records = []
-        request_chain = []
-        total_start = time.perf_counter()
+    def _requestPaged(self, pagination_key, send, page_size=None):
+        """Call send(page_size) with the page size learned for `pagination_key`
 
-        # Initial request
-        first_result = self.requestPOSTAPI(
-            url=url,
-            payload_generator=self.getPOSTPayloadIDForFloorSheet,
+        While the endpoint is being probed a size the server rejects is retried
+        with the next smaller one. Returns (result, page size the server used).
+        """
+        pagination = self.pagination
+        page_size = page_size or pagination.getPageSize(pagination_key)
+        while True:
+            try:
+                result = send(page_size)
+                break
+            except NepseInvalidClientRequest:
+                if not (
+                    pagination.isProbing(pagination_key)
+                    and page_size > pagination.sizes[0]
+                ):
+                    # a 400 at every size is not about the size
+                    pagination.abandonRejection(pagination_key)
+                    raise
+                pagination.observeError(pagination_key, page_size, rejected=True)
+                page_size = pagination.getPageSize(pagination_key)
+            except (NepseNetworkError, NepseInvalidServerResponse):
+                pagination.observeError(pagination_key)
+                raise
+
+        returned_size = _returned_page_size(result)
+        pagination.observe(
+            pagination_key,
+            page_size,
+            returned_size,
+            result["meta"].get("response_time_ms", 0),
         )
+        return result, min(page_size, returned_size or page_size)
+
+    def _requestAllPages(self, pagination_key, send):
+        """Fetch every page of a Spring paged endpoint and merge their content
+
+        send(page_size, page_num) returns one page. The size learned for
+        `pagination_key` is used for the first page and kept for the rest, so
+        the page boundaries stay fixed even when the controller changes its
+        size in between.
+        """
+        result, page_size = self._requestPaged(
+            pagination_key, lambda size: send(size, 0)
+        )
+        data = result["data"]
+        if not isinstance(data, dict) or "content" not in data:
+            return result
 
-        first_data = first_result["data"]
-        request_chain.append(first_result["meta"])
-
-        if "floorsheets" not in first_data:
-            # Empty or invalid response
-            return {
-                "data": [],
-                "meta": {
-                    **first_result["meta"],
-                    "pagination": {
-                        "total_records": 0,
-                        "pages_fetched": 1,
-                        "is_final": True,
-                    },
-                    "request_chain": request_chain,
-                },
-            }
-
-        all_records.extend(first_data["floorsheets"]["content"])
-        total_pages = first_data["floorsheets"]["totalPages"]
-
+        content = list(data["content"])
+        pages_fetched = 1
+        total_pages = data.get("totalPages") or 1
         for page_num in range(1, total_pages):
-            page_result = self.requestPOSTAPI(
-                url=f"{url}&page={page_num}",
-                payload_generator=self.getPOSTPayloadIDForFloorSheet,
+            page, _ = self._requestPaged(
+                pagination_key,
+                lambda size: send(size, page_num),
+                page_size=page_size,
             )
+            page_content = page["data"].get("content") or []
+            content.extend(page_content)
+            pages_fetched += 1
+            if not page_content:
+                break
+
+        if pages_fetched > 1:
+            data = {
+                **data,
+                "content": content,
+                "numberOfElements": len(content),
+                "last": True,
+            }
+        result = {"data": data, "meta": dict(result["meta"])}
+        result["meta"]["pagination"] = {
+            "total_records": len(content),
+            "pages_fetched": pages_fetched,
+            "page_size": page_size,
+            "is_final": len(content) >= data.get("totalElements", len(content)),
+        }
+        return result
 
-            page_data = page_result["data"]
-            request_chain.append(page_result["meta"])
+    def _getFloorSheetURL(self, symbol=None, business_date=None, page_size=500):
+        if symbol is None:
+            return f"{self.api_end_points['floor_sheet']}?size={page_size}&sort=contractId,desc"
 
-            if "floorsheets" in page_data and "content" in page_data["floorsheets"]:
-                all_records.extend(page_data["floorsheets"]["content"])
+        company_id = self._getSecurityID(symbol)
+        return f"{self.api_end_points['company_floorsheet']}{company_id}?businessDate={business_date}&size={page_size}&sort=contractid,desc"
 
-            time.sleep(delay)
-        total_time = round((time.perf_counter() - total_start) * 1000, 2)
-        total_retries = sum(m.get("retry_count", 0) for m in request_chain)
+    def _getFloorSheetPage(self, url, page_num, raw=False):
+        page_result = self.requestPOSTAPI(
+            url=f"{url}&page={page_num}" if page_num else url,
+            payload_generator=self.getPOSTPayloadIDForFloorSheet,
+            raw=raw,
+        )
+        if raw:
+            # only the first page is parsed, to learn totalPages
+            total_pages = page_size = None
+            if page_num == 0:
+                floorsheets = (loadRawJSON(page_result) or {}).get("floorsheets")
+                total_pages = (floorsheets or {}).get("totalPages", 0)
+                page_size = (floorsheets or {}).get("size")
+            return {
+                "page": page_num,
+                "total_pages": total_pages,
+                "page_size": page_size,
+                "records": None,
+                "body": page_result["data"],
+                "meta": page_result["meta"],
+            }
 
+        page_data = page_result["data"] or {}
+        floorsheets = page_data.get("floorsheets") or {}
         return {
-            "data": all_records,
-            "meta": {
-                "source": "nepalstock",
-                "fetched_at": datetime.now(timezone.utc).isoformat(),
-                "status": "ok",
-                "http_status": 200,
-                "request_id": str(uuid.uuid4()),
-                "response_time_ms": total_time,
-                "retry_count": total_retries,
-                "request": request_chain[0]["request"] if request_chain else {},
-                "pagination": {
-                    "total_records": len(all_records),
-                    "pages_fetched": len(request_chain),
-                    "is_final": True,
-                },
-                "request_chain": request_chain,
-            },
+            "page": page_num,
+            "total_pages": floorsheets.get("totalPages", 0),
+            "page_size": floorsheets.get("size"),
+            "records": floorsheets.get("content", []),
+            "meta": page_result["meta"],
         }
 
-    def getFloorSheetOf(self, symbol, business_date=None):
-        symbol = symbol.upper()
-        business_date = (
-            date.fromisoformat(f"{business_date}") if business_date else date.today()
-        )
-
-        id_map_result = self.getSecurityIDKeyMap()
-        if symbol not in id_map_result["data"]:
-            raise NepseInvalidClientRequest(f"Symbol {symbol} not found")
+    def iterFloorSheetPages(
+        self,
+        symbol=None,
+        business_date=None,
+        pages=None,
+        workers=1,
+        delay=0,
+        raw=False,
+        page_size=None,
+        cursor=None,
+        page_retries=0,
+    ):
+        """Yield floorsheet pages as {"page", "total_pages", "records", "meta"}
+
+        The whole market floorsheet is paged when `symbol` is None, otherwise the
+        floorsheet of that symbol on `business_date`. Page 0 is fetched first to
+        learn totalPages unless an explicit list of `pages` is given (e.g. when
+        resuming). With workers > 1 the remaining pages are fetched concurrently
+        and yielded in completion order. With `raw` the records are not parsed;
+        each page carries its still encoded "body" instead (see _getFloorSheetPage).
+
+        The page size comes from self.pagination unless `page_size` is given; it
+        must stay the same when resuming with explicit `pages`.
+
+        A failed page is retried on its own `page_retries` times once the request
+        level retries are exhausted. Given a PageCursor, pages that still fail are
+        recorded as missing instead of aborting the pull, and a cursor that
+        already knows totalPages resumes with its pending pages only. Before
+        resuming, the last completed page is fetched again and must still end on
+        the contractId the cursor recorded for it; if the floorsheet shifted in
+        between, NepseCursorMismatch is raised instead of yielding pages that
+        would duplicate or skip rows.
+        """
+        if symbol is not None:
+            symbol = symbol.upper()
+            business_date = (
+                date.fromisoformat(f"{business_date}")
+                if business_date
+                else date.today()
+            )
+            # fail on an unknown symbol before any page size is probed
+            self._getSecurityID(symbol)
+        pagination_key = "floor_sheet" if symbol is None else "company_floorsheet"
 
-        company_id = id_map_result["data"][symbol]
+        if cursor is not None:
+            cursor_key = (
+                f"{pagination_key}:{symbol or ''}:{business_date or date.today()}"
+            )
+            if cursor.key is None:
+                cursor.key = cursor_key
+            elif cursor.key != cursor_key:
+                raise NepseInvalidClientRequest(
+                    f"Cursor of {cursor.key} cannot resume {cursor_key}"
+                )
+            page_size = page_size or cursor.page_size
+            if pages is None and cursor.total_pages is not None:
+                self._checkCursorBoundary(cursor, symbol, business_date, pagination_key)
+            pages = pages if pages is not None else cursor.pendingPages()
+
+        def fetch(page_num, size):
+            error = None
+            for attempt in range(page_retries + 1):
+                if attempt:
+                    with phase("backoff"):
+                        time.sleep(self.PAGE_RETRY_BACKOFF * 2 ** (attempt - 1))
+                try:
+                    page, used_size = self._requestPaged(
+                        pagination_key,
+                        lambda requested: self._getFloorSheetPage(
+                            self._getFloorSheetURL(symbol, business_date, requested),
+                            page_num,
+                            raw,
+                        ),
+                        size,
+                    )
+                    # later pages must use the size the server applied to page 0
+                    page["page_size"] = used_size
+                    return page_num, page, None
+                except (
+                    NepseNetworkError,
+                    NepseInvalidServerResponse,
+                    httpx.TransportError,
+                ) as e:
+                    error = e
+            return page_num, None, error
+
+        def settle(page_num, page, error):
+            if error is not None:
+                if cursor is None:
+                    raise error
+                cursor.markMissing(page_num)
+                return None
+            if cursor is not None:
+                if cursor.total_pages is None and page["total_pages"] is not None:
+                    cursor.total_pages = page["total_pages"]
+                cursor.page_size = cursor.page_size or page["page_size"]
+                cursor.markCompleted(page_num, page["records"])
+            return page
+
+        if pages is None:
+            page_num, first_page, error = fetch(0, page_size)
+            if error is not None:
+                # without page 0 the number of pages is unknown
+                raise error
+            page_size = first_page["page_size"]
+            yield settle(page_num, first_page, None)
+            pages = range(1, first_page["total_pages"])
+        page_size = page_size or self.pagination.getPageSize(pagination_key)
+
+        if workers <= 1:
+            for page_num in pages:
+                page = settle(*fetch(page_num, page_size))
+                if page is not None:
+                    yield page
+                if delay:
+                    with phase("page_delay"):
+                        time.sleep(delay)
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            page_iter = iter(pages)
+            # copy the context so a requestPriority block covers the workers too
+            in_flight = {
+                executor.submit(
+                    contextvars.copy_context().run, fetch, page_num, page_size
+                )
+                for page_num in itertools.islice(page_iter, workers * 2)
+            }
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for page_num in itertools.islice(page_iter, 1):
+                        in_flight.add(
+                            executor.submit(
+                                contextvars.copy_context().run,
+                                fetch,
+                                page_num,
+                                page_size,
+                            )
+                        )
+                    page = settle(*future.result())
+                    if page is not None:
+                        yield page
+
+    def _checkCursorBoundary(self, cursor, symbol, business_date, pagination_key):
+        """Raise NepseCursorMismatch when the cursor's pages no longer line up"""
+        anchor = max(
+            (page for page in cursor.completed if cursor.contract_ids.get(page)),
+            default=None,
+        )
+        if anchor is None:
+            # raw pulls record no contract ids, there is nothing to compare
+            return
+        page, _ = self._requestPaged(
+            pagination_key,
+            lambda requested: self._getFloorSheetPage(
+                self._getFloorSheetURL(symbol, business_date, requested), anchor
+            ),
+            cursor.page_size,
+        )
+        records = page["records"]
+        contract_id = records[-1].get("contractId") if records else None
+        if (
+            contract_id != cursor.contract_ids[anchor]
+            or page["total_pages"] != cursor.total_pages
+        ):
+            raise NepseCursorMismatch(
+                f"Page {anchor} of {cursor.key} now ends on contract {contract_id} "
+                f"instead of {cursor.contract_ids[anchor]}, the floorsheet changed "
+                "since the cursor was saved",
+                meta=page["meta"],
+            )
 
+    def _collectFloorSheet(self, page_iter, cursor=None, **extra_meta):
         all_records = []
         request_chain = []
         total_start = time.perf_counter()
 
-        url_base = f"{self.api_end_points['company_floorsheet']}{company_id}?businessDate={business_date}&size={self.floor_sheet_size}&sort=contractid,desc"
-
-        # First request
-        first_result = self.requestPOSTAPI(
-            url=url_base,
-            payload_generator=self.getPOSTPayloadIDForFloorSheet,
-        )
-
-        request_chain.append(first_result["meta"])
-
-        if not first_result["data"]:
-            # Empty response
-            return {
-                "data": [],
-                "meta": {
-                    **first_result["meta"],
-                    "symbol": symbol,
-                    "business_date": str(business_date),
-                    "pagination": {
-                        "total_records": 0,
-                        "pages_fetched": 1,
-                        "is_final": True,
+        for page in page_iter:
+            request_chain.append(page["meta"])
+            if page["page"] == 0 and not page["total_pages"]:
+                # Empty or invalid response
+                return {
+                    "data": [],
+                    "meta": {
+                        **page["meta"],
+                        **extra_meta,
+                        "pagination": {
+                            "total_records": 0,
+                            "pages_fetched": 1,
+                            "is_final": True,
+                        },
+                        "request_chain": request_chain,
                     },
-                    "request_chain": request_chain,
-                },
-            }
-
-        first_content = first_result["data"]
-        all_records.extend(first_content["floorsheets"]["content"])
-        total_pages = first_content["floorsheets"]["totalPages"]
-
-        for page in range(1, total_pages):
-            page_result = self.requestPOSTAPI(
-                url=f"{url_base}&page={page}",
-                payload_generator=self.getPOSTPayloadIDForFloorSheet,
-            )
-            request_chain.append(page_result["meta"])
-
-            page_content = page_result["data"]
-            if "floorsheets" in page_content:
-                all_records.extend(page_content["floorsheets"]["content"])
+                }
+            with phase("accumulate"):
+                all_records.extend(page["records"])
 
         total_time = round((time.perf_counter() - total_start) * 1000, 2)
         total_retries = sum(m.get("retry_count", 0) for m in request_chain)
+        missing_pages = sorted(cursor.missing) if cursor is not None else []
 
-        return {
+        result = {
             "data": all_records,
             "meta": {
                 "source": "nepalstock",
                 "fetched_at": datetime.now(timezone.utc).isoformat(),
-                "status": "ok",
+                "status": "partial" if missing_pages else "ok",
                 "http_status": 200,
                 "request_id": str(uuid.uuid4()),
                 "response_time_ms": total_time,
@@ -711,20 +1266,49 @@ class NepseScraper(_Nepse):
                 "pagination": {
                     "total_records": len(all_records),
                     "pages_fetched": len(request_chain),
-                    "is_final": True,
+                    "missing_pages": missing_pages,
+                    "is_final": not missing_pages,
                 },
                 "request_chain": request_chain,
-                "symbol": symbol,
-                "business_date": str(business_date),
+                **extra_meta,
             },
         }
+        if cursor is not None:
+            result["meta"]["cursor"] = cursor.toDict()
+        return result
 
-    def getSymbolMarketDepth(self, symbol):
+    def getFloorSheet(self, delay: float = 0.2, cursor=None, page_retries=2):
+        """Aggregated scraper with request chain for paginated floorsheet
+
+        Pages that keep failing are listed in meta.pagination.missing_pages and
+        the call returns status "partial"; pass meta.cursor back (as a PageCursor)
+        to fetch just the pages that are still missing.
+        """
+        cursor = cursor if cursor is not None else PageCursor()
+        return self._collectFloorSheet(
+            self.iterFloorSheetPages(
+                delay=delay, cursor=cursor, page_retries=page_retries
+            ),
+            cursor=cursor,
+        )
+
+    def getFloorSheetOf(self, symbol, business_date=None, cursor=None, page_retries=2):
         symbol = symbol.upper()
-        id_map_result = self.getSecurityIDKeyMap()
-        if symbol not in id_map_result["data"]:
-            raise NepseInvalidClientRequest(f"Symbol {symbol} not found")
+        business_date = (
+            date.fromisoformat(f"{business_date}") if business_date else date.today()
+        )
+        cursor = cursor if cursor is not None else PageCursor()
+        return self._collectFloorSheet(
+            self.iterFloorSheetPages(
+                symbol, business_date, cursor=cursor, page_retries=page_retries
+            ),
+            cursor=cursor,
+            symbol=symbol,
+            business_date=str(business_date),
+        )
 
-        company_id = id_map_result["data"][symbol]
+    def getSymbolMarketDepth(self, symbol):
+        symbol = symbol.upper()
+        company_id = self._getSecurityID(symbol)
         url = f"{self.api_end_points['market-depth']}{company_id}/"
         return self.requestGETAPI(url=url)
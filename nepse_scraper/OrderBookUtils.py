@@ -0,0 +1,255 @@
+# nepse_scraper/OrderBookUtils.py
+
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+BUY = "buy"
+SELL = "sell"
+
+
+def _depthLists(result):
+    data = result["data"] if isinstance(result, dict) and "meta" in result else result
+    depth = (data or {}).get("marketDepth") or {}
+    return (
+        depth.get("buyMarketDepthList") or [],
+        depth.get("sellMarketDepthList") or [],
+    )
+
+
+def _levels(entries, descending, max_levels):
+    entries = sorted(
+        entries, key=lambda e: e["orderBookOrderPrice"], reverse=descending
+    )[:max_levels]
+    return (
+        array("d", (e["orderBookOrderPrice"] for e in entries)),
+        array("q", (int(e["quantity"]) for e in entries)),
+        array("l", (int(e.get("orderCount") or 0) for e in entries)),
+    )
+
+
+def _diff(side, old_price, old_quantity, new_price, new_quantity):
+    """Changed levels of one side as (side, price, old_quantity, new_quantity)"""
+    changes = []
+    old = dict(zip(old_price, old_quantity))
+    for price, quantity in zip(new_price, new_quantity):
+        previous = old.pop(price, 0)
+        if previous != quantity:
+            changes.append((side, price, previous, quantity))
+    changes.extend((side, price, quantity, 0) for price, quantity in old.items())
+    return changes
+
+
+class OrderBook:
+    """Array backed market depth ladder of a single symbol
+
+    Bids are kept best (highest) first and asks best (lowest) first as parallel
+    price/quantity/order-count arrays, so every statistic is a single pass over
+    the levels.
+    """
+
+    __slots__ = (
+        "symbol",
+        "max_levels",
+        "bid_price",
+        "bid_quantity",
+        "bid_orders",
+        "ask_price",
+        "ask_quantity",
+        "ask_orders",
+        "sequence",
+        "updated_at",
+    )
+
+    def __init__(self, symbol, max_levels=10):
+        self.symbol = symbol
+        self.max_levels = max_levels
+        self.bid_price, self.bid_quantity, self.bid_orders = (
+            array("d"),
+            array("q"),
+            array("l"),
+        )
+        self.ask_price, self.ask_quantity, self.ask_orders = (
+            array("d"),
+            array("q"),
+            array("l"),
+        )
+        self.sequence = 0
+        self.updated_at = None
+
+    def __repr__(self):
+        return (
+            f"<OrderBook: {self.symbol}, bid={self.bestBid()}, ask={self.bestAsk()}, "
+            f"levels={len(self.bid_price)}x{len(self.ask_price)}>"
+        )
+
+    def apply(self, result):
+        """Replace the ladder with a getSymbolMarketDepth snapshot
+
+        Returns the levels that changed since the previous snapshot as a list of
+        (side, price, old_quantity, new_quantity); removed levels have a
+        new_quantity of 0.
+        """
+        buys, sells = _depthLists(result)
+        bid_price, bid_quantity, bid_orders = _levels(buys, True, self.max_levels)
+        ask_price, ask_quantity, ask_orders = _levels(sells, False, self.max_levels)
+
+        changes = _diff(
+            BUY, self.bid_price, self.bid_quantity, bid_price, bid_quantity
+        ) + _diff(SELL, self.ask_price, self.ask_quantity, ask_price, ask_quantity)
+
+        self.bid_price, self.bid_quantity, self.bid_orders = (
+            bid_price,
+            bid_quantity,
+            bid_orders,
+        )
+        self.ask_price, self.ask_quantity, self.ask_orders = (
+            ask_price,
+            ask_quantity,
+            ask_orders,
+        )
+        self.sequence += 1
+        self.updated_at = time.time()
+        return changes
+
+    ############################################### STATISTICS ###############################################
+    def bestBid(self):
+        return self.bid_price[0] if self.bid_price else None
+
+    def bestAsk(self):
+        return self.ask_price[0] if self.ask_price else None
+
+    def spread(self):
+        if not (self.bid_price and self.ask_price):
+            return None
+        return self.ask_price[0] - self.bid_price[0]
+
+    def midPrice(self):
+        if not (self.bid_price and self.ask_price):
+            return None
+        return (self.ask_price[0] + self.bid_price[0]) / 2
+
+    def imbalance(self, levels=None):
+        """(bid - ask) / (bid + ask) quantity over the top `levels`, in [-1, 1]"""
+        bid = sum(self.bid_quantity[:levels])
+        ask = sum(self.ask_quantity[:levels])
+        total = bid + ask
+        return (bid - ask) / total if total else None
+
+    def cumulativeDepth(self, side=BUY):
+        """(price, cumulative quantity) pairs walking away from the touch"""
+        prices, quantities = (
+            (self.bid_price, self.bid_quantity)
+            if side == BUY
+            else (self.ask_price, self.ask_quantity)
+        )
+        total = 0
+        depth = []
+        for price, quantity in zip(prices, quantities):
+            total += quantity
+            depth.append((price, total))
+        return depth
+
+    def toDict(self):
+        return {
+            "symbol": self.symbol,
+            "sequence": self.sequence,
+            "updated_at": self.updated_at,
+            "bids": list(zip(self.bid_price, self.bid_quantity, self.bid_orders)),
+            "asks": list(zip(self.ask_price, self.ask_quantity, self.ask_orders)),
+        }
+
+    def memoryUsage(self):
+        """Approximate bytes held by the book"""
+        return sys.getsizeof(self) + sum(
+            sys.getsizeof(getattr(self, name))
+            for name in (
+                "bid_price",
+                "bid_quantity",
+                "bid_orders",
+                "ask_price",
+                "ask_quantity",
+                "ask_orders",
+            )
+        )
+
+
+class OrderBookTracker:
+    """Order books of many symbols kept within a fixed memory budget
+
+    Books are held in least recently updated order; once the approximate memory
+    of all books exceeds `memory_budget` bytes (or `max_books` is reached) the
+    stalest books are evicted.
+    """
+
+    def __init__(self, memory_budget=8 * 1024 * 1024, max_books=None, max_levels=10):
+        self.memory_budget = memory_budget
+        self.max_books = max_books
+        self.max_levels = max_levels
+        self.books = OrderedDict()
+        self.memory = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.books)
+
+    def __contains__(self, symbol):
+        return symbol in self.books
+
+    def __repr__(self):
+        return (
+            f"<OrderBookTracker: {len(self)} books, "
+            f"{self.memory}/{self.memory_budget} bytes>"
+        )
+
+    def getBook(self, symbol):
+        return self.books.get(symbol.upper())
+
+    def update(self, symbol, result):
+        """Apply a depth snapshot to the symbol's book; returns the changed levels"""
+        symbol = symbol.upper()
+        with self._lock:
+            book = self.books.pop(symbol, None)
+            if book is None:
+                book = OrderBook(symbol, self.max_levels)
+            else:
+                self.memory -= book.memoryUsage()
+            changes = book.apply(result)
+            self.books[symbol] = book
+            self.memory += book.memoryUsage()
+            self._evict()
+        return changes
+
+    def refresh(self, nepse, symbols):
+        """Fetch and apply the market depth of `symbols`; returns changes per symbol"""
+        changes = {}
+        for symbol in symbols:
+            changes[symbol] = self.update(symbol, nepse.getSymbolMarketDepth(symbol))
+        return changes
+
+    def _evict(self):
+        while len(self.books) > 1 and (
+            self.memory > self.memory_budget
+            or (self.max_books is not None and len(self.books) > self.max_books)
+        ):
+            _, book = self.books.popitem(last=False)
+            self.memory -= book.memoryUsage()
+            self.evictions += 1
+
+    def snapshot(self):
+        """Top of book statistics of every tracked symbol"""
+        with self._lock:
+            books = list(self.books.values())
+        return {
+            book.symbol: {
+                "best_bid": book.bestBid(),
+                "best_ask": book.bestAsk(),
+                "spread": book.spread(),
+                "imbalance": book.imbalance(),
+                "updated_at": book.updated_at,
+            }
+            for book in books
+        }
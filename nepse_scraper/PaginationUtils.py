@@ -0,0 +1,267 @@
+# nepse_scraper/PaginationUtils.py
+
+import json
+import os
+import threading
+from collections import deque
+
+PAGE_SIZES = (100, 250, 500, 1000, 2000, 5000, 10000)
+
+
+class PageSizeController:
+    """Per endpoint page size chosen from observed clamping, latency and errors
+
+    The first request of an endpoint asks for the largest candidate size; the
+    size the server reports back (it silently clamps `size`) becomes the
+    endpoint's ceiling, so later pulls use the fewest round trips the server
+    allows; a size the server rejects outright lowers the ceiling below it.
+    Afterwards the size steps down one candidate when the smoothed page latency
+    exceeds `target_latency_ms` or the recent error rate exceeds
+    `max_error_rate`, and steps back up once pages are fast again.
+
+    With a `path` the learned sizes are persisted and reused by later runs.
+    """
+
+    def __init__(
+        self,
+        sizes=PAGE_SIZES,
+        target_latency_ms=3000,
+        max_error_rate=0.1,
+        window=20,
+        path=None,
+    ):
+        self.sizes = tuple(sorted(sizes))
+        self.target_latency_ms = target_latency_ms
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.path = path
+        self.endpoints = {}
+        # endpoint -> (rejected size, size before it) until a smaller size succeeds
+        self._rejections = {}
+        self._outcomes = {}
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def __repr__(self):
+        sizes = {endpoint: state["size"] for endpoint, state in self.endpoints.items()}
+        return f"<PageSizeController: {sizes}>"
+
+    def _state(self, endpoint):
+        state = self.endpoints.get(endpoint)
+        if state is None:
+            state = self.endpoints[endpoint] = {
+                "size": self.sizes[-1],
+                "max_accepted": None,
+                "probed": False,
+                "latency_ms": {},
+            }
+        return state
+
+    def getPageSize(self, endpoint):
+        """Page size to request for the next pull of `endpoint`"""
+        with self._lock:
+            return self._state(endpoint)["size"]
+
+    def observe(self, endpoint, requested_size, returned_size, response_time_ms):
+        """Record a successful page; returned_size is the size the server used"""
+        changed = False
+        with self._lock:
+            state = self._state(endpoint)
+            outcomes = self._outcomes.setdefault(endpoint, deque(maxlen=self.window))
+            outcomes.append(True)
+
+            rejection = self._rejections.pop(endpoint, None)
+            if rejection is not None and requested_size < rejection[0]:
+                # the smaller size went through, so the larger one was refused
+                # for its size and not for e.g. a bad payload id
+                state["max_accepted"] = requested_size
+                changed = True
+            if returned_size and returned_size < requested_size:
+                if state["max_accepted"] != returned_size:
+                    state["max_accepted"] = returned_size
+                    state["size"] = min(state["size"], returned_size)
+                    changed = True
+            if not state["probed"]:
+                state["probed"] = changed = True
+
+            size = min(requested_size, state["max_accepted"] or requested_size)
+            previous = state["latency_ms"].get(f"{size}")
+            latency = (
+                response_time_ms
+                if previous is None
+                else 0.8 * previous + 0.2 * response_time_ms
+            )
+            state["latency_ms"][f"{size}"] = round(latency, 2)
+
+            if latency > self.target_latency_ms:
+                changed |= self._step(state, -1)
+            elif latency < self.target_latency_ms / 2:
+                changed |= self._step(state, 1)
+        if changed and self.path:
+            self.save()
+
+    def isProbing(self, endpoint):
+        with self._lock:
+            return not self._state(endpoint)["probed"]
+
+    def observeError(self, endpoint, requested_size=None, rejected=False):
+        """Record a failed page; a high error rate steps the size down
+
+        `rejected` marks a request that may have been refused because of its
+        size: the next smaller candidate is tried, and the endpoint's ceiling is
+        only lowered once that smaller size succeeds (see abandonRejection).
+        """
+        changed = False
+        with self._lock:
+            state = self._state(endpoint)
+            if rejected and requested_size:
+                smaller = [size for size in self.sizes if size < requested_size]
+                previous = self._rejections.get(endpoint, (None, state["size"]))[1]
+                self._rejections[endpoint] = (requested_size, previous)
+                state["size"] = smaller[-1] if smaller else requested_size
+            else:
+                changed = self._recordError(endpoint, state)
+        if changed and self.path:
+            self.save()
+
+    def abandonRejection(self, endpoint):
+        """Smaller sizes were refused as well: restore the size tried before"""
+        with self._lock:
+            rejection = self._rejections.pop(endpoint, None)
+            if rejection is not None:
+                self._state(endpoint)["size"] = rejection[1]
+
+    def _recordError(self, endpoint, state):
+        outcomes = self._outcomes.setdefault(endpoint, deque(maxlen=self.window))
+        outcomes.append(False)
+        errors = outcomes.count(False)
+        if errors > 1 and errors / len(outcomes) > self.max_error_rate:
+            outcomes.clear()
+            return self._step(state, -1)
+        return False
+
+    def _step(self, state, direction):
+        ceiling = state["max_accepted"] or self.sizes[-1]
+        allowed = [size for size in self.sizes if size < ceiling] + [ceiling]
+        current = min(state["size"], ceiling)
+        index = max(i for i, size in enumerate(allowed) if size <= current)
+        index = min(max(index + direction, 0), len(allowed) - 1)
+        if allowed[index] == state["size"]:
+            return False
+        state["size"] = allowed[index]
+        return True
+
+    ############################################### PERSISTENCE ###############################################
+    def save(self, path=None):
+        path = path or self.path
+        temporary_path = f"{path}.tmp"
+        with self._lock:
+            content = json.dumps({"version": 1, "endpoints": self.endpoints})
+        with open(temporary_path, "w") as pagination_file:
+            pagination_file.write(content)
+        os.replace(temporary_path, path)
+
+    def load(self, path=None):
+        with open(path or self.path, "r") as pagination_file:
+            content = json.load(pagination_file)
+        with self._lock:
+            self.endpoints.update(content["endpoints"])
+
+
+class PageCursor:
+    """Progress of a paged pull that can be saved and resumed
+
+    Tracks the completed and missing (failed after retries) pages together with
+    the last contiguous page and the contractId it ended on. A pull given a
+    cursor that already knows `total_pages` fetches only the pending pages, and
+    with the `page_size` kept on the cursor the page boundaries stay the same.
+    """
+
+    def __init__(
+        self,
+        key=None,
+        page_size=None,
+        total_pages=None,
+        completed=(),
+        missing=(),
+        contract_ids=None,
+    ):
+        self.key = key
+        self.page_size = page_size
+        self.total_pages = total_pages
+        self.completed = set(completed)
+        self.missing = set(missing)
+        self.contract_ids = {int(k): v for k, v in (contract_ids or {}).items()}
+
+    def __repr__(self):
+        return (
+            f"<PageCursor: {self.key}, page={self.page}, contract_id={self.contract_id}, "
+            f"completed={len(self.completed)}/{self.total_pages}, "
+            f"missing={sorted(self.missing)}>"
+        )
+
+    @property
+    def page(self):
+        """Last page of the contiguous completed run from page 0, -1 if none"""
+        page = -1
+        while page + 1 in self.completed:
+            page += 1
+        return page
+
+    @property
+    def contract_id(self):
+        """contractId of the last record on `page`"""
+        return self.contract_ids.get(self.page)
+
+    def isComplete(self):
+        return self.total_pages is not None and len(self.completed) >= self.total_pages
+
+    def pendingPages(self):
+        if self.total_pages is None:
+            return None
+        return [page for page in range(self.total_pages) if page not in self.completed]
+
+    def markCompleted(self, page, records=None):
+        self.completed.add(page)
+        self.missing.discard(page)
+        if records:
+            self.contract_ids[page] = records[-1].get("contractId")
+
+    def markMissing(self, page):
+        self.missing.add(page)
+
+    def toDict(self):
+        return {
+            "key": self.key,
+            "page_size": self.page_size,
+            "total_pages": self.total_pages,
+            "page": self.page,
+            "contract_id": self.contract_id,
+            "completed": sorted(self.completed),
+            "missing": sorted(self.missing),
+            "contract_ids": self.contract_ids,
+        }
+
+    @classmethod
+    def fromDict(cls, content):
+        return cls(
+            key=content["key"],
+            page_size=content["page_size"],
+            total_pages=content["total_pages"],
+            completed=content["completed"],
+            missing=content["missing"],
+            contract_ids=content.get("contract_ids"),
+        )
+
+    def save(self, path):
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w") as cursor_file:
+            json.dump(self.toDict(), cursor_file)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as cursor_file:
+            return cls.fromDict(json.load(cursor_file))
@@ -0,0 +1,317 @@
+# nepse_scraper/ProfileUtils.py
+
+import contextlib
+import contextvars
+import copy
+import cProfile
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+PROFILE_ENV = "NEPSE_SCRAPER_PROFILE"
+DEFAULT_PROFILE_DIRECTORY = "nepse-profile"
+MAX_OPERATIONS = 1000
+
+# methods that configure the scraper rather than fetch anything
+_UNPROFILED_PREFIXES = ("set", "load_", "init_", "profile")
+
+_operation = contextvars.ContextVar("nepse_profile_operation", default=None)
+_stack = contextvars.ContextVar("nepse_profile_stack", default=())
+_child_time = contextvars.ContextVar("nepse_profile_child_time", default=None)
+_NULL_PHASE = contextlib.nullcontext()
+
+
+def phase(name):
+    """Time the block as `name` inside the current profiled call
+
+    Returns a shared no-op context manager when nothing is being profiled, so
+    the hot paths can be instrumented unconditionally.
+    """
+    operation = _operation.get()
+    if operation is None:
+        return _NULL_PHASE
+    return operation.phase(name)
+
+
+def profileDirectoryFromEnv():
+    """Report directory requested through NEPSE_SCRAPER_PROFILE, or None
+
+    "1"/"true" selects DEFAULT_PROFILE_DIRECTORY, any other value is the
+    directory itself.
+    """
+    value = os.environ.get(PROFILE_ENV, "").strip()
+    if value.lower() in ("", "0", "false", "no"):
+        return None
+    if value.lower() in ("1", "true", "yes"):
+        return DEFAULT_PROFILE_DIRECTORY
+    return value
+
+
+class _ChildTime:
+    """Time spent in the nested phases of a phase"""
+
+    __slots__ = ("total", "_lock")
+
+    def __init__(self):
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, elapsed):
+        with self._lock:
+            self.total += elapsed
+
+
+class Operation:
+    """Timings of one public NepseScraper call and the phases inside it
+
+    Phase times are inclusive and summed over every thread that worked for the
+    call, so concurrent page fetches can add up to more than the wall time.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.wall_ms = None
+        self.peak_bytes = None
+        self.stats = None
+        self.phases = {}
+        self.stacks = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<Operation: {self.name}, {self.wall_ms} ms>"
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        path = (*_stack.get(), name)
+        token = _stack.set(path)
+        children = _ChildTime()
+        parent = _child_time.get()
+        child_token = _child_time.set(children)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start_time
+            _child_time.reset(child_token)
+            _stack.reset(token)
+            if parent is not None:
+                parent.add(elapsed)
+            self._record(name, path, elapsed, elapsed - children.total)
+
+    def _record(self, name, path, elapsed, self_time):
+        with self._lock:
+            entry = self.phases.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            self.stacks[path] = self.stacks.get(path, 0.0) + max(self_time, 0.0)
+
+    def toDict(self):
+        with self._lock:
+            phases = {
+                name: {"count": count, "ms": round(total * 1000, 3)}
+                for name, (count, total) in sorted(
+                    self.phases.items(), key=lambda item: -item[1][1]
+                )
+            }
+        return {
+            "operation": self.name,
+            "wall_ms": self.wall_ms,
+            "peak_kb": (
+                None if self.peak_bytes is None else round(self.peak_bytes / 1024, 1)
+            ),
+            "phases": phases,
+        }
+
+
+class Profiler:
+    """Opt-in per call profiling of a NepseScraper
+
+    While active, every public method called on the scraper is recorded as an
+    Operation with its wall time, the time spent in each phase (request,
+    network, decode, meta, payload, schedule_wait, token_refresh, token_parse,
+    accumulate, page_delay, backoff), its tracemalloc allocation peak and optionally a cProfile of
+    the calling thread. Public calls made from inside another one are phases of
+    the outer call. Generator methods (iterFloorSheetPages) are not wrapped,
+    their work is attributed to the call consuming them.
+
+    Only the last `max_operations` calls are kept in self.operations (report,
+    dump); summary and collapsedStacks are aggregated over every call.
+
+    The allocation peak is only reliable for calls that do not overlap: the
+    tracemalloc peak is process wide, so concurrently profiled calls reset and
+    share each other's peaks.
+
+    >>> with nepse.profile() as profiler:
+    ...     nepse.getFloorSheet()
+    >>> profiler.report()
+    """
+
+    def __init__(
+        self,
+        nepse,
+        memory=True,
+        cprofile=False,
+        directory=None,
+        max_operations=MAX_OPERATIONS,
+    ):
+        self.nepse = nepse
+        self.memory = memory
+        self.cprofile = cprofile
+        self.directory = directory
+        self.operations = deque(maxlen=max_operations)
+        self.calls = 0
+        self._summary = {}
+        self._stacks = {}
+        self._started_tracemalloc = False
+        self._wrapped = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<Profiler: {self.calls} operations>"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        for name, method in inspect.getmembers(type(self.nepse), inspect.isfunction):
+            if name.startswith("_") or name.startswith(_UNPROFILED_PREFIXES):
+                continue
+            if inspect.isgeneratorfunction(method):
+                continue
+            bound = getattr(self.nepse, name)
+            setattr(self.nepse, name, self._wrap(name, bound))
+            self._wrapped.append(name)
+        return self
+
+    def stop(self):
+        for name in self._wrapped:
+            # drop the instance attribute, the class method shows through again
+            delattr(self.nepse, name)
+        self._wrapped = []
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        if self.directory:
+            self.dump(self.directory)
+
+    def _wrap(self, name, method):
+        @functools.wraps(method)
+        def profiled(*args, **kwargs):
+            if _operation.get() is not None:
+                with phase(name):
+                    return method(*args, **kwargs)
+            return self._run(name, method, args, kwargs)
+
+        return profiled
+
+    def _run(self, name, method, args, kwargs):
+        operation = Operation(name)
+        token = _operation.set(operation)
+        stack_token = _stack.set((name,))
+        child_token = _child_time.set(None)
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        profile = cProfile.Profile() if self.cprofile else None
+        if profile is not None:
+            profile.enable()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            if profile is not None:
+                profile.disable()
+                operation.stats = profile
+            operation.wall_ms = round((time.perf_counter() - operation.start) * 1000, 3)
+            if tracing:
+                operation.peak_bytes = tracemalloc.get_traced_memory()[1] - baseline
+            _child_time.reset(child_token)
+            _stack.reset(stack_token)
+            _operation.reset(token)
+            with self._lock:
+                self.operations.append(operation)
+                self.calls += 1
+                self._aggregate(operation)
+
+    def _aggregate(self, operation):
+        """Add a finished call to the running summary and stacks"""
+        entry = self._summary.setdefault(
+            operation.name,
+            {"calls": 0, "wall_ms": 0.0, "peak_kb": None, "phases": {}},
+        )
+        entry["calls"] += 1
+        entry["wall_ms"] = round(entry["wall_ms"] + operation.wall_ms, 3)
+        if operation.peak_bytes is not None:
+            peak_kb = round(operation.peak_bytes / 1024, 1)
+            entry["peak_kb"] = max(entry["peak_kb"] or 0, peak_kb)
+        with operation._lock:
+            phases = list(operation.phases.items())
+            operation_stacks = list(operation.stacks.items())
+        for name, (count, total) in phases:
+            phase_entry = entry["phases"].setdefault(name, {"count": 0, "ms": 0.0})
+            phase_entry["count"] += count
+            phase_entry["ms"] = round(phase_entry["ms"] + total * 1000, 3)
+
+        stacks = self._stacks
+        # the self times of all phases add up to the time spent in phases
+        phase_time = sum(total for _, total in operation_stacks)
+        stacks[operation.name] = stacks.get(operation.name, 0.0) + max(
+            operation.wall_ms / 1000 - phase_time, 0.0
+        )
+        for path, total in operation_stacks:
+            key = ";".join(path)
+            stacks[key] = stacks.get(key, 0.0) + total
+
+    ############################################### REPORTS ###############################################
+    def report(self):
+        """One dict per call kept in self.operations, phases sorted by time"""
+        with self._lock:
+            operations = list(self.operations)
+        return [operation.toDict() for operation in operations]
+
+    def summary(self):
+        """Calls aggregated by method name"""
+        with self._lock:
+            return copy.deepcopy(self._summary)
+
+    def collapsedStacks(self):
+        """Lines in the folded format of flamegraph.pl/speedscope, microseconds"""
+        with self._lock:
+            stacks = dict(self._stacks)
+        return [
+            f"{path} {round(total * 1e6)}"
+            for path, total in sorted(stacks.items())
+            if round(total * 1e6)
+        ]
+
+    def dump(self, directory):
+        """Write report.json, stacks.folded and one .prof file per cProfiled call"""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "report.json"), "w") as report_file:
+            json.dump(
+                {"operations": self.report(), "summary": self.summary()},
+                report_file,
+                indent=1,
+            )
+        with open(os.path.join(directory, "stacks.folded"), "w") as stacks_file:
+            stacks_file.write("".join(f"{line}\n" for line in self.collapsedStacks()))
+        with self._lock:
+            operations = list(self.operations)
+        for index, operation in enumerate(operations):
+            if operation.stats is not None:
+                operation.stats.dump_stats(
+                    os.path.join(directory, f"{index:04d}-{operation.name}.prof")
+                )
+        return directory
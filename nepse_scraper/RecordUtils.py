@@ -0,0 +1,31 @@
+# nepse_scraper/RecordUtils.py
+
+NAN = float("nan")
+
+
+def resultRecords(result):
+    """Records of a result dict, its data or a plain list
+
+    Spring paged bodies ({"content": [...]}) are unwrapped to their content.
+    """
+    data = result["data"] if isinstance(result, dict) and "meta" in result else result
+    if isinstance(data, dict):
+        return data.get("content", [])
+    return data or []
+
+
+def floorSheetRecords(records):
+    """Records of a floorsheet list, a page yielded by iterFloorSheetPages or a
+    getFloorSheet/getFloorSheetOf result"""
+    if isinstance(records, dict):
+        records = records.get("records", records.get("data", []))
+    return records or []
+
+
+def fieldValue(record, *keys):
+    """First of `keys` that is set on the record, NaN when none is"""
+    for key in keys:
+        value = record.get(key)
+        if value is not None:
+            return value
+    return NAN
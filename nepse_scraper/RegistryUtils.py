@@ -0,0 +1,205 @@
+# nepse_scraper/RegistryUtils.py
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+
+PROMOTER_SHARE_SECTOR = "Promoter Share"
+
+
+class SecurityRegistry:
+    """Symbol/ID indexes built from the company and security lists
+
+    Holds symbol->security id, security id->symbol, symbol->company id,
+    company id<->security id and sector->symbols indexes. The registry is
+    considered stale once the business day rolls over or `ttl` seconds pass;
+    `update` applies only the entries that changed, and `version` is bumped
+    whenever anything did so that dependent caches can tell they are outdated.
+    Lookups read the indexes under the same lock `update` holds, so they never
+    see an update half applied.
+    """
+
+    def __init__(self, path=None, ttl=24 * 60 * 60):
+        self.path = path
+        self.ttl = ttl
+        self.updated_at = None
+        self.version = 0
+        self._lock = threading.Lock()
+
+        self.securities = {}
+        self.companies = {}
+        self.security_id_by_symbol = {}
+        self.symbol_by_security_id = {}
+        self.company_id_by_symbol = {}
+        self.symbol_by_company_id = {}
+        self.security_id_by_company_id = {}
+        self.company_id_by_security_id = {}
+        self.sector_by_symbol = {}
+        self.symbols_by_sector = defaultdict(list)
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        with self._lock:
+            return len(self.security_id_by_symbol)
+
+    def __contains__(self, symbol):
+        with self._lock:
+            return symbol in self.security_id_by_symbol
+
+    def __repr__(self):
+        return f"<SecurityRegistry: {len(self)} securities, version={self.version}>"
+
+    def isStale(self):
+        if self.updated_at is None:
+            return True
+        if date.fromtimestamp(self.updated_at) < date.today():
+            return True
+        return (time.time() - self.updated_at) >= self.ttl
+
+    ############################################### LOOKUPS ###############################################
+    def getSecurityID(self, symbol):
+        with self._lock:
+            return self.security_id_by_symbol.get(symbol)
+
+    def getSymbol(self, security_id):
+        with self._lock:
+            return self.symbol_by_security_id.get(security_id)
+
+    def getCompanyID(self, symbol):
+        with self._lock:
+            return self.company_id_by_symbol.get(symbol)
+
+    def getSector(self, symbol):
+        with self._lock:
+            return self.sector_by_symbol.get(symbol)
+
+    def getSectorScrips(self):
+        with self._lock:
+            return {
+                sector: list(symbols)
+                for sector, symbols in self.symbols_by_sector.items()
+            }
+
+    def getSecuritySectors(self):
+        """security id -> sector of every security"""
+        with self._lock:
+            return {
+                security_id: self.sector_by_symbol[symbol]
+                for security_id, symbol in self.symbol_by_security_id.items()
+            }
+
+    def symbols(self):
+        with self._lock:
+            return list(self.security_id_by_symbol)
+
+    ############################################### UPDATES ###############################################
+    def update(self, company_list, security_list):
+        """Apply fresh company/security lists, touching only changed entries
+
+        Returns a dict with the added, removed and changed symbols.
+        """
+        companies = {company["symbol"]: company for company in company_list}
+        securities = {security["symbol"]: security for security in security_list}
+
+        with self._lock:
+            removed = [s for s in self.securities if s not in securities]
+            added, changed = [], []
+            for symbol, security in securities.items():
+                previous = self.securities.get(symbol)
+                if previous is None:
+                    added.append(symbol)
+                # whole records, renames and sector moves count as changes too
+                elif previous != security or self.companies.get(
+                    symbol
+                ) != companies.get(symbol):
+                    changed.append(symbol)
+
+            for symbol in removed + changed:
+                self._remove(symbol)
+            for symbol in changed + added:
+                self._insert(securities[symbol], companies.get(symbol))
+
+            # company ids whose symbol has no security entry still get indexed
+            for symbol, company in companies.items():
+                if symbol not in securities:
+                    self.company_id_by_symbol[symbol] = company["id"]
+                    self.symbol_by_company_id[company["id"]] = symbol
+
+            self.updated_at = time.time()
+            if added or removed or changed:
+                self.version += 1
+
+        if self.path:
+            self.save()
+        return {"added": added, "removed": removed, "changed": changed}
+
+    def _insert(self, security, company):
+        symbol = security["symbol"]
+        security_id = security["id"]
+        self.securities[symbol] = security
+        self.security_id_by_symbol[symbol] = security_id
+        self.symbol_by_security_id[security_id] = symbol
+
+        if company is not None:
+            self.companies[symbol] = company
+            self.company_id_by_symbol[symbol] = company["id"]
+            self.symbol_by_company_id[company["id"]] = symbol
+            self.security_id_by_company_id[company["id"]] = security_id
+            self.company_id_by_security_id[security_id] = company["id"]
+            sector = company.get("sectorName")
+        else:
+            sector = PROMOTER_SHARE_SECTOR
+
+        self.sector_by_symbol[symbol] = sector
+        self.symbols_by_sector[sector].append(symbol)
+
+    def _remove(self, symbol):
+        security = self.securities.pop(symbol)
+        self.security_id_by_symbol.pop(symbol, None)
+        self.symbol_by_security_id.pop(security["id"], None)
+
+        company = self.companies.pop(symbol, None)
+        company_id = self.company_id_by_symbol.pop(symbol, None)
+        if company is not None or company_id is not None:
+            company_id = company["id"] if company is not None else company_id
+            self.symbol_by_company_id.pop(company_id, None)
+            self.security_id_by_company_id.pop(company_id, None)
+            self.company_id_by_security_id.pop(security["id"], None)
+
+        sector = self.sector_by_symbol.pop(symbol, None)
+        if sector is not None:
+            self.symbols_by_sector[sector].remove(symbol)
+            if not self.symbols_by_sector[sector]:
+                del self.symbols_by_sector[sector]
+
+    ############################################### PERSISTENCE ###############################################
+    def save(self, path=None):
+        path = path or self.path
+        temporary_path = f"{path}.tmp"
+        with self._lock:
+            content = {
+                "updated_at": self.updated_at,
+                "version": self.version,
+                "securities": list(self.securities.values()),
+                "companies": list(self.companies.values()),
+            }
+        with open(temporary_path, "w") as registry_file:
+            json.dump(content, registry_file)
+        os.replace(temporary_path, path)
+
+    def load(self, path=None):
+        with open(path or self.path, "r") as registry_file:
+            content = json.load(registry_file)
+        companies = {company["symbol"]: company for company in content["companies"]}
+        with self._lock:
+            for security in content["securities"]:
+                if security["symbol"] in self.securities:
+                    self._remove(security["symbol"])
+                self._insert(security, companies.get(security["symbol"]))
+            self.updated_at = content["updated_at"]
+            self.version = content["version"]
@@ -0,0 +1,168 @@
+# nepse_scraper/RequestUtils.py
+
+import json
+import time
+from functools import partial
+
+from nepse_scraper.MetricsUtils import endpointLabel
+
+# resolved ad hoc urls (ids, query strings) kept before the memo is reset
+_MAX_RESOLVED_URLS = 4096
+
+
+class RequestTemplate:
+    """An API_ENDPOINTS.json entry resolved against a base url"""
+
+    __slots__ = ("name", "path", "url", "endpoint")
+
+    def __init__(self, name, path, base_url):
+        self.name = name
+        self.path = path
+        self.url = f"{base_url}{path}"
+        self.endpoint = endpointLabel(self.url)
+
+    def __repr__(self):
+        return f"<RequestTemplate: {self.name} {self.endpoint}>"
+
+
+class RequestBuilder:
+    """Precompiled urls, headers and payload bodies of a NepseScraper
+
+    The static headers are merged once; the authorized variant is rebuilt only
+    when the access token changes, and POST bodies are produced from a fixed
+    prefix so only the payload id is formatted per request. The returned header
+    dicts are shared and must be copied before being modified.
+    """
+
+    def __init__(self, base_url, api_end_points, headers):
+        self.base_url = base_url
+        self.public_headers = dict(headers)
+        self.templates = {
+            name: RequestTemplate(name, path, base_url)
+            for name, path in api_end_points.items()
+        }
+        self._resolved = {}
+        self._seedResolved()
+        self._authorized = (None, None)
+
+    def __repr__(self):
+        return f"<RequestBuilder: {self.base_url}, templates={len(self.templates)}>"
+
+    def _seedResolved(self):
+        self._resolved = {
+            template.path: (template.url, template.endpoint)
+            for template in self.templates.values()
+        }
+
+    def resolve(self, url):
+        """(full url, endpoint label) of an API path or absolute url"""
+        resolved = self._resolved.get(url)
+        if resolved is None:
+            full_url = url if url.startswith("http") else f"{self.base_url}{url}"
+            resolved = (full_url, endpointLabel(full_url))
+            if len(self._resolved) >= _MAX_RESOLVED_URLS:
+                self._seedResolved()
+            self._resolved[url] = resolved
+        return resolved
+
+    def headers(self, access_token=None):
+        """Static headers, with Authorization when an access token is given"""
+        if access_token is None:
+            return self.public_headers
+        token, headers = self._authorized
+        if token != access_token:
+            headers = {
+                "Authorization": f"Salter {access_token}",
+                "Content-Type": "application/json",
+                **self.public_headers,
+            }
+            self._authorized = (access_token, headers)
+        return headers
+
+    @staticmethod
+    def payloadBody(payload_id):
+        """json.dumps({"id": payload_id}) without building the dict"""
+        if type(payload_id) is int:
+            return b'{"id": %d}' % payload_id
+        return json.dumps({"id": payload_id}).encode()
+
+
+class PreparedRequest:
+    """State of one request as it passes through the middleware chain"""
+
+    __slots__ = (
+        "method",
+        "url",
+        "endpoint",
+        "headers",
+        "extra_headers",
+        "access_token",
+        "payload",
+        "body",
+        "payload_generator",
+        "conditional",
+        "raw",
+        "destination",
+        "meta",
+        "response",
+        "cache_entry",
+        "start_time",
+        "retry_count",
+        "bytes_received",
+    )
+
+    def __init__(
+        self,
+        method,
+        url,
+        endpoint,
+        headers,
+        access_token=None,
+        payload=None,
+        body=None,
+        payload_generator=None,
+        conditional=False,
+        raw=False,
+        destination=None,
+        meta=None,
+    ):
+        self.method = method
+        self.url = url
+        self.endpoint = endpoint
+        self.headers = headers
+        self.extra_headers = None
+        self.access_token = access_token
+        self.payload = payload
+        self.body = body
+        self.payload_generator = payload_generator
+        self.conditional = conditional
+        self.raw = raw
+        self.destination = destination
+        self.meta = meta
+        self.response = None
+        self.cache_entry = None
+        self.start_time = time.perf_counter()
+        self.retry_count = 0
+        self.bytes_received = 0
+
+    def __repr__(self):
+        return f"<PreparedRequest: {self.method} {self.url}>"
+
+    @property
+    def authorized(self):
+        return self.access_token is not None
+
+    def addHeaders(self, headers):
+        """Per request headers kept when the authorized headers are swapped"""
+        self.extra_headers = {**(self.extra_headers or {}), **headers}
+        self.headers = {**self.headers, **headers}
+
+
+def buildChain(middlewares, handler):
+    """Compose middleware(request, call_next) callables around handler(request)
+
+    The first middleware is the outermost one.
+    """
+    for middleware in reversed(middlewares):
+        handler = partial(middleware, call_next=handler)
+    return handler
@@ -0,0 +1,174 @@
+# nepse_scraper/SchedulerUtils.py
+
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from nepse_scraper.ProfileUtils import phase
+
+INTERACTIVE = "interactive"
+NORMAL = "normal"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, NORMAL, BULK)
+
+DEFAULT_WEIGHTS = {INTERACTIVE: 16, NORMAL: 4, BULK: 1}
+
+# endpoint labels (see MetricsUtils.endpointLabel) that default to a class other
+# than NORMAL
+DEFAULT_CLASSES = {
+    "/api/authenticate/prove": INTERACTIVE,
+    "/api/nots": INTERACTIVE,
+    "/api/nots/lives-market": INTERACTIVE,
+    "/api/nots/nepse-index": INTERACTIVE,
+    "/api/nots/nepse-data/market-open": INTERACTIVE,
+    "/api/nots/nepse-data/marketdepth/{id}/": INTERACTIVE,
+    "/api/nots/nepse-data/supplydemand": INTERACTIVE,
+    "/api/nots/market-summary/": INTERACTIVE,
+    "/api/nots/nepse-data/floorsheet": BULK,
+    "/api/nots/nepse-data/today-price": BULK,
+    "/api/nots/security/floorsheet/{id}": BULK,
+    "/api/nots/market/history/security/{id}": BULK,
+}
+
+_request_priority = contextvars.ContextVar("nepse_request_priority", default=None)
+_slot_held = contextvars.ContextVar("nepse_slot_held", default=False)
+
+
+@contextmanager
+def requestPriority(priority):
+    """Run the NepseScraper calls made inside the block with `priority`
+
+    >>> with requestPriority(BULK):
+    ...     nepse.getFloorSheet()
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {PRIORITIES}, not {priority!r}")
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+class RequestScheduler:
+    """Admission control in front of the network with weighted fair queuing
+
+    At most `max_concurrency` requests are on the wire; each priority class can
+    additionally be capped through `limits`. When a slot frees up, the queued
+    request with the smallest virtual finish time is admitted, where every
+    admission of a class advances its finish time by 1 / weight. Interactive
+    calls therefore overtake queued bulk pages while bulk jobs still get the
+    capacity nobody else is asking for.
+
+    The class of a request is the one set with requestPriority, otherwise the
+    DEFAULT_CLASSES entry of its endpoint, otherwise NORMAL.
+    """
+
+    def __init__(
+        self,
+        max_concurrency=16,
+        weights=None,
+        limits=None,
+        classes=None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        # bulk never takes every slot, so live calls find one without queueing
+        self.limits = {BULK: max(1, max_concurrency * 3 // 4), **(limits or {})}
+        self.classes = {**DEFAULT_CLASSES, **(classes or {})}
+
+        self.active = dict.fromkeys(PRIORITIES, 0)
+        self.admitted = dict.fromkeys(PRIORITIES, 0)
+        self.virtual_time = 0.0
+        self.finish_time = dict.fromkeys(PRIORITIES, 0.0)
+        self.queue = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return (
+            f"<RequestScheduler: active={sum(self.active.values())}/"
+            f"{self.max_concurrency}, queued={len(self.queue)}>"
+        )
+
+    def classify(self, endpoint):
+        priority = _request_priority.get()
+        if priority is not None:
+            return priority
+        return self.classes.get(endpoint, NORMAL)
+
+    @contextmanager
+    def slot(self, endpoint):
+        """Hold one request slot for the duration of the block
+
+        Requests issued while a slot is already held (the token refresh of a 401
+        retry) pass straight through, so they can never wait on themselves.
+        NepseScraper does not schedule the token handshake at all.
+        Yields (priority, seconds spent waiting).
+        """
+        if _slot_held.get():
+            yield None, 0.0
+            return
+
+        priority = self.classify(endpoint)
+        wait_start = time.perf_counter()
+        with phase("schedule_wait"):
+            self._acquire(priority)
+        waited = time.perf_counter() - wait_start
+        token = _slot_held.set(True)
+        try:
+            yield priority, waited
+        finally:
+            _slot_held.reset(token)
+            self._release(priority)
+
+    def _acquire(self, priority):
+        with self._lock:
+            tag = max(self.virtual_time, self.finish_time[priority])
+            tag += 1 / self.weights[priority]
+            self.finish_time[priority] = tag
+            granted = threading.Event()
+            heapq.heappush(self.queue, (tag, next(self._sequence), priority, granted))
+            self._dispatch()
+        granted.wait()
+
+    def _release(self, priority):
+        with self._lock:
+            self.active[priority] -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        """Admit queued requests while there is capacity; caller holds the lock"""
+        deferred = []
+        while self.queue and sum(self.active.values()) < self.max_concurrency:
+            entry = heapq.heappop(self.queue)
+            tag, _, priority, granted = entry
+            limit = self.limits.get(priority)
+            if limit is not None and self.active[priority] >= limit:
+                deferred.append(entry)
+                continue
+            self.virtual_time = max(self.virtual_time, tag)
+            self.active[priority] += 1
+            self.admitted[priority] += 1
+            granted.set()
+        for entry in deferred:
+            heapq.heappush(self.queue, entry)
+
+    def stats(self):
+        with self._lock:
+            queued = dict.fromkeys(PRIORITIES, 0)
+            for _, _, priority, _ in self.queue:
+                queued[priority] += 1
+            return {
+                priority: {
+                    "active": self.active[priority],
+                    "queued": queued[priority],
+                    "admitted": self.admitted[priority],
+                    "limit": self.limits.get(priority),
+                    "weight": self.weights[priority],
+                }
+                for priority in PRIORITIES
+            }
@@ -0,0 +1,261 @@
+# nepse_scraper/SectorUtils.py
+
+import threading
+
+import numpy as np
+
+from nepse_scraper.RecordUtils import fieldValue, resultRecords
+
+# per security contributions summed per sector
+_COLUMNS = (
+    "turnover",
+    "quantity",
+    "trades",
+    "traded",
+    "advances",
+    "declines",
+    "unchanged",
+    "priced",
+    "return_sum",
+    "weighted_return_sum",
+    "return_turnover",
+)
+(
+    TURNOVER,
+    QUANTITY,
+    TRADES,
+    TRADED,
+    ADVANCES,
+    DECLINES,
+    UNCHANGED,
+    PRICED,
+    RETURN_SUM,
+    WEIGHTED_RETURN_SUM,
+    RETURN_TURNOVER,
+) = range(len(_COLUMNS))
+
+
+def todayPriceColumns(records):
+    """Convert today price records (list or result dict) into NumPy columns"""
+    records = resultRecords(records)
+    count = len(records)
+    return {
+        "security_id": np.fromiter((r["securityId"] for r in records), np.int64, count),
+        "close": np.fromiter(
+            (fieldValue(r, "closePrice", "lastUpdatedPrice") for r in records),
+            np.float64,
+            count,
+        ),
+        "previous_close": np.fromiter(
+            (fieldValue(r, "previousDayClosePrice") for r in records), np.float64, count
+        ),
+        "turnover": np.fromiter(
+            (fieldValue(r, "totalTradedValue") for r in records), np.float64, count
+        ),
+        "quantity": np.fromiter(
+            (fieldValue(r, "totalTradedQuantity") for r in records), np.float64, count
+        ),
+        "trades": np.fromiter(
+            (fieldValue(r, "totalTrades") for r in records), np.float64, count
+        ),
+    }
+
+
+def _contributions(columns):
+    """(securities, _COLUMNS) matrix of what each security adds to its sector"""
+    close = columns["close"]
+    previous_close = columns["previous_close"]
+    turnover = np.nan_to_num(columns["turnover"])
+    quantity = np.nan_to_num(columns["quantity"])
+    priced = ~np.isnan(close) & (previous_close > 0)
+    returns = np.zeros(len(close))
+    np.divide(close - previous_close, previous_close, out=returns, where=priced)
+    change = np.where(priced, np.sign(close - previous_close), np.nan)
+
+    contributions = np.zeros((len(close), len(_COLUMNS)))
+    contributions[:, TURNOVER] = turnover
+    contributions[:, QUANTITY] = quantity
+    contributions[:, TRADES] = np.nan_to_num(columns["trades"])
+    contributions[:, TRADED] = quantity > 0
+    contributions[:, ADVANCES] = change > 0
+    contributions[:, DECLINES] = change < 0
+    contributions[:, UNCHANGED] = change == 0
+    contributions[:, PRICED] = priced
+    contributions[:, RETURN_SUM] = returns
+    contributions[:, WEIGHTED_RETURN_SUM] = returns * turnover
+    contributions[:, RETURN_TURNOVER] = np.where(priced, turnover, 0.0)
+    return contributions
+
+
+class SectorAnalytics:
+    """Per sector turnover, breadth and returns of today price snapshots
+
+    The sector of every security id is precomputed into an index array from the
+    SecurityRegistry and rebuilt only when the registry's version changes. Each
+    snapshot is turned into per security contributions; only the securities
+    whose contribution changed since the previous snapshot, including those
+    missing from the new one, are added to the sector totals as bincount
+    group-by sums of the differences.
+
+    >>> sectors = SectorAnalytics(nepse.security_registry)
+    >>> sectors.refresh(nepse)
+    >>> sectors.sectorMetrics()
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.sectors = []
+        self.sector_index = {}
+        self.sector_of = np.full(0, -1, np.int32)
+        self.members = np.zeros(0, np.int64)
+        self.registry_version = None
+        self.contributions = np.zeros((0, len(_COLUMNS)))
+        self.totals = np.zeros((0, len(_COLUMNS)))
+        self.unknown = set()
+        self.snapshots = 0
+        self._lock = threading.Lock()
+
+        self._buildIndex()
+
+    def __repr__(self):
+        return (
+            f"<SectorAnalytics: {len(self.sectors)} sectors, "
+            f"{self.snapshots} snapshots>"
+        )
+
+    ############################################### INDEX ###############################################
+    def _buildIndex(self):
+        """security id -> sector code array; totals are regrouped from scratch"""
+        registry = self.registry
+        # read first, a concurrent update then only causes one more rebuild
+        version = registry.version
+        sector_by_security_id = registry.getSecuritySectors()
+        self.sectors = sorted(set(sector_by_security_id.values()))
+        self.sector_index = {sector: code for code, sector in enumerate(self.sectors)}
+        size = max(max(sector_by_security_id, default=-1) + 1, len(self.contributions))
+        self.sector_of = np.full(size, -1, np.int32)
+        for security_id, sector in sector_by_security_id.items():
+            self.sector_of[security_id] = self.sector_index[sector]
+        self.members = np.bincount(
+            self.sector_of[self.sector_of >= 0], minlength=len(self.sectors)
+        )
+        self._growSecurities(size)
+        self.totals = self._group(self.sector_of, self.contributions)
+        self.registry_version = version
+
+    def _growSecurities(self, size):
+        if size > len(self.contributions):
+            grown = np.zeros((size, len(_COLUMNS)))
+            grown[: len(self.contributions)] = self.contributions
+            self.contributions = grown
+        if size > len(self.sector_of):
+            sector_of = np.full(size, -1, np.int32)
+            sector_of[: len(self.sector_of)] = self.sector_of
+            self.sector_of = sector_of
+
+    def _group(self, codes, values):
+        """(sectors, _COLUMNS) sums of `values` rows grouped by sector code"""
+        known = codes >= 0
+        codes, values = codes[known], values[known]
+        return np.stack(
+            [
+                np.bincount(
+                    codes, weights=values[:, column], minlength=len(self.sectors)
+                )
+                for column in range(len(_COLUMNS))
+            ],
+            axis=1,
+        )
+
+    ############################################### INGESTION ###############################################
+    def update(self, records):
+        """Apply a today price snapshot (list or result dict); returns changed rows"""
+        return self.updateColumns(todayPriceColumns(records))
+
+    def updateColumns(self, columns):
+        """Apply a snapshot given as columns (see todayPriceColumns)"""
+        security_ids = columns["security_id"]
+        contributions = _contributions(columns)
+        # a security repeated across pages counts once, with its last row
+        _, last = np.unique(security_ids[::-1], return_index=True)
+        if len(last) < len(security_ids):
+            keep = np.sort(len(security_ids) - 1 - last)
+            security_ids, contributions = security_ids[keep], contributions[keep]
+        with self._lock:
+            if self.registry.version != self.registry_version:
+                self._buildIndex()
+            if len(security_ids):
+                self._growSecurities(int(security_ids.max()) + 1)
+
+            # securities left out of this snapshot contribute nothing anymore
+            snapshot = np.zeros_like(self.contributions)
+            snapshot[security_ids] = contributions
+            delta = snapshot - self.contributions
+            changed = np.flatnonzero((delta != 0).any(axis=1))
+            codes = self.sector_of[changed]
+            self.unknown.update(changed[codes < 0].tolist())
+            self.contributions[changed] = snapshot[changed]
+            self.totals += self._group(codes, delta[changed])
+            self.snapshots += 1
+        return len(changed)
+
+    def refresh(self, nepse, business_date=None):
+        """Fetch today's prices and apply them; returns securities changed
+
+        The scraper's registry is refreshed first when it is stale, its new
+        version then rebuilds the sector index on this update.
+        """
+        nepse.getSecurityIDKeyMap()
+        return self.update(nepse.getPriceVolumeHistory(business_date))
+
+    def rebuild(self):
+        """Regroup the totals from the per security state, e.g. after many updates"""
+        with self._lock:
+            self._buildIndex()
+
+    ############################################### METRICS ###############################################
+    def metrics(self):
+        """Per sector metric arrays aligned with self.sectors"""
+        with self._lock:
+            totals = self.totals.copy()
+            members = self.members.copy()
+        turnover = totals[:, TURNOVER]
+        priced = totals[:, PRICED]
+        return_turnover = totals[:, RETURN_TURNOVER]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_return = np.where(priced > 0, totals[:, RETURN_SUM] / priced, np.nan)
+            weighted_return = np.where(
+                return_turnover > 0,
+                totals[:, WEIGHTED_RETURN_SUM] / return_turnover,
+                np.nan,
+            )
+            breadth = np.where(
+                priced > 0,
+                (totals[:, ADVANCES] - totals[:, DECLINES]) / priced,
+                np.nan,
+            )
+        return {
+            "sector": np.array(self.sectors, dtype=object),
+            "securities": members,
+            "traded": totals[:, TRADED].round().astype(np.int64),
+            "turnover": turnover,
+            "quantity": totals[:, QUANTITY],
+            "trades": totals[:, TRADES].round().astype(np.int64),
+            "advances": totals[:, ADVANCES].round().astype(np.int64),
+            "declines": totals[:, DECLINES].round().astype(np.int64),
+            "unchanged": totals[:, UNCHANGED].round().astype(np.int64),
+            "breadth": breadth,
+            "mean_return": mean_return,
+            "weighted_return": weighted_return,
+            "turnover_share": turnover / turnover.sum() if turnover.sum() else turnover,
+        }
+
+    def sectorMetrics(self):
+        """{sector: {metric: value}}, sectors ordered by turnover"""
+        metrics = self.metrics()
+        order = np.argsort(-metrics["turnover"], kind="stable")
+        names = [name for name in metrics if name != "sector"]
+        return {
+            metrics["sector"][row]: {name: metrics[name][row].item() for name in names}
+            for row in order
+        }
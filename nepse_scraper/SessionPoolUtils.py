@@ -0,0 +1,262 @@
+# nepse_scraper/SessionPoolUtils.py
+
+import itertools
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+
+from nepse_scraper.Errors import (
+    NepseInvalidServerResponse,
+    NepseNetworkError,
+    NepseTokenExpired,
+)
+from nepse_scraper.MetricsUtils import Instrumentation
+from nepse_scraper.PaginationUtils import PageCursor
+
+# failures that say something about the session rather than the request
+_SESSION_ERRORS = (
+    NepseNetworkError,
+    NepseInvalidServerResponse,
+    NepseTokenExpired,
+    httpx.TransportError,
+)
+
+
+class _Session:
+    __slots__ = (
+        "index",
+        "scraper",
+        "in_flight",
+        "requests",
+        "failures",
+        "consecutive_failures",
+        "quarantined_until",
+    )
+
+    def __init__(self, index, scraper):
+        self.index = index
+        self.scraper = scraper
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.quarantined_until = 0.0
+
+    def isHealthy(self, now):
+        return self.quarantined_until <= now
+
+    def toDict(self, now):
+        return {
+            "index": self.index,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "healthy": self.isHealthy(now),
+            "quarantined_for_s": round(max(self.quarantined_until - now, 0), 2),
+        }
+
+
+class NepseSessionPool:
+    """N independent NepseScraper sessions behind least-loaded routing
+
+    Every session owns its own client, token lifecycle and dummy id state, while
+    the SecurityRegistry, page sizes and metrics are shared. Each call is routed
+    to the healthy session with the fewest requests in flight; a session that
+    fails `max_failures` times in a row is taken out of rotation for
+    `quarantine_seconds`, and a failed call is retried once on another session.
+
+    Public NepseScraper methods can be called on the pool directly, e.g.
+    pool.getCompanyDetails("NABIL"). A `scraper_factory` is called like
+    NepseScraper, with the tls_verify and local_address of the session.
+    """
+
+    def __init__(
+        self,
+        size=4,
+        tls_verify=True,
+        local_addresses=None,
+        max_failures=3,
+        quarantine_seconds=30,
+        scraper_factory=None,
+    ):
+        if scraper_factory is None:
+            from nepse_scraper.NepseLib import NepseScraper
+
+            scraper_factory = NepseScraper
+        self.max_failures = max_failures
+        self.quarantine_seconds = quarantine_seconds
+        self.instrumentation = Instrumentation()
+        self._lock = threading.Lock()
+
+        self.sessions = []
+        for index in range(size):
+            local_address = (
+                local_addresses[index % len(local_addresses)]
+                if local_addresses
+                else None
+            )
+            # configured up front, the setters would each build another client
+            scraper = scraper_factory(
+                tls_verify=tls_verify, local_address=local_address
+            )
+            if self.sessions:
+                first = self.sessions[0].scraper
+                scraper.setSecurityRegistry(first.security_registry)
+                scraper.setPaginationController(first.pagination)
+                scraper.setResponseCache(first.response_cache)
+            scraper.instrumentation = self.instrumentation
+            self.sessions.append(_Session(index, scraper))
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __repr__(self):
+        healthy = sum(s.isHealthy(time.time()) for s in self.sessions)
+        return f"<NepseSessionPool: {healthy}/{len(self)} healthy sessions>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getattr__(self, name):
+        if name.startswith("_") or not self.sessions:
+            raise AttributeError(name)
+        if not callable(getattr(self.sessions[0].scraper, name, None)):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def close(self):
+        for session in self.sessions:
+            session.scraper.client.close()
+            if session.scraper.hedge_client is not None:
+                session.scraper.hedge_client.close()
+
+    def getMetrics(self):
+        return self.instrumentation.registry.snapshot()
+
+    def stats(self):
+        now = time.time()
+        return [session.toDict(now) for session in self.sessions]
+
+    ############################################### ROUTING ###############################################
+    def _acquire(self, exclude=None):
+        now = time.time()
+        with self._lock:
+            candidates = [s for s in self.sessions if s is not exclude] or self.sessions
+            healthy = [s for s in candidates if s.isHealthy(now)]
+            if healthy:
+                session = min(healthy, key=lambda s: (s.in_flight, s.requests))
+            else:
+                # everything is quarantined, use the one that recovers first
+                session = min(candidates, key=lambda s: s.quarantined_until)
+            session.in_flight += 1
+            session.requests += 1
+            return session
+
+    def _release(self, session, failed):
+        with self._lock:
+            session.in_flight -= 1
+            if not failed:
+                session.consecutive_failures = 0
+                return
+            session.failures += 1
+            session.consecutive_failures += 1
+            if session.consecutive_failures >= self.max_failures:
+                session.quarantined_until = time.time() + self.quarantine_seconds
+                session.consecutive_failures = 0
+
+    def run(self, function):
+        """Call function(scraper) on the least loaded healthy session"""
+        session = None
+        for attempt in range(2 if len(self.sessions) > 1 else 1):
+            session = self._acquire(exclude=session)
+            try:
+                result = function(session.scraper)
+            except _SESSION_ERRORS:
+                self._release(session, failed=True)
+                if attempt or len(self.sessions) == 1:
+                    raise
+                continue
+            except BaseException:
+                self._release(session, failed=False)
+                raise
+            self._release(session, failed=False)
+            return result
+
+    def call(self, method_name, *args, **kwargs):
+        return self.run(lambda scraper: getattr(scraper, method_name)(*args, **kwargs))
+
+    ############################################### FLOORSHEET ###############################################
+    def iterFloorSheetPages(
+        self, symbol=None, business_date=None, workers=None, cursor=None, page_retries=0
+    ):
+        """Like NepseScraper.iterFloorSheetPages, with every page routed separately
+
+        Pages are spread over the sessions, `workers` (default 2 per session) at a
+        time, and yielded in completion order. Progress is kept on `cursor`; a
+        page that fails on two sessions is recorded as missing.
+        """
+        workers = workers or 2 * len(self.sessions)
+        cursor = cursor if cursor is not None else PageCursor()
+
+        def fetch(page_num):
+            first = cursor.total_pages is None
+            try:
+                page = self.run(
+                    lambda scraper: next(
+                        scraper.iterFloorSheetPages(
+                            symbol,
+                            business_date,
+                            pages=None if first else [page_num],
+                            page_size=cursor.page_size,
+                            page_retries=page_retries,
+                        )
+                    )
+                )
+            except _SESSION_ERRORS:
+                if first:
+                    raise
+                return page_num, None
+            return page_num, page
+
+        def settle(page_num, page):
+            if page is None:
+                cursor.markMissing(page_num)
+                return None
+            if cursor.total_pages is None:
+                cursor.total_pages = page["total_pages"]
+                cursor.page_size = page["page_size"]
+            cursor.markCompleted(page_num, page["records"])
+            return page
+
+        if cursor.total_pages is None:
+            yield settle(*fetch(0))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            page_iter = iter(cursor.pendingPages())
+            in_flight = {
+                executor.submit(fetch, page_num)
+                for page_num in itertools.islice(page_iter, workers * 2)
+            }
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for page_num in itertools.islice(page_iter, 1):
+                        in_flight.add(executor.submit(fetch, page_num))
+                    page = settle(*future.result())
+                    if page is not None:
+                        yield page
+
+    def getFloorSheet(self, workers=None, cursor=None, page_retries=2):
+        """getFloorSheet with the pages fetched concurrently over all sessions"""
+        cursor = cursor if cursor is not None else PageCursor()
+        return self.sessions[0].scraper._collectFloorSheet(
+            self.iterFloorSheetPages(
+                workers=workers, cursor=cursor, page_retries=page_retries
+            ),
+            cursor=cursor,
+        )
@@ -0,0 +1,169 @@
+# nepse_scraper/ShardUtils.py
+
+import multiprocessing
+import os
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date, timedelta
+
+from nepse_scraper.Errors import ScrapingError
+
+# one scraper per worker process, created by _initWorker
+_worker_scraper = None
+
+
+def _initWorker(tls_verify, address_queue):
+    global _worker_scraper
+    from nepse_scraper.NepseLib import NepseScraper
+
+    local_address = address_queue.get() if address_queue is not None else None
+    # configured up front, the setters would each build yet another client
+    _worker_scraper = NepseScraper(tls_verify=tls_verify, local_address=local_address)
+
+
+def _runTask(method_name, args, kwargs):
+    """Executed inside the worker; errors are returned rather than raised so that
+    the meta attached to a ScrapingError survives the trip back to the parent and
+    one failing item does not end the whole map"""
+    try:
+        return True, getattr(_worker_scraper, method_name)(*args, **kwargs)
+    except Exception as exc:
+        return False, _errorResult(exc)
+
+
+def _errorResult(exc):
+    return {
+        "error": f"{type(exc).__name__}: {exc}",
+        "meta": exc.meta if isinstance(exc, ScrapingError) else None,
+    }
+
+
+def shard(items, shard_index, shard_count):
+    """Deterministically select the items that belong to one of `shard_count` hosts
+
+    The crc32 of the item's string form is used so that every host computes the
+    same assignment without any coordination.
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard_index {shard_index} outside [0, {shard_count})")
+    return [
+        item
+        for item in items
+        if zlib.crc32(f"{item}".encode()) % shard_count == shard_index
+    ]
+
+
+def dateRanges(start_date, end_date, step_days=90):
+    """Split [start_date, end_date] into consecutive inclusive (start, end) windows"""
+    start_date = date.fromisoformat(f"{start_date}")
+    end_date = date.fromisoformat(f"{end_date}")
+    while start_date <= end_date:
+        window_end = min(start_date + timedelta(days=step_days - 1), end_date)
+        yield start_date, window_end
+        start_date = window_end + timedelta(days=1)
+
+
+class ShardedScraper:
+    """Fan NepseScraper calls out over a pool of processes
+
+    Every worker process owns its own NepseScraper, and therefore its own
+    client, token and dummy id state. Results are streamed back in completion
+    order. When `local_addresses` is given, each worker binds its connections to
+    one of them so that traffic is spread over several egress IPs. For multi host
+    deployments every host runs a ShardedScraper with the same `shard_count` and
+    a distinct `shard_index`.
+    """
+
+    def __init__(
+        self,
+        workers=None,
+        tls_verify=True,
+        local_addresses=None,
+        shard_index=0,
+        shard_count=1,
+        max_in_flight=None,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.tls_verify = tls_verify
+        self.local_addresses = list(local_addresses) if local_addresses else None
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.max_in_flight = max_in_flight or self.workers * 4
+        self.executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def start(self):
+        if self.executor is not None:
+            return
+        address_queue = None
+        if self.local_addresses:
+            address_queue = multiprocessing.Queue()
+            for worker_index in range(self.workers):
+                address_queue.put(
+                    self.local_addresses[worker_index % len(self.local_addresses)]
+                )
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_initWorker,
+            initargs=(self.tls_verify, address_queue),
+        )
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def map(self, method_name, items, **kwargs):
+        """Yield (item, ok, result) for `method_name(*item, **kwargs)` as workers finish
+
+        Items that are not tuples are passed as the single positional argument.
+        A call that fails yields ok False and an {"error", "meta"} result
+        instead of ending the iteration. Only the items belonging to this host's
+        shard are executed. At most
+        `max_in_flight` calls are queued at once so that huge item lists do not
+        pile up in the executor.
+        """
+        self.start()
+        pending = {}
+        item_iter = iter(shard(items, self.shard_index, self.shard_count))
+
+        def submit_next():
+            for item in item_iter:
+                args = item if isinstance(item, tuple) else (item,)
+                future = self.executor.submit(_runTask, method_name, args, kwargs)
+                pending[future] = item
+                return True
+            return False
+
+        while len(pending) < self.max_in_flight and submit_next():
+            pass
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    ok, result = future.result()
+                except Exception as exc:
+                    ok, result = False, _errorResult(exc)
+                submit_next()
+                yield item, ok, result
+
+    def mapSymbols(self, method_name, symbols, **kwargs):
+        """Convenience wrapper for per-symbol calls such as getFloorSheetOf"""
+        return self.map(method_name, [symbol.upper() for symbol in symbols], **kwargs)
+
+    def mapDateRanges(self, method_name, symbols, start_date, end_date, step_days=90):
+        """Shard history calls such as getCompanyPriceVolumeHistory over symbol x window"""
+        items = [
+            (symbol.upper(), window_start, window_end)
+            for symbol in symbols
+            for window_start, window_end in dateRanges(start_date, end_date, step_days)
+        ]
+        return self.map(method_name, items)
@@ -0,0 +1,417 @@
+# nepse_scraper/SnapshotUtils.py
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from nepse_scraper.RecordUtils import fieldValue, resultRecords
+
+LIVE_MARKET_FIELDS = (
+    "lastTradedPrice",
+    "lastTradedVolume",
+    "totalTradeQuantity",
+    "totalTradeValue",
+    "openPrice",
+    "highPrice",
+    "lowPrice",
+    "previousClose",
+    "percentageChange",
+    "averageTradedPrice",
+)
+INDEX_FIELDS = (
+    "currentValue",
+    "close",
+    "high",
+    "low",
+    "previousClose",
+    "change",
+    "perChange",
+)
+
+
+def _time(value):
+    if value is None:
+        return np.datetime64(datetime.now(), "ms")
+    return np.datetime64(value, "ms")
+
+
+def _lastPerCell(cells, values):
+    """Keep only the last value written to each cell"""
+    _, last = np.unique(cells[::-1], return_index=True)
+    keep = len(cells) - 1 - last
+    return cells[keep], values[keep]
+
+
+class SnapshotHistory:
+    """Bounded history of repeated snapshots of keyed numeric records
+
+    Every `record` is one poll: the numeric `fields` of each record (keyed by
+    `key`, e.g. the symbol of a live market row) are compared with the previous
+    poll and only the cells that changed are appended to a change log. A full
+    keyframe of the state is kept every `keyframe_interval` polls, so any poll
+    is rebuilt from its keyframe plus the changes after it.
+
+    Poll times live in a ring of `capacity` entries. When it is full, the
+    oldest keyframe interval is dropped, after being written to
+    `<spill_directory>/snapshots.<first poll>.npz` when a spill directory is
+    given; `readSegment` opens such a file as a SnapshotHistory again.
+    """
+
+    def __init__(
+        self,
+        fields,
+        key="symbol",
+        capacity=4096,
+        keyframe_interval=64,
+        spill_directory=None,
+    ):
+        self.fields = tuple(fields)
+        self.key = key
+        self.capacity = capacity
+        self.keyframe_interval = min(keyframe_interval, capacity)
+        self.spill_directory = spill_directory
+        self.keys = []
+        self.key_index = {}
+        self.state = np.full((0, len(self.fields)), np.nan)
+        self.first_poll = 0
+        self.next_poll = 0
+        self.keyframes = {}
+        self._times = np.zeros(capacity, "datetime64[ms]")
+        self._change_poll = np.zeros(1024, np.int64)
+        self._change_cell = np.zeros(1024, np.int64)
+        self._change_value = np.zeros(1024, np.float64)
+        self._changes = 0
+        self._lock = threading.Lock()
+
+        if spill_directory:
+            os.makedirs(spill_directory, exist_ok=True)
+
+    def __len__(self):
+        return self.next_poll - self.first_poll
+
+    def __repr__(self):
+        return (
+            f"<SnapshotHistory: {len(self)} polls x {len(self.keys)} keys, "
+            f"{self._changes} changes>"
+        )
+
+    @property
+    def times(self):
+        """Times of the retained polls, oldest first"""
+        return self._times[np.arange(self.first_poll, self.next_poll) % self.capacity]
+
+    def stats(self):
+        """Retained polls, stored changes and their share of the dense cell count"""
+        cells = len(self) * len(self.keys) * len(self.fields)
+        return {
+            "polls": len(self),
+            "keys": len(self.keys),
+            "changes": self._changes,
+            "keyframes": len(self.keyframes),
+            "change_ratio": round(self._changes / cells, 4) if cells else 0.0,
+            "bytes": self.memoryUsage(),
+        }
+
+    def memoryUsage(self):
+        return (
+            self._times.nbytes
+            + self._change_poll.nbytes
+            + self._change_cell.nbytes
+            + self._change_value.nbytes
+            + sum(keyframe.nbytes for keyframe in self.keyframes.values())
+            + self.state.nbytes
+        )
+
+    ############################################### RECORDING ###############################################
+    def _rows(self, keys):
+        rows = np.empty(len(keys), np.int64)
+        for position, key in enumerate(keys):
+            row = self.key_index.get(key)
+            if row is None:
+                row = self.key_index[key] = len(self.keys)
+                self.keys.append(key)
+            rows[position] = row
+        if len(self.keys) > len(self.state):
+            grown = np.full((len(self.keys), len(self.fields)), np.nan)
+            grown[: len(self.state)] = self.state
+            self.state = grown
+        return rows
+
+    def _appendChanges(self, poll, cells, values):
+        count = self._changes + len(cells)
+        if count > len(self._change_poll):
+            size = max(count, 2 * len(self._change_poll))
+            for name in ("_change_poll", "_change_cell", "_change_value"):
+                column = getattr(self, name)
+                grown = np.zeros(size, column.dtype)
+                grown[: self._changes] = column[: self._changes]
+                setattr(self, name, grown)
+        self._change_poll[self._changes : count] = poll
+        self._change_cell[self._changes : count] = cells
+        self._change_value[self._changes : count] = values
+        self._changes = count
+
+    def record(self, result, timestamp=None):
+        """Add one poll (result dict or list of records); returns the changed cells
+
+        Keys missing from a poll keep their previous values.
+        """
+        records = [r for r in resultRecords(result) if r.get(self.key) is not None]
+        values = np.array(
+            [[fieldValue(r, field) for field in self.fields] for r in records],
+            np.float64,
+        ).reshape(len(records), len(self.fields))
+
+        with self._lock:
+            if len(self) == self.capacity:
+                self._evict()
+            poll = self.next_poll
+            rows = self._rows([r[self.key] for r in records])
+            previous = self.state[rows]
+            changed = (values != previous) & ~(np.isnan(values) & np.isnan(previous))
+            row_index, field_index = np.nonzero(changed)
+            cells = rows[row_index] * len(self.fields) + field_index
+            self._appendChanges(poll, cells, values[row_index, field_index])
+            self.state[rows] = values
+
+            self._times[poll % self.capacity] = _time(timestamp)
+            last_keyframe = max(self.keyframes, default=None)
+            if last_keyframe is None or poll - last_keyframe >= self.keyframe_interval:
+                self.keyframes[poll] = self.state.copy()
+            self.next_poll = poll + 1
+        return len(cells)
+
+    def _evict(self):
+        """Drop the polls before the second keyframe, spilling them first"""
+        keyframes = sorted(self.keyframes)
+        stop = keyframes[1] if len(keyframes) > 1 else self.next_poll
+        if self.spill_directory:
+            self._spill(self.first_poll, stop)
+        del self.keyframes[self.first_poll]
+        cut = int(np.searchsorted(self._change_poll[: self._changes], stop))
+        remaining = self._changes - cut
+        for column in (self._change_poll, self._change_cell, self._change_value):
+            column[:remaining] = column[cut : self._changes]
+        self._changes = remaining
+        self.first_poll = stop
+
+    def _spill(self, start, stop):
+        lo, hi = np.searchsorted(self._change_poll[: self._changes], [start + 1, stop])
+        path = os.path.join(self.spill_directory, f"snapshots.{start:012d}.npz")
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as segment_file:
+            np.savez(
+                segment_file,
+                fields=np.array(self.fields),
+                key=np.array(self.key),
+                keys=np.array([f"{k}" for k in self.keys]),
+                first_poll=np.int64(start),
+                times=self._times[np.arange(start, stop) % self.capacity],
+                keyframe=self.keyframes[start],
+                change_poll=self._change_poll[lo:hi],
+                change_cell=self._change_cell[lo:hi],
+                change_value=self._change_value[lo:hi],
+            )
+        os.replace(temporary_path, path)
+
+    def flush(self):
+        """Spill and drop every retained poll; the current state is kept"""
+        if not self.spill_directory:
+            raise ValueError("flush needs a spill_directory")
+        with self._lock:
+            while len(self):
+                self._evict()
+            self.keyframes = {}
+
+    def spilledSegments(self):
+        if not self.spill_directory:
+            return []
+        return sorted(
+            os.path.join(self.spill_directory, name)
+            for name in os.listdir(self.spill_directory)
+            if name.startswith("snapshots.") and name.endswith(".npz")
+        )
+
+    @staticmethod
+    def readSegment(path):
+        """A spilled segment as a read-only SnapshotHistory"""
+        with np.load(path) as segment:
+            times = segment["times"]
+            history = SnapshotHistory(
+                segment["fields"].tolist(),
+                key=segment["key"].item(),
+                capacity=len(times),
+                keyframe_interval=len(times),
+            )
+            history.keys = segment["keys"].tolist()
+            history.key_index = {key: row for row, key in enumerate(history.keys)}
+            history.first_poll = int(segment["first_poll"])
+            history.next_poll = history.first_poll + len(times)
+            history._times[
+                np.arange(history.first_poll, history.next_poll) % len(times)
+            ] = times
+            history.keyframes = {history.first_poll: segment["keyframe"]}
+            history._change_poll = segment["change_poll"]
+            history._change_cell = segment["change_cell"]
+            history._change_value = segment["change_value"]
+            history._changes = len(history._change_poll)
+        history.state = history._stateAt(history.next_poll - 1)
+        return history
+
+    ############################################### QUERIES ###############################################
+    def _stateAt(self, poll):
+        """(keys, fields) state right after `poll`"""
+        keyframe_poll = max(p for p in self.keyframes if p <= poll)
+        keyframe = self.keyframes[keyframe_poll]
+        state = np.full((len(self.keys), len(self.fields)), np.nan)
+        state[: len(keyframe)] = keyframe
+        lo, hi = np.searchsorted(
+            self._change_poll[: self._changes], [keyframe_poll + 1, poll + 1]
+        )
+        cells, values = _lastPerCell(
+            self._change_cell[lo:hi], self._change_value[lo:hi]
+        )
+        state.reshape(-1)[cells] = values
+        return state
+
+    def _pollRange(self, start=None, end=None, last=None):
+        """[first, stop) polls between two times, or within `last` of the newest"""
+        times = self.times
+        if last is not None and len(times):
+            if not isinstance(last, timedelta):
+                last = timedelta(seconds=last)
+            start = times[-1] - np.timedelta64(last)
+        first = 0 if start is None else np.searchsorted(times, _time(start))
+        stop = (
+            len(times)
+            if end is None
+            else np.searchsorted(times, _time(end), side="right")
+        )
+        return self.first_poll + first, self.first_poll + stop
+
+    def frame(self, field, start=None, end=None, last=None, keys=None):
+        """(times, keys, values) of one field; values is a (polls, keys) matrix
+
+        `last` selects the polls within that timedelta (or seconds) of the newest
+        poll, e.g. frame("lastTradedPrice", last=timedelta(minutes=30)).
+        """
+        field_index = self.fields.index(field)
+        with self._lock:
+            first, stop = self._pollRange(start, end, last)
+            times = self._times[np.arange(first, stop) % self.capacity]
+            keys = (
+                list(self.keys)
+                if keys is None
+                else [k for k in keys if k in self.key_index]
+            )
+            columns = np.array([self.key_index[k] for k in keys], np.int64)
+            if first >= stop:
+                return times, keys, np.full((0, len(keys)), np.nan)
+
+            values = np.full((stop - first, len(keys)), np.nan)
+            values[0] = self._stateAt(first)[columns, field_index]
+            lo, hi = np.searchsorted(
+                self._change_poll[: self._changes], [first + 1, stop]
+            )
+            # copies, the change log is appended to (and compacted) once the lock
+            # is released
+            polls = self._change_poll[lo:hi].copy()
+            cells = self._change_cell[lo:hi].copy()
+            change_values = self._change_value[lo:hi].copy()
+            key_count = len(self.keys)
+
+        rows, fields = np.divmod(cells, len(self.fields))
+        position = np.full(key_count, -1, np.int64)
+        position[columns] = np.arange(len(columns))
+        column = position[rows]
+        mask = (fields == field_index) & (column >= 0)
+        poll_index = polls[mask] - first
+        values[poll_index, column[mask]] = change_values[mask]
+
+        # forward fill every column from the poll that last changed it
+        changed = np.zeros(values.shape, bool)
+        changed[0] = True
+        changed[poll_index, column[mask]] = True
+        source = np.where(changed, np.arange(len(values))[:, None], 0)
+        np.maximum.accumulate(source, axis=0, out=source)
+        return times, keys, values[source, np.arange(len(keys))]
+
+    def series(self, key, field, start=None, end=None, last=None):
+        """(times, values) of one field of one key, e.g. the LTP of a symbol"""
+        times, keys, values = self.frame(field, start, end, last, keys=[key])
+        if not keys:
+            return times, np.full(len(times), np.nan)
+        return times, values[:, 0]
+
+    def at(self, timestamp, keys=None):
+        """{key: {field: value}} as of the last poll at or before `timestamp`"""
+        with self._lock:
+            _, stop = self._pollRange(end=timestamp)
+            if stop <= self.first_poll:
+                return {}
+            state = self._stateAt(stop - 1)
+            rows = {
+                key: self.key_index[key]
+                for key in (self.keys if keys is None else keys)
+                if key in self.key_index
+            }
+        return {
+            key: dict(zip(self.fields, state[row].tolist()))
+            for key, row in rows.items()
+            if not np.isnan(state[row]).all()
+        }
+
+
+class MarketSnapshots:
+    """Snapshot histories of the live market and the NEPSE and sector indices
+
+    `refresh(nepse)` polls getLiveMarket, getNepseIndex and getNepseSubIndices
+    once and records them under one timestamp; the histories are kept in
+    `live_market` (keyed by symbol) and `indices` (keyed by index name).
+    """
+
+    def __init__(self, capacity=4096, keyframe_interval=64, spill_directory=None):
+        def history(fields, key, name):
+            return SnapshotHistory(
+                fields,
+                key=key,
+                capacity=capacity,
+                keyframe_interval=keyframe_interval,
+                spill_directory=(
+                    os.path.join(spill_directory, name) if spill_directory else None
+                ),
+            )
+
+        self.live_market = history(LIVE_MARKET_FIELDS, "symbol", "live_market")
+        self.indices = history(INDEX_FIELDS, "index", "indices")
+
+    def __repr__(self):
+        return f"<MarketSnapshots: {self.live_market}, {self.indices}>"
+
+    def refresh(self, nepse, timestamp=None):
+        """Poll and record once; returns the changed cells of each history"""
+        timestamp = _time(timestamp)
+        live_market = resultRecords(nepse.getLiveMarket())
+        indices = resultRecords(nepse.getNepseIndex()) + resultRecords(
+            nepse.getNepseSubIndices()
+        )
+        return {
+            "live_market": self.live_market.record(live_market, timestamp),
+            "indices": self.indices.record(indices, timestamp),
+        }
+
+    def ltp(self, symbol, start=None, end=None, last=None):
+        """(times, last traded prices) of a symbol"""
+        return self.live_market.series(
+            symbol.upper(), "lastTradedPrice", start, end, last
+        )
+
+    def indexAt(self, timestamp, index="NEPSE Index"):
+        """Index values as of `timestamp`"""
+        return self.indices.at(timestamp, keys=[index]).get(index)
+
+    def flush(self):
+        self.live_market.flush()
+        self.indices.flush()
@@ -0,0 +1,304 @@
+# nepse_scraper/StoreUtils.py
+
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS floorsheet (
+    contract_id INTEGER PRIMARY KEY,
+    business_date TEXT,
+    symbol TEXT,
+    security_id INTEGER,
+    buyer_member_id TEXT,
+    seller_member_id TEXT,
+    quantity REAL,
+    rate REAL,
+    amount REAL,
+    trade_time TEXT,
+    raw TEXT
+);
+CREATE INDEX IF NOT EXISTS floorsheet_symbol_date
+    ON floorsheet (symbol, business_date);
+CREATE INDEX IF NOT EXISTS floorsheet_date
+    ON floorsheet (business_date);
+
+CREATE TABLE IF NOT EXISTS price_history (
+    symbol TEXT NOT NULL,
+    business_date TEXT NOT NULL,
+    security_id INTEGER,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume REAL,
+    turnover REAL,
+    trades INTEGER,
+    raw TEXT,
+    PRIMARY KEY (symbol, business_date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS price_history_date
+    ON price_history (business_date);
+
+CREATE TABLE IF NOT EXISTS index_history (
+    index_id INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    value REAL,
+    PRIMARY KEY (index_id, timestamp)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_FLOORSHEET = """
+INSERT INTO floorsheet (
+    contract_id, business_date, symbol, security_id, buyer_member_id,
+    seller_member_id, quantity, rate, amount, trade_time, raw
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (contract_id) DO UPDATE SET
+    business_date = excluded.business_date,
+    symbol = excluded.symbol,
+    security_id = excluded.security_id,
+    buyer_member_id = excluded.buyer_member_id,
+    seller_member_id = excluded.seller_member_id,
+    quantity = excluded.quantity,
+    rate = excluded.rate,
+    amount = excluded.amount,
+    trade_time = excluded.trade_time,
+    raw = excluded.raw
+"""
+
+_UPSERT_PRICE_HISTORY = """
+INSERT INTO price_history (
+    symbol, business_date, security_id, open, high, low, close,
+    volume, turnover, trades, raw
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (symbol, business_date) DO UPDATE SET
+    security_id = COALESCE(excluded.security_id, price_history.security_id),
+    open = COALESCE(excluded.open, price_history.open),
+    high = COALESCE(excluded.high, price_history.high),
+    low = COALESCE(excluded.low, price_history.low),
+    close = COALESCE(excluded.close, price_history.close),
+    volume = COALESCE(excluded.volume, price_history.volume),
+    turnover = COALESCE(excluded.turnover, price_history.turnover),
+    trades = COALESCE(excluded.trades, price_history.trades),
+    raw = json_patch(price_history.raw, excluded.raw)
+"""
+
+_UPSERT_INDEX_HISTORY = """
+INSERT INTO index_history (index_id, timestamp, value) VALUES (?, ?, ?)
+ON CONFLICT (index_id, timestamp) DO UPDATE SET value = excluded.value
+"""
+
+
+def _rawPrice(record):
+    """raw JSON of a price record for the price_history upsert
+
+    Unset fields are left out, so merging it into the stored raw with json_patch
+    keeps the old value of a field exactly like COALESCE does for its column.
+    """
+    return json.dumps(
+        {key: value for key, value in record.items() if value is not None}
+    )
+
+
+def _unwrap(result):
+    """Accept either a {"data", "meta"} result or the bare data portion"""
+    if isinstance(result, dict) and "meta" in result and "data" in result:
+        return result["data"]
+    return result
+
+
+def _page_content(data):
+    """Extract record list from bare lists or paged {"content": [...]} bodies"""
+    if data is None:
+        return []
+    if isinstance(data, list):
+        return data
+    if "floorsheets" in data:
+        return data["floorsheets"].get("content", [])
+    return data.get("content", [])
+
+
+class NepseStore:
+    """SQLite backed local store for floorsheet, price and index history"""
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f"<NepseStore: {self.path}>"
+
+    ############################################### INGESTION ###############################################
+    def ingestFloorSheet(self, result):
+        """Upsert records of getFloorSheet/getFloorSheetOf, keyed by contractId"""
+        rows = [
+            (
+                record["contractId"],
+                record.get("businessDate"),
+                record.get("stockSymbol"),
+                record.get("stockId"),
+                record.get("buyerMemberId"),
+                record.get("sellerMemberId"),
+                record.get("contractQuantity"),
+                record.get("contractRate"),
+                record.get("contractAmount"),
+                record.get("tradeTime"),
+                json.dumps(record),
+            )
+            for record in _page_content(_unwrap(result))
+        ]
+        with self.connection:
+            self.connection.executemany(_UPSERT_FLOORSHEET, rows)
+        return len(rows)
+
+    def ingestPriceVolumeHistory(self, result):
+        """Upsert the today-price rows of getPriceVolumeHistory, keyed by (symbol, date)"""
+        rows = [
+            (
+                record["symbol"],
+                record["businessDate"],
+                record.get("securityId"),
+                record.get("openPrice"),
+                record.get("highPrice"),
+                record.get("lowPrice"),
+                record.get("closePrice"),
+                record.get("totalTradedQuantity"),
+                record.get("totalTradedValue"),
+                record.get("totalTrades"),
+                _rawPrice(record),
+            )
+            for record in _page_content(_unwrap(result))
+        ]
+        with self.connection:
+            self.connection.executemany(_UPSERT_PRICE_HISTORY, rows)
+        return len(rows)
+
+    def ingestCompanyPriceVolumeHistory(self, symbol, result, security_id=None):
+        """Upsert the rows of getCompanyPriceVolumeHistory for a single symbol"""
+        symbol = symbol.upper()
+        rows = [
+            (
+                symbol,
+                record["businessDate"],
+                security_id,
+                record.get("openPrice"),
+                record.get("highPrice"),
+                record.get("lowPrice"),
+                record.get("closePrice"),
+                record.get("totalTradedQuantity"),
+                record.get("totalTradedValue"),
+                record.get("totalTrades"),
+                _rawPrice(record),
+            )
+            for record in _page_content(_unwrap(result))
+        ]
+        with self.connection:
+            self.connection.executemany(_UPSERT_PRICE_HISTORY, rows)
+        return len(rows)
+
+    def ingestIndexGraph(self, result, index_id=None):
+        """Upsert the points of a getDaily*IndexGraph call, keyed by (index, timestamp)
+
+        The index id defaults to the trailing path segment of the request url,
+        e.g. 58 for /api/nots/graph/index/58.
+        """
+        if index_id is None:
+            url = result["meta"]["request"]["url"]
+            index_id = int(url.rstrip("/").rsplit("/", 1)[-1])
+
+        rows = []
+        for point in _page_content(_unwrap(result)):
+            if isinstance(point, dict):
+                timestamp, value = point["time"], point["value"]
+            else:
+                timestamp, value = point[0], point[1]
+            rows.append((index_id, int(timestamp), value))
+
+        with self.connection:
+            self.connection.executemany(_UPSERT_INDEX_HISTORY, rows)
+        return len(rows)
+
+    ############################################### QUERIES ###############################################
+    def getFloorSheet(self, symbol=None, business_date=None):
+        clauses, params = [], []
+        if symbol:
+            clauses.append("symbol = ?")
+            params.append(symbol.upper())
+        if business_date:
+            clauses.append("business_date = ?")
+            params.append(f"{business_date}")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self.connection.execute(
+            f"SELECT raw FROM floorsheet {where} ORDER BY contract_id DESC", params
+        )
+        return [json.loads(row["raw"]) for row in cursor]
+
+    def getPriceHistory(self, symbol, start_date=None, end_date=None):
+        clauses, params = ["symbol = ?"], [symbol.upper()]
+        if start_date:
+            clauses.append("business_date >= ?")
+            params.append(f"{start_date}")
+        if end_date:
+            clauses.append("business_date <= ?")
+            params.append(f"{end_date}")
+        cursor = self.connection.execute(
+            "SELECT symbol, business_date, security_id, open, high, low, close, "
+            "volume, turnover, trades FROM price_history "
+            f"WHERE {' AND '.join(clauses)} ORDER BY business_date",
+            params,
+        )
+        return [dict(row) for row in cursor]
+
+    def getPricesOn(self, business_date):
+        cursor = self.connection.execute(
+            "SELECT symbol, business_date, security_id, open, high, low, close, "
+            "volume, turnover, trades FROM price_history "
+            "WHERE business_date = ? ORDER BY symbol",
+            (f"{business_date}",),
+        )
+        return [dict(row) for row in cursor]
+
+    def getIndexHistory(self, index_id, start=None, end=None):
+        """Return (timestamp, value) points; start/end accept epoch seconds or datetimes"""
+        clauses, params = ["index_id = ?"], [index_id]
+        for op, bound in ((">=", start), ("<=", end)):
+            if bound is not None:
+                if isinstance(bound, datetime):
+                    bound = int(
+                        bound.replace(tzinfo=bound.tzinfo or timezone.utc).timestamp()
+                    )
+                clauses.append(f"timestamp {op} ?")
+                params.append(bound)
+        cursor = self.connection.execute(
+            "SELECT timestamp, value FROM index_history "
+            f"WHERE {' AND '.join(clauses)} ORDER BY timestamp",
+            params,
+        )
+        return [(row["timestamp"], row["value"]) for row in cursor]
+
+    def getStoredDates(self, symbol=None):
+        """Business dates for which floorsheet records are stored"""
+        if symbol:
+            cursor = self.connection.execute(
+                "SELECT DISTINCT business_date FROM floorsheet WHERE symbol = ? "
+                "ORDER BY business_date",
+                (symbol.upper(),),
+            )
+        else:
+            cursor = self.connection.execute(
+                "SELECT DISTINCT business_date FROM floorsheet ORDER BY business_date"
+            )
+        return [row["business_date"] for row in cursor]
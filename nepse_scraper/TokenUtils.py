@@ -1,10 +1,18 @@
 # nepse_scraper/TokenUtils.py
+import fcntl
+import json
+import os
 import pathlib
+import threading
 import time
+from contextlib import contextmanager
 from datetime import datetime
 
 import pywasm
 
+from nepse_scraper.Errors import NepseTokenExpired
+from nepse_scraper.ProfileUtils import phase
+
 
 class _TokenManager:
     def __init__(self, nepse):
@@ -22,6 +30,30 @@ class _TokenManager:
         self.token_time_stamp = None
         self.salts = None
 
+        self.token_store = None
+        # reentrant so that a refresh triggered from inside the token request
+        # itself reaches the guard in update() instead of deadlocking
+        self._update_lock = threading.RLock()
+        self._updating = threading.local()
+
+    def setTokenStore(self, token_store):
+        """Share token and salts with other processes through a FileTokenStore"""
+        self.token_store = token_store
+
+    def getState(self):
+        return {
+            "access_token": self.access_token,
+            "refresh_token": self.refresh_token,
+            "token_time_stamp": self.token_time_stamp,
+            "salts": self.salts,
+        }
+
+    def setState(self, state):
+        self.access_token = state["access_token"]
+        self.refresh_token = state["refresh_token"]
+        self.token_time_stamp = state["token_time_stamp"]
+        self.salts = state["salts"]
+
     def isTokenValid(self):
         return (
             (int(time.time()) - self.token_time_stamp) < self.MAX_UPDATE_PERIOD
@@ -71,7 +103,49 @@ class TokenManager(_TokenManager):
         )
 
     def update(self):
-        self._setToken()
+        stale_token = self.access_token
+        with phase("token_refresh"), self._update_lock:
+            if getattr(self._updating, "active", False):
+                raise NepseTokenExpired(
+                    "Token request was rejected while refreshing the token"
+                )
+            self._updating.active = True
+            try:
+                self._update(stale_token)
+            finally:
+                self._updating.active = False
+
+    def _update(self, stale_token):
+        # another thread refreshed the token while this one was waiting
+        if self.access_token != stale_token and self.isTokenValid():
+            return
+
+        start_time = time.perf_counter()
+        if self.token_store is None:
+            self._setToken()
+            source = "network"
+        else:
+            with self.token_store.lock():
+                state = self.token_store.read()
+                # a stored token is reused unless it is the one being replaced
+                if (
+                    state is not None
+                    and state["access_token"] != stale_token
+                    and (int(time.time()) - state["token_time_stamp"])
+                    < self.MAX_UPDATE_PERIOD
+                ):
+                    self.setState(state)
+                    source = "store"
+                else:
+                    self._setToken()
+                    self.token_store.write(self.getState())
+                    source = "network"
+
+        self.nepse.instrumentation.emit(
+            "token_refresh",
+            duration_ms=round((time.perf_counter() - start_time) * 1000, 2),
+            source=source,
+        )
 
     def _setToken(self):
         json_response = self._getTokenHttpRequest()
@@ -96,13 +170,61 @@ class TokenManager(_TokenManager):
             val = int(token_response[f"salt{salt_index}"])
             salts.append(val)
 
+        start_time = time.perf_counter()
+        with phase("token_parse"):
+            parsed_tokens = self.token_parser.parse_token_response(token_response)
+        self.nepse.instrumentation.emit(
+            "wasm_parse",
+            duration_ms=round((time.perf_counter() - start_time) * 1000, 2),
+        )
+
         return (
-            *self.token_parser.parse_token_response(token_response),
+            *parsed_tokens,
             int(token_response["serverTime"] / 1000),
             salts,
         )
 
 
+class FileTokenStore:
+    """Token and salts shared through a JSON file
+
+    Every process on a host pointing at the same path reuses a still valid token
+    instead of repeating the /api/authenticate/prove handshake and the WASM
+    parsing. An exclusive flock on a sidecar lock file serialises refreshes, so
+    only one process fetches a new token when the shared one expires.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+
+    def __repr__(self):
+        return f"<FileTokenStore: {self.path}>"
+
+    @contextmanager
+    def lock(self):
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(self):
+        try:
+            with open(self.path, "r") as token_file:
+                return json.load(token_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def write(self, state):
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as token_file:
+            json.dump(state, token_file)
+        os.chmod(temporary_path, 0o600)
+        os.replace(temporary_path, self.path)
+
+
 class TokenParser:
     def __init__(self):
         self.runtime = pywasm.core.Runtime()
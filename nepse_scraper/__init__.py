@@ -1,4 +1,17 @@
+from nepse_scraper.CacheUtils import ResponseCache
+from nepse_scraper.CassetteUtils import Cassette
+from nepse_scraper.CrawlerUtils import NewsReportCrawler
+from nepse_scraper.HedgeUtils import HedgePolicy
+from nepse_scraper.MetricsUtils import Instrumentation, MetricsRegistry
 from nepse_scraper.NepseLib import NepseScraper
+from nepse_scraper.OrderBookUtils import OrderBook, OrderBookTracker
+from nepse_scraper.PaginationUtils import PageCursor, PageSizeController
+from nepse_scraper.RegistryUtils import SecurityRegistry
+from nepse_scraper.SchedulerUtils import RequestScheduler
+from nepse_scraper.SessionPoolUtils import NepseSessionPool
+from nepse_scraper.ShardUtils import ShardedScraper
+from nepse_scraper.StoreUtils import NepseStore
+from nepse_scraper.TokenUtils import FileTokenStore
 
 
 # function added to reduce namespace pollution (importing datetime)
@@ -9,7 +22,23 @@ def timestamp(year, month, date):
 
 
 __all__ = [
+    "Cassette",
+    "FileTokenStore",
+    "HedgePolicy",
+    "Instrumentation",
+    "MetricsRegistry",
     "NepseScraper",
+    "NepseSessionPool",
+    "NepseStore",
+    "NewsReportCrawler",
+    "OrderBook",
+    "OrderBookTracker",
+    "PageCursor",
+    "PageSizeController",
+    "RequestScheduler",
+    "ResponseCache",
+    "SecurityRegistry",
+    "ShardedScraper",
 ]
 
 __version__ = "0.0.1"
@@ -0,0 +1,3 @@
+from nepse_scraper.NepseCli import main
+
+main()
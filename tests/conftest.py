@@ -0,0 +1,56 @@
+# tests/conftest.py
+
+import pytest
+
+from benchmarks.MockNepseServer import MockNepseServer
+from nepse_scraper import NepseScraper
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("mock server", "MockNepseServer of the benchmarks")
+    group.addoption("--mock-latency-ms", type=float, default=0)
+    group.addoption("--mock-jitter-ms", type=float, default=0)
+    group.addoption("--mock-error-rate", type=float, default=0.0)
+
+
+@pytest.fixture
+def server():
+    with MockNepseServer(
+        securities=40, floorsheet_records=1200, max_page_size=500
+    ) as srv:
+        yield srv
+
+
+@pytest.fixture
+def nepse(server):
+    scraper = server.attach(NepseScraper())
+    yield scraper
+    scraper.client.close()
+
+
+@pytest.fixture
+def fail_route(server):
+    """Answer the requests matching a predicate with a status instead of routing them
+
+    fail_route(lambda path, query: ...) returns the list of failed requests;
+    calling it with None routes everything normally again.
+    """
+    route = server.route
+    failed = []
+
+    def install(predicate, status=502):
+        if predicate is None:
+            server.route = route
+            return failed
+
+        def failing(method, path, query, authorization):
+            if predicate(path, query):
+                failed.append((path, query))
+                return status, {"message": "Injected failure"}
+            return route(method, path, query, authorization)
+
+        server.route = failing
+        return failed
+
+    yield install
+    server.route = route
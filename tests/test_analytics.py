@@ -0,0 +1,90 @@
+# tests/test_analytics.py
+
+import math
+from collections import defaultdict
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nepse_scraper.AnalyticsUtils import FloorSheetAnalytics
+
+
+@pytest.fixture
+def analytics(server, nepse):
+    analytics = FloorSheetAnalytics(capacity=64)
+    pages = list(nepse.iterFloorSheetPages())
+    # pages arriving out of order and twice
+    for page in reversed(pages):
+        analytics.update(page)
+    assert analytics.update(pages[0]) == 0
+    return analytics
+
+
+def test_totals_and_vwap_match_the_records(server, analytics):
+    quantity, amount, trades = defaultdict(float), defaultdict(float), defaultdict(int)
+    for record in server.data.floorsheet:
+        symbol = record["stockSymbol"]
+        quantity[symbol] += record["contractQuantity"]
+        amount[symbol] += record["contractQuantity"] * record["contractRate"]
+        trades[symbol] += 1
+
+    assert len(analytics) == len(server.data.floorsheet)
+    totals = analytics.symbolTotals()
+    assert set(totals) == set(trades)
+    for symbol, values in totals.items():
+        assert values["trades"] == trades[symbol]
+        assert math.isclose(values["amount"], amount[symbol])
+        assert math.isclose(
+            analytics.vwap(symbol.lower()), amount[symbol] / quantity[symbol]
+        )
+    assert analytics.vwap("NOSUCH") is None
+
+
+def test_broker_flows_of_one_symbol(server, analytics):
+    symbol = server.data.floorsheet[0]["stockSymbol"]
+    bought, sold = defaultdict(float), defaultdict(float)
+    for record in server.data.floorsheet:
+        if record["stockSymbol"] == symbol:
+            bought[int(record["buyerMemberId"])] += record["contractQuantity"]
+            sold[int(record["sellerMemberId"])] += record["contractQuantity"]
+
+    flows = analytics.brokerFlows(symbol)
+    assert set(flows) == set(bought) | set(sold)
+    for broker, flow in flows.items():
+        assert flow["buy_quantity"] == bought[broker]
+        assert flow["net_quantity"] == bought[broker] - sold[broker]
+    market = analytics.brokerFlows()
+    assert sum(flow["net_quantity"] for flow in market.values()) == 0
+
+
+def test_ohlc_bars_follow_trade_time(server, analytics):
+    symbol = server.data.floorsheet[0]["stockSymbol"]
+    trades = sorted(
+        (
+            datetime.fromisoformat(record["tradeTime"]),
+            record["contractId"],
+            record["contractRate"],
+            record["contractQuantity"],
+        )
+        for record in server.data.floorsheet
+        if record["stockSymbol"] == symbol
+    )
+    bars = defaultdict(list)
+    for trade_time, _, rate, quantity in trades:
+        bars[trade_time.replace(second=0, microsecond=0)].append((rate, quantity))
+
+    ohlc = analytics.ohlcBars(symbol, interval_seconds=60)
+    assert set(ohlc["symbol"].tolist()) == {symbol}
+    assert ohlc["time"].astype(datetime).tolist() == sorted(bars)
+    assert ohlc["open"].tolist() == [bar[0][0] for _, bar in sorted(bars.items())]
+    assert ohlc["close"].tolist() == [bar[-1][0] for _, bar in sorted(bars.items())]
+    assert ohlc["high"].tolist() == [
+        max(rate for rate, _ in bar) for _, bar in sorted(bars.items())
+    ]
+    assert ohlc["volume"].tolist() == [
+        sum(quantity for _, quantity in bar) for _, bar in sorted(bars.items())
+    ]
+    assert ohlc["trades"].sum() == len(trades)
+    assert len(analytics.ohlcBars("NOSUCH")["time"]) == 0
@@ -0,0 +1,77 @@
+# tests/test_archive.py
+
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nepse_scraper.ArchiveUtils import RECORD_DTYPE, FloorSheetArchive
+
+
+def _contractIds(records):
+    return sorted(record["contractId"] for record in records)
+
+
+def test_archive_skips_contracts_already_archived(server, nepse, tmp_path):
+    floorsheet = nepse.getFloorSheet()
+    total = len(server.data.floorsheet)
+
+    archive = FloorSheetArchive(tmp_path / "archive")
+    assert archive.append(floorsheet) == total
+    assert archive.append(floorsheet) == 0
+    assert archive.append(floorsheet["data"][:10]) == 0
+    assert len(archive) == total
+
+    reopened = FloorSheetArchive(tmp_path / "archive")
+    assert reopened.append(floorsheet) == 0
+    assert len(reopened) == total
+    assert sorted(reopened.records["contract_id"].tolist()) == _contractIds(
+        server.data.floorsheet
+    )
+
+
+def test_select_by_symbol_after_page_by_page_appends(server, nepse, tmp_path):
+    archive = FloorSheetArchive(tmp_path / "archive")
+    for page in nepse.iterFloorSheetPages():
+        archive.append(page)
+    symbol = server.data.floorsheet[0]["stockSymbol"]
+    traded = [r for r in server.data.floorsheet if r["stockSymbol"] == symbol]
+
+    split = archive.ranges(symbols=symbol)
+    assert sorted(archive.select(symbols=symbol)["contract_id"].tolist()) == (
+        _contractIds(traded)
+    )
+    assert archive.columns(archive.select(symbols=symbol))["symbol"].tolist() == (
+        [symbol] * len(traded)
+    )
+
+    # compact leaves every (date, security) group in one slice of a new generation
+    archive.compact()
+    assert len(archive.ranges(symbols=symbol)) == 1 <= len(split)
+    assert sorted(archive.select(symbols=symbol)["contract_id"].tolist()) == (
+        _contractIds(traded)
+    )
+    assert sorted(os.listdir(tmp_path / "archive")) == [
+        "archive.json",
+        "floorsheet.1.bin",
+        "index.1.bin",
+    ]
+    reopened = FloorSheetArchive(tmp_path / "archive")
+    assert reopened.generation == 1
+    assert len(reopened.select(server.data.business_date)) == len(archive)
+
+
+def test_interrupted_append_is_truncated_on_open(server, nepse, tmp_path):
+    floorsheet = nepse.getFloorSheet()
+    archive = FloorSheetArchive(tmp_path / "archive")
+    archive.append(floorsheet["data"][:100])
+
+    # rows written without the archive.json that commits them
+    with open(archive._dataPath(), "ab") as data_file:
+        data_file.write(np.zeros(5, RECORD_DTYPE).tobytes())
+
+    reopened = FloorSheetArchive(tmp_path / "archive")
+    assert len(reopened) == 100
+    assert os.path.getsize(reopened._dataPath()) == 100 * RECORD_DTYPE.itemsize
+    assert reopened.append(floorsheet) == len(server.data.floorsheet) - 100
@@ -0,0 +1,85 @@
+# tests/test_bars.py
+
+from datetime import date, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nepse_scraper.BarUtils import DailyBarStore
+
+
+def _bar(day, close, volume=100.0):
+    return {
+        "businessDate": f"{day}",
+        "openPrice": close - 1,
+        "highPrice": close + 2,
+        "lowPrice": close - 2,
+        "closePrice": close,
+        "totalTradedQuantity": volume,
+        "totalTradedValue": close * volume,
+    }
+
+
+# Sunday 2026-01-04 to Thursday 2026-01-15, two NEPSE weeks
+DAYS = [date(2026, 1, 4) + timedelta(days=d) for d in (0, 1, 2, 3, 4, 7, 8, 9, 10, 11)]
+
+
+@pytest.fixture
+def bars():
+    bars = DailyBarStore(symbol_capacity=1, date_capacity=2)
+    # the second week first, the date axis is kept sorted
+    bars.ingestCompanyPriceVolumeHistory(
+        "aaa", [_bar(day, 100.0 + i) for i, day in enumerate(DAYS)][5:]
+    )
+    bars.ingestCompanyPriceVolumeHistory(
+        "aaa", [_bar(day, 100.0 + i) for i, day in enumerate(DAYS)][:5]
+    )
+    bars.ingestCompanyPriceVolumeHistory("bbb", [_bar(DAYS[-1], 50.0)])
+    return bars
+
+
+def test_dates_stay_sorted_and_missing_bars_are_nan(bars):
+    assert bars.symbols == ["AAA", "BBB"]
+    assert bars.dates.astype(date).tolist() == DAYS
+    assert bars.field("close")[0].tolist() == [100.0 + i for i in range(len(DAYS))]
+    assert np.isnan(bars.field("close")[1, :-1]).all()
+    assert bars.lastDate("bbb") == DAYS[-1]
+    assert bars.lastDate("ccc") is None
+
+
+def test_weekly_resample_starts_on_sunday(bars):
+    starts, weekly = bars.resample("W")
+    assert starts.astype(date).tolist() == [DAYS[0], DAYS[5]]
+    aaa = dict(zip(("open", "high", "low", "close", "volume"), weekly[0].T))
+    assert aaa["open"].tolist() == [99.0, 104.0]
+    assert aaa["close"].tolist() == [104.0, 109.0]
+    assert aaa["high"].tolist() == [106.0, 111.0]
+    assert aaa["low"].tolist() == [98.0, 103.0]
+    assert aaa["volume"].tolist() == [500.0, 500.0]
+    # a symbol without bars in a week gets a NaN bar, not zero volume
+    assert np.isnan(weekly[1, 0]).all()
+    assert weekly[1, 1, 3] == 50.0
+    with pytest.raises(ValueError):
+        bars.resample("D")
+
+
+def test_rolling_and_returns(bars):
+    mean = bars.rolling(3)
+    assert np.isnan(mean[0, :2]).all()
+    assert mean[0, 2:].tolist() == [101.0 + i for i in range(len(DAYS) - 2)]
+    assert np.isnan(bars.rolling(3, func="sum")[1, :-1]).all()
+    returns = bars.returns()
+    assert returns[0, 1] == pytest.approx(101.0 / 100.0 - 1)
+
+
+def test_refresh_fetches_only_new_dates(server, nepse):
+    symbol = server.data.securities[0]["symbol"]
+    bars = DailyBarStore()
+    added = bars.refresh(nepse, [symbol], lookback_days=14)
+    assert added == len(bars.dates) > 0
+    assert bars.lastDate(symbol) <= date.today()
+
+    # only the dates after the last bar are asked for, and there are none
+    assert bars.refresh(nepse, [symbol]) == 0
+    assert len(bars.dates) == added
@@ -0,0 +1,82 @@
+# tests/test_benchmarks.py
+"""Benchmarks of NepseScraper against MockNepseServer, run by pytest-benchmark
+
+python -m pytest tests/test_benchmarks.py --benchmark-only --mock-latency-ms 20
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from benchmarks.MockNepseServer import MockNepseServer
+from nepse_scraper import NepseScraper
+
+FLOORSHEET_RECORDS = 20000
+SYMBOLS = 50
+ROUNDS = 5
+
+
+@pytest.fixture(scope="module")
+def bench_server(pytestconfig):
+    with MockNepseServer(
+        latency_ms=pytestconfig.getoption("mock_latency_ms"),
+        jitter_ms=pytestconfig.getoption("mock_jitter_ms"),
+        error_rate=pytestconfig.getoption("mock_error_rate"),
+        floorsheet_records=FLOORSHEET_RECORDS,
+    ) as server:
+        yield server
+
+
+@pytest.fixture
+def scraper(bench_server):
+    scraper = bench_server.attach(NepseScraper())
+    yield scraper
+    scraper.client.close()
+
+
+def _pedantic(benchmark, func):
+    return benchmark.pedantic(func, rounds=ROUNDS, warmup_rounds=1)
+
+
+def _perSecond(benchmark, units, unit_name):
+    if benchmark.stats is not None:
+        median = benchmark.stats.stats.median
+        benchmark.extra_info[f"{unit_name}_per_s"] = round(units / median, 1)
+
+
+def test_token_refresh(benchmark, scraper):
+    _pedantic(benchmark, scraper.token_manager.update)
+    assert scraper.token_manager.isTokenValid()
+
+
+def test_full_floorsheet(benchmark, scraper):
+    result = _pedantic(benchmark, lambda: scraper.getFloorSheet(delay=0))
+    assert len(result["data"]) == FLOORSHEET_RECORDS
+    _perSecond(benchmark, len(result["data"]), "rows")
+
+
+@pytest.mark.parametrize("workers", [1, 8])
+def test_batch_symbol_fetch(benchmark, bench_server, scraper, workers):
+    symbols = [s["symbol"] for s in bench_server.data.securities[:SYMBOLS]]
+    scraper.getSecurityIDKeyMap()
+
+    def fetch():
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(scraper.getCompanyDetails, symbols))
+        return [scraper.getCompanyDetails(symbol) for symbol in symbols]
+
+    results = _pedantic(benchmark, fetch)
+    assert len(results) == len(symbols)
+    _perSecond(benchmark, len(symbols), "symbols")
+
+
+def test_json_decode(benchmark, bench_server):
+    body = json.dumps(
+        {"floorsheets": {"content": bench_server.data.floorsheet, "totalPages": 1}}
+    ).encode()
+    _pedantic(benchmark, lambda: json.loads(body))
+    _perSecond(benchmark, len(body) / 1e6, "MB")
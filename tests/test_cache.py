@@ -0,0 +1,59 @@
+# tests/test_cache.py
+
+from nepse_scraper import ResponseCache
+from nepse_scraper.CacheUtils import FRESH, MISS, NOT_MODIFIED
+
+
+def test_unchanged_response_is_revalidated_with_304(server, nepse):
+    nepse.setResponseCache(ResponseCache(max_age=0))
+    first = nepse.getCompanyList()
+    requests = server.request_count
+    second = nepse.getCompanyList()
+
+    assert first["meta"]["cache"] == MISS
+    assert second["meta"]["cache"] == NOT_MODIFIED
+    assert second["meta"]["http_status"] == 304
+    assert second["data"] == first["data"]
+    assert server.request_count == requests + 1
+
+
+def test_fresh_entry_is_served_without_a_request(server, nepse):
+    nepse.setResponseCache(ResponseCache(max_age=60))
+    nepse.getCompanyList()
+    requests = server.request_count
+
+    result = nepse.getCompanyList()
+    assert result["meta"]["cache"] == FRESH
+    assert server.request_count == requests
+
+
+def test_callers_cannot_corrupt_the_cache(server, nepse):
+    nepse.setResponseCache(ResponseCache(max_age=60))
+    first = nepse.getCompanyList()
+    first["data"][0]["symbol"] = "CHANGED"
+    first["data"].clear()
+
+    for _ in range(2):
+        result = nepse.getCompanyList()
+        assert result["data"] == server.data.companies
+        assert result["data"] is not first["data"]
+
+
+def test_304_after_eviction_serves_the_revalidated_entry(server, nepse):
+    cache = ResponseCache(max_age=0)
+    nepse.setResponseCache(cache)
+    nepse.getCompanyList()
+
+    send = nepse.client.get
+
+    def evicting(url, **kwargs):
+        response = send(url, **kwargs)
+        cache.invalidate()
+        return response
+
+    nepse.client.get = evicting
+    result = nepse.getCompanyList()
+
+    assert result["meta"]["cache"] == NOT_MODIFIED
+    assert result["data"] == server.data.companies
+    assert len(cache) == 1
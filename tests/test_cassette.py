@@ -0,0 +1,67 @@
+# tests/test_cassette.py
+
+import pytest
+
+from nepse_scraper import Cassette, NepseScraper
+from nepse_scraper.CassetteUtils import RECORD, cassetteKey
+from nepse_scraper.Errors import NepseCassetteMiss
+
+
+def _replayer(cassette_path):
+    replayer = NepseScraper()
+    replayer.setBaseURL("http://127.0.0.1:9")
+    replayer.setCassette(Cassette(cassette_path))
+    return replayer
+
+
+def test_cassette_replays_without_server(server, nepse, tmp_path):
+    cassette_path = tmp_path / "session.json.gz"
+    recorder = Cassette(cassette_path, mode=RECORD)
+    nepse.setCassette(recorder)
+    companies = nepse.getCompanyList()["data"]
+    status = nepse.getMarketStatus()["data"]
+    recorder.save()
+    server.stop()
+
+    replayer = _replayer(cassette_path)
+    replayed = replayer.getCompanyList()
+    assert replayed["meta"]["replayed"]
+    assert replayed["data"] == companies
+    assert replayer.getMarketStatus()["data"] == status
+
+
+def test_replay_serves_polls_in_order_then_repeats_the_last(server, nepse, tmp_path):
+    cassette_path = tmp_path / "session.json.gz"
+    with Cassette(cassette_path, mode=RECORD) as recorder:
+        nepse.setCassette(recorder)
+        before = nepse.getLiveMarket()["data"]
+        server.data.base_price[server.data.securities[0]["id"]] += 10
+        after = nepse.getLiveMarket()["data"]
+    assert before != after
+
+    replayer = _replayer(cassette_path)
+    replayed = [replayer.getLiveMarket()["data"] for _ in range(3)]
+    assert replayed == [before, after, after]
+
+
+def test_unrecorded_request_raises(server, nepse, tmp_path):
+    cassette_path = tmp_path / "session.json.gz"
+    with Cassette(cassette_path, mode=RECORD) as recorder:
+        nepse.setCassette(recorder)
+        nepse.getMarketStatus()
+
+    with pytest.raises(NepseCassetteMiss):
+        _replayer(cassette_path).getCompanyList()
+
+
+def test_key_ignores_host_and_payload_id():
+    assert cassetteKey(
+        "POST",
+        "https://www.nepalstock.com/api/nots/floorsheet?page=1",
+        {"id": 101},
+    ) == cassetteKey(
+        "POST", "http://127.0.0.1:8000/api/nots/floorsheet?page=1", {"id": 7}
+    )
+    assert cassetteKey("GET", "http://a/api/x?page=1") != cassetteKey(
+        "GET", "http://a/api/x?page=2"
+    )
@@ -0,0 +1,102 @@
+# tests/test_cli.py
+
+import csv
+import gzip
+import json
+
+import pytest
+
+from nepse_scraper import NepseCli, NepseScraper
+
+FLOORSHEET_PATH = "/api/nots/nepse-data/floorsheet"
+
+
+@pytest.fixture
+def scrapers(server, monkeypatch):
+    """Scrapers built by NepseCli.main, pointed at the mock server"""
+    built = []
+
+    def factory(**options):
+        scraper = server.attach(NepseScraper(**options))
+        built.append(scraper)
+        return scraper
+
+    monkeypatch.setattr(NepseCli, "NepseScraper", factory)
+    return built
+
+
+def _contractIds(server):
+    return sorted(record["contractId"] for record in server.data.floorsheet)
+
+
+def test_tls_flag_is_applied_at_construction(server, scrapers, capsys):
+    NepseCli.main(["--show-status", "--no-tls-verify"])
+
+    assert not scrapers[0]._tls_verify
+    assert json.loads(capsys.readouterr().out)["isOpen"] == "OPEN"
+
+
+def test_dump_writes_compressed_csv(server, scrapers, tmp_path):
+    output_file = tmp_path / "floorsheet.csv.gz"
+    NepseCli.main(
+        ["--get-floorsheet", "--to-csv", "--output-file", f"{output_file}"]
+        + ["--hide-progressbar"]
+    )
+
+    with gzip.open(output_file, "rt", newline="") as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    assert sorted(int(row["contractId"]) for row in rows) == _contractIds(server)
+
+
+def test_resume_fetches_only_the_missing_pages(server, scrapers, fail_route, tmp_path):
+    output_file = tmp_path / "floorsheet.jsonl"
+    argv = [
+        "--get-floorsheet",
+        "--format",
+        "jsonl",
+        "--output-file",
+        f"{output_file}",
+        "--page-retries",
+        "0",
+        "--hide-progressbar",
+    ]
+    progress_file = tmp_path / "floorsheet.jsonl.progress.json"
+
+    fail_route(
+        lambda path, query: path == FLOORSHEET_PATH and query.get("page") == ["1"]
+    )
+    with pytest.raises(SystemExit) as interrupted:
+        NepseCli.main(argv)
+    assert interrupted.value.code == 1
+    assert json.loads(progress_file.read_text())["completed_pages"]
+
+    fail_route(None)
+    NepseCli.main([*argv, "--resume"])
+
+    # pages written by the first run are not appended a second time
+    assert not progress_file.exists()
+    contract_ids = [
+        json.loads(line)["contractId"] for line in output_file.read_text().splitlines()
+    ]
+    assert sorted(contract_ids) == _contractIds(server)
+
+
+def test_resume_refuses_a_shifted_floorsheet(server, scrapers, fail_route, tmp_path):
+    output_file = tmp_path / "floorsheet.jsonl"
+    argv = ["--get-floorsheet", "--format", "jsonl", "--output-file", f"{output_file}"]
+    argv += ["--page-retries", "0", "--hide-progressbar"]
+    fail_route(
+        lambda path, query: path == FLOORSHEET_PATH and query.get("page") == ["2"]
+    )
+    with pytest.raises(SystemExit):
+        NepseCli.main(argv)
+
+    fail_route(None)
+    floorsheet = server.data.floorsheet
+    floorsheet.insert(
+        0, {**floorsheet[0], "contractId": floorsheet[0]["contractId"] + 10**6}
+    )
+    with pytest.raises(SystemExit) as refused:
+        NepseCli.main([*argv, "--resume"])
+    assert "without --resume" in f"{refused.value.code}"
+    assert (tmp_path / "floorsheet.jsonl.progress.json").exists()
@@ -0,0 +1,64 @@
+# tests/test_crawler.py
+
+import os
+
+from nepse_scraper import NewsReportCrawler
+
+
+def _symbols(server, count=3):
+    return [security["symbol"] for security in server.data.securities[:count]]
+
+
+def _reportFiles(server, symbols):
+    ids = {s["id"] for s in server.data.securities if s["symbol"] in symbols}
+    return {
+        document["filePath"]
+        for security_id in ids
+        for report in server.data.reports[security_id]
+        for document in report["applicationDocumentDetailsList"]
+    }
+
+
+def test_crawl_returns_only_new_or_changed_entries(server, nepse, tmp_path):
+    symbols = _symbols(server)
+    first = NewsReportCrawler(nepse, tmp_path, workers=4).crawl(symbols)
+    assert len(first["news"]) == len(server.data.news)
+    assert sorted(first["reports"]) == sorted(symbols)
+    assert first["errors"] == {}
+    for path in first["attachments"]:
+        assert os.path.dirname(path) == f"{tmp_path / 'attachments'}"
+    assert len(first["attachments"]) == len(server.data.news) + len(
+        _reportFiles(server, symbols)
+    )
+
+    # a new crawler picks up the saved state
+    crawler = NewsReportCrawler(nepse, tmp_path, workers=4)
+    assert crawler.crawl(symbols) == {
+        "news": [],
+        "reports": {},
+        "attachments": [],
+        "errors": {},
+    }
+
+    security_id = server.data.securities[0]["id"]
+    server.data.reports[security_id][0]["modifiedDate"] = "2099-01-01"
+    again = crawler.crawl(symbols)
+    assert again["reports"] == {symbols[0]: [server.data.reports[security_id][0]]}
+    assert again["attachments"] == []
+
+
+def test_failed_attachment_is_downloaded_by_the_next_run(server, nepse, tmp_path):
+    file_path = server.data.news[0]["applicationDocumentDetailsList"][0]["filePath"]
+    content = server.data.files.pop(file_path)
+
+    crawler = NewsReportCrawler(nepse, tmp_path, workers=4)
+    first = crawler.crawl(_symbols(server, 1))
+    assert list(first["errors"]) == [file_path]
+    assert crawler.state["pending_attachments"] == [file_path]
+
+    server.data.files[file_path] = content
+    second = NewsReportCrawler(nepse, tmp_path, workers=4).crawl(_symbols(server, 1))
+    assert second["news"] == [] and second["errors"] == {}
+    [path] = second["attachments"]
+    with open(path, "rb") as attachment:
+        assert attachment.read() == content
@@ -0,0 +1,79 @@
+# tests/test_cursor.py
+
+import pytest
+
+from nepse_scraper import PageCursor
+from nepse_scraper.Errors import NepseCursorMismatch, NepseInvalidClientRequest
+
+FLOORSHEET_PATH = "/api/nots/nepse-data/floorsheet"
+
+
+def _failPage(fail_route, page):
+    return fail_route(
+        lambda path, query: path == FLOORSHEET_PATH and query.get("page") == [f"{page}"]
+    )
+
+
+def _contractIds(pages):
+    return [record["contractId"] for page in pages for record in page["records"]]
+
+
+def _prependTrades(server, count):
+    """New trades shift every page of the contractId,desc ordered floorsheet"""
+    floorsheet = server.data.floorsheet
+    newest = max(record["contractId"] for record in floorsheet)
+    floorsheet[:0] = [
+        {**floorsheet[0], "contractId": newest + offset + 1} for offset in range(count)
+    ]
+
+
+def test_cursor_round_trips_through_disk(tmp_path):
+    cursor = PageCursor(key="floor_sheet::2026-01-01", page_size=500, total_pages=4)
+    cursor.markCompleted(0, [{"contractId": 9}, {"contractId": 7}])
+    cursor.markCompleted(1, [{"contractId": 5}])
+    cursor.markMissing(3)
+    cursor.save(tmp_path / "cursor.json")
+
+    loaded = PageCursor.load(tmp_path / "cursor.json")
+    assert loaded.toDict() == cursor.toDict()
+    assert (loaded.page, loaded.contract_id) == (1, 5)
+    assert loaded.pendingPages() == [2, 3]
+
+
+def test_cursor_resumes_missing_pages(server, nepse, fail_route, tmp_path):
+    failed = _failPage(fail_route, 1)
+    cursor = PageCursor()
+    first_run = list(nepse.iterFloorSheetPages(cursor=cursor))
+    assert failed
+    assert cursor.missing == {1}
+    assert not cursor.isComplete()
+
+    fail_route(None)
+    cursor.save(tmp_path / "cursor.json")
+    resumed = PageCursor.load(tmp_path / "cursor.json")
+    second_run = list(nepse.iterFloorSheetPages(cursor=resumed))
+
+    assert [page["page"] for page in second_run] == [1]
+    assert resumed.isComplete() and not resumed.missing
+    assert sorted(_contractIds(first_run + second_run)) == sorted(
+        record["contractId"] for record in server.data.floorsheet
+    )
+
+
+def test_shifted_floorsheet_is_not_resumed(server, nepse, fail_route):
+    _failPage(fail_route, 2)
+    cursor = PageCursor()
+    list(nepse.iterFloorSheetPages(cursor=cursor))
+    assert cursor.missing == {2}
+
+    fail_route(None)
+    _prependTrades(server, 3)
+    with pytest.raises(NepseCursorMismatch):
+        list(nepse.iterFloorSheetPages(cursor=cursor))
+    assert cursor.missing == {2}
+
+
+def test_cursor_of_another_pull_is_refused(nepse):
+    cursor = PageCursor(key="company_floorsheet:NABIL:2026-01-01")
+    with pytest.raises(NepseInvalidClientRequest):
+        next(nepse.iterFloorSheetPages(cursor=cursor))
@@ -0,0 +1,35 @@
+# tests/test_encoding.py
+
+import gzip
+import json
+
+from nepse_scraper import EncodingUtils
+from nepse_scraper.EncodingUtils import decodeBody, loadRawJSON, negotiateAcceptEncoding
+
+
+def test_undecodable_codings_are_not_advertised(monkeypatch):
+    monkeypatch.setattr(EncodingUtils, "_installed", lambda name: False)
+    assert negotiateAcceptEncoding("gzip, deflate, br, zstd") == "gzip, deflate"
+    monkeypatch.setattr(EncodingUtils, "_installed", lambda name: name == "zstandard")
+    assert negotiateAcceptEncoding("gzip;q=1.0, br, zstd") == "gzip;q=1.0, zstd"
+
+
+def test_raw_result_decodes_to_the_parsed_data(server, nepse):
+    raw = nepse.requestGETAPI(url=nepse.api_end_points["company_list_url"], raw=True)
+    assert isinstance(raw["data"], bytes)
+    assert raw["meta"]["content_encoding"] == "gzip"
+    assert loadRawJSON(raw) == server.data.companies
+    assert json.loads(gzip.decompress(raw["data"])) == server.data.companies
+    assert decodeBody(b"{}", None) == b"{}"
+
+
+def test_raw_floorsheet_pages_carry_the_encoded_bodies(server, nepse):
+    pages = sorted(nepse.iterFloorSheetPages(raw=True), key=lambda p: p["page"])
+    assert pages[0]["total_pages"] == len(pages)
+    assert all(page["records"] is None for page in pages)
+
+    records = []
+    for page in pages:
+        body = decodeBody(page["body"], page["meta"]["content_encoding"])
+        records += json.loads(body)["floorsheets"]["content"]
+    assert records == server.data.floorsheet
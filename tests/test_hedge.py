@@ -0,0 +1,143 @@
+# tests/test_hedge.py
+
+import contextvars
+import threading
+import time
+
+import pytest
+
+from nepse_scraper import HedgePolicy
+from nepse_scraper.HedgeUtils import HEDGE_WON, NOT_HEDGED, PRIMARY_WON, SATURATED
+
+MARKET_OPEN_PATH = "/api/nots/nepse-data/market-open"
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _after(seconds, response=None, error=None):
+    def send():
+        time.sleep(seconds)
+        if error is not None:
+            raise error
+        return response
+
+    return send
+
+
+@pytest.fixture
+def policy():
+    policy = HedgePolicy(initial_delay_ms=20, min_delay_ms=20, max_workers=4)
+    yield policy
+    policy.shutdown()
+
+
+def test_fast_primary_is_not_hedged(policy):
+    hedged = []
+    response = _Response(200)
+    result = policy.run("/x", _after(0, response), lambda: hedged.append(1))
+    assert result == (response, NOT_HEDGED)
+    assert not hedged
+
+
+def test_only_a_successful_response_wins(policy):
+    bad_gateway, ok = _Response(502), _Response(200)
+    response, outcome = policy.run("/x", _after(0.05, bad_gateway), _after(0.1, ok))
+    assert (response, outcome) == (ok, HEDGE_WON)
+    assert bad_gateway.closed
+
+    response, outcome = policy.run(
+        "/x", _after(0.05, error=OSError("reset")), _after(0.1, ok)
+    )
+    assert (response, outcome) == (ok, HEDGE_WON)
+
+
+def test_losing_response_is_closed(policy):
+    winner, loser = _Response(200), _Response(200)
+    response, outcome = policy.run("/x", _after(0.05, winner), _after(0.2, loser))
+    assert (response, outcome) == (winner, PRIMARY_WON)
+    policy.executor.shutdown(wait=True)
+    assert loser.closed
+
+
+def test_failure_of_both_is_returned(policy):
+    first, second = _Response(502), _Response(503)
+    response, _ = policy.run("/x", _after(0.05, first), _after(0.06, second))
+    assert response is first and second.closed
+
+
+def test_saturated_pool_sends_once_on_the_caller(policy):
+    release = threading.Event()
+    hung = []
+
+    def hang():
+        hung.append(1)
+        release.wait(5)
+        return _Response(200)
+
+    # every call leaves its hung primary on a worker
+    for _ in range(3):
+        _, outcome = policy.run("/x", hang, _after(0, _Response(200)))
+        assert outcome == HEDGE_WON
+    deadline = time.monotonic() + 5
+    while policy.in_flight != 3 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert policy.in_flight == 3
+
+    caller = threading.current_thread()
+    sent_on = []
+    response = _Response(200)
+
+    def send():
+        sent_on.append(threading.current_thread())
+        return response
+
+    assert policy.run("/x", send, hang) == (response, SATURATED)
+    assert sent_on == [caller] and len(hung) == 3
+    release.set()
+    policy.executor.shutdown(wait=True)
+    assert policy.in_flight == 0
+    assert policy.stats()["/x"][SATURATED] == 1
+
+
+def test_sends_run_in_the_callers_context(policy):
+    label = contextvars.ContextVar("label", default=None)
+    label.set("live")
+    seen = []
+
+    def send():
+        seen.append(label.get())
+        time.sleep(0.05)
+        return _Response(200)
+
+    policy.run("/x", send, send)
+    assert seen == ["live", "live"]
+
+
+def test_slow_live_call_is_hedged_on_a_second_connection(server, nepse, policy):
+    route = server.route
+    calls = []
+
+    def slow_first(method, path, query, authorization):
+        if path == MARKET_OPEN_PATH:
+            calls.append(path)
+            if len(calls) == 1:
+                time.sleep(0.5)
+        return route(method, path, query, authorization)
+
+    nepse.setRequestHedging(policy)
+    server.route = slow_first
+    start = time.perf_counter()
+    result = nepse.getMarketStatus()
+
+    assert result["meta"]["status"] == "ok"
+    assert time.perf_counter() - start < 0.4
+    assert len(calls) == 2
+    assert policy.stats()[MARKET_OPEN_PATH][HEDGE_WON] == 1
+    assert nepse.hedge_client is not None and nepse.hedge_client is not nepse.client
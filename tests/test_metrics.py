@@ -0,0 +1,72 @@
+# tests/test_metrics.py
+
+from nepse_scraper import MetricsRegistry
+from nepse_scraper.MetricsUtils import Histogram, endpointLabel
+
+
+def _counter(metrics, name, **labels):
+    return sum(
+        counter["value"]
+        for counter in metrics["counters"]
+        if counter["name"] == name
+        and all(counter["labels"].get(k) == f"{v}" for k, v in labels.items())
+    )
+
+
+def test_requests_retries_and_token_refreshes_are_counted(server, nepse):
+    events = []
+    nepse.instrumentation.addHook("retry", lambda event, fields: events.append(fields))
+    nepse.getMarketStatus()
+    with server._lock:
+        server.valid_tokens.clear()
+    nepse.getCompanyList()
+
+    metrics = nepse.getMetrics()
+    endpoint = "/api/nots/company/list"
+    assert _counter(metrics, "requests_total", endpoint=endpoint, status="ok") == 1
+    assert _counter(metrics, "retries_total", reason="NepseTokenExpired") == 1
+    assert _counter(metrics, "token_refresh_total", source="network") == 2
+    assert events == [
+        {"endpoint": endpoint, "method": "GET", "reason": "NepseTokenExpired"}
+    ]
+    latency = nepse.instrumentation.registry.getHistogram(
+        "request_latency_ms", endpoint=endpoint, method="GET"
+    )
+    assert latency.count == 1 and latency.min > 0
+
+
+def test_endpoint_label_collapses_ids():
+    assert (
+        endpointLabel("https://www.nepalstock.com/api/nots/security/131?size=500")
+        == "/api/nots/security/{id}"
+    )
+    assert endpointLabel("/api/nots/market/graphs/index/58") == (
+        "/api/nots/market/graphs/index/{id}"
+    )
+
+
+def test_histogram_quantiles_stay_inside_the_observed_range():
+    histogram = Histogram(bounds=(10, 100))
+    assert histogram.quantile(0.5) is None
+    for value in (2, 4, 6, 8, 50, 500):
+        histogram.observe(value)
+    assert histogram.counts == [4, 1, 1]
+    assert 2 <= histogram.quantile(0.5) <= 10
+    assert histogram.quantile(0.99) <= 500
+    assert histogram.toDict()["buckets"] == {10: 4, 100: 1, "+Inf": 1}
+
+
+def test_prometheus_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    registry.inc("retries_total", endpoint="/a", reason="ReadError")
+    for value in (3, 30, 3000):
+        registry.observe("request_latency_ms", value, bounds=(10, 100), endpoint="/a")
+
+    lines = registry.toPrometheus().splitlines()
+    assert 'nepse_retries_total{endpoint="/a",reason="ReadError"} 1.0' in lines
+    assert [line.rsplit(" ", 1)[1] for line in lines if "_bucket" in line] == [
+        "1",
+        "2",
+        "3",
+    ]
+    assert 'nepse_request_latency_ms_count{endpoint="/a"} 3' in lines
@@ -0,0 +1,66 @@
+# tests/test_orderbook.py
+
+from nepse_scraper import OrderBook, OrderBookTracker
+from nepse_scraper.OrderBookUtils import BUY, SELL
+
+
+def _depth(buys, sells):
+    def levels(entries):
+        return [
+            {"orderBookOrderPrice": price, "quantity": quantity, "orderCount": 1}
+            for price, quantity in entries
+        ]
+
+    return {
+        "data": {
+            "marketDepth": {
+                "buyMarketDepthList": levels(buys),
+                "sellMarketDepthList": levels(sells),
+            }
+        },
+        "meta": {},
+    }
+
+
+def test_apply_orders_the_ladder_and_reports_changes():
+    book = OrderBook("NABIL", max_levels=2)
+    changes = book.apply(_depth([(99, 10), (100, 30), (98, 5)], [(102, 20), (101, 10)]))
+    assert list(book.bid_price) == [100, 99]
+    assert list(book.ask_price) == [101, 102]
+    assert sorted(changes) == sorted(
+        [(BUY, 100, 0, 30), (BUY, 99, 0, 10), (SELL, 101, 0, 10), (SELL, 102, 0, 20)]
+    )
+    assert book.spread() == 1 and book.midPrice() == 100.5
+    assert book.imbalance() == (40 - 30) / 70
+    assert book.cumulativeDepth(SELL) == [(101, 10), (102, 30)]
+
+    changes = book.apply(_depth([(100, 25)], [(101, 10), (102, 20)]))
+    assert sorted(changes) == [(BUY, 99, 10, 0), (BUY, 100, 30, 25)]
+    assert book.sequence == 2
+
+    assert book.apply(_depth([], [])) and book.spread() is None
+
+
+def test_tracker_evicts_the_stalest_books():
+    tracker = OrderBookTracker(max_books=2)
+    for symbol in ("aaa", "bbb", "aaa", "ccc"):
+        tracker.update(symbol, _depth([(100, 10)], [(101, 10)]))
+    assert list(tracker.books) == ["AAA", "CCC"]
+    assert tracker.evictions == 1
+    assert tracker.memory == sum(b.memoryUsage() for b in tracker.books.values())
+
+    budget = OrderBookTracker(memory_budget=tracker.getBook("aaa").memoryUsage())
+    budget.update("aaa", _depth([(100, 10)], []))
+    budget.update("bbb", _depth([(100, 10)], []))
+    assert "AAA" not in budget and "BBB" in budget
+
+
+def test_refresh_from_the_scraper(server, nepse):
+    symbols = [security["symbol"] for security in server.data.securities[:3]]
+    tracker = OrderBookTracker()
+    changes = tracker.refresh(nepse, symbols)
+    assert set(changes) == set(symbols)
+    snapshot = tracker.snapshot()
+    for symbol in symbols:
+        assert changes[symbol]
+        assert snapshot[symbol]["best_bid"] < snapshot[symbol]["best_ask"]
@@ -0,0 +1,70 @@
+# tests/test_pagination.py
+
+from nepse_scraper import PageSizeController
+
+ENDPOINT = "floor_sheet"
+
+
+def test_scraper_learns_the_server_page_size(server, nepse):
+    nepse.getFloorSheet()
+    assert nepse.pagination.getPageSize(ENDPOINT) == server.max_page_size
+    assert not nepse.pagination.isProbing(ENDPOINT)
+
+    route, sizes = server.route, []
+
+    def recording(method, path, query, authorization):
+        if path == "/api/nots/nepse-data/floorsheet":
+            sizes.extend(query["size"])
+        return route(method, path, query, authorization)
+
+    server.route = recording
+    result = nepse.getFloorSheet()
+    # the next pull asks for the learned size from its first page on
+    pages = -(-len(server.data.floorsheet) // server.max_page_size)
+    assert sizes == [f"{server.max_page_size}"] * pages
+    assert len(result["data"]) == len(server.data.floorsheet)
+
+
+def test_clamped_size_becomes_the_ceiling():
+    pagination = PageSizeController(sizes=(100, 500, 1000), target_latency_ms=1000)
+    assert pagination.getPageSize(ENDPOINT) == 1000
+    pagination.observe(ENDPOINT, 1000, 500, 100)
+    assert pagination.getPageSize(ENDPOINT) == 500
+    # fast pages never step above what the server accepts
+    pagination.observe(ENDPOINT, 500, 500, 10)
+    assert pagination.getPageSize(ENDPOINT) == 500
+
+
+def test_slow_pages_and_errors_step_down_then_recover():
+    pagination = PageSizeController(
+        sizes=(100, 250, 500), target_latency_ms=1000, max_error_rate=0.1
+    )
+    pagination.observe(ENDPOINT, 500, 500, 5000)
+    assert pagination.getPageSize(ENDPOINT) == 250
+    pagination.observeError(ENDPOINT)
+    pagination.observeError(ENDPOINT)
+    assert pagination.getPageSize(ENDPOINT) == 100
+    pagination.observe(ENDPOINT, 100, 100, 10)
+    assert pagination.getPageSize(ENDPOINT) == 250
+
+
+def test_rejected_size_lowers_the_ceiling_once_a_smaller_one_succeeds():
+    pagination = PageSizeController(sizes=(100, 250, 500), target_latency_ms=1000)
+    pagination.observeError(ENDPOINT, 500, rejected=True)
+    assert pagination.getPageSize(ENDPOINT) == 250
+    pagination.observe(ENDPOINT, 250, 250, 10)
+    assert pagination.endpoints[ENDPOINT]["max_accepted"] == 250
+
+    other = PageSizeController(sizes=(100, 250, 500))
+    other.observeError(ENDPOINT, 500, rejected=True)
+    other.abandonRejection(ENDPOINT)
+    assert other.getPageSize(ENDPOINT) == 500
+
+
+def test_learned_sizes_are_reused_by_the_next_run(tmp_path):
+    path = f"{tmp_path / 'pagination.json'}"
+    PageSizeController(path=path).observe(ENDPOINT, 10000, 500, 100)
+
+    reloaded = PageSizeController(path=path)
+    assert reloaded.getPageSize(ENDPOINT) == 500
+    assert not reloaded.isProbing(ENDPOINT)
@@ -0,0 +1,51 @@
+# tests/test_profiler.py
+
+import json
+import os
+
+from nepse_scraper.ProfileUtils import PROFILE_ENV, phase, profileDirectoryFromEnv
+
+
+def test_public_calls_are_recorded_with_their_phases(server, nepse):
+    with nepse.profile() as profiler:
+        nepse.getFloorSheet()
+        nepse.getCompanyList()
+
+    [floorsheet, companies] = profiler.report()
+    assert floorsheet["operation"] == "getFloorSheet"
+    assert companies["operation"] == "getCompanyList"
+    assert {"request", "network", "decode"} <= set(floorsheet["phases"])
+    assert floorsheet["phases"]["token_refresh"]["count"] == 1
+    assert floorsheet["peak_kb"] > 0
+    assert 0 < floorsheet["phases"]["network"]["ms"] <= floorsheet["wall_ms"]
+
+    summary = profiler.summary()
+    assert summary["getFloorSheet"]["calls"] == 1
+    stacks = [line.rsplit(" ", 1)[0] for line in profiler.collapsedStacks()]
+    assert "getFloorSheet" in stacks
+    assert any(s.startswith("getFloorSheet;") and "network" in s for s in stacks)
+
+    # stop puts the class methods back, and phases outside a call cost nothing
+    assert "getFloorSheet" not in vars(nepse)
+    assert phase("network") is phase("decode")
+
+
+def test_dump_writes_the_report_and_stacks(server, nepse, tmp_path):
+    with nepse.profile(cprofile=True, directory=f"{tmp_path}") as profiler:
+        nepse.getMarketStatus()
+    assert sorted(os.listdir(tmp_path)) == [
+        "0000-getMarketStatus.prof",
+        "report.json",
+        "stacks.folded",
+    ]
+    with open(tmp_path / "report.json") as report_file:
+        assert json.load(report_file)["operations"] == profiler.report()
+
+
+def test_profile_directory_from_the_environment(monkeypatch):
+    monkeypatch.delenv(PROFILE_ENV, raising=False)
+    assert profileDirectoryFromEnv() is None
+    monkeypatch.setenv(PROFILE_ENV, "1")
+    assert profileDirectoryFromEnv() == "nepse-profile"
+    monkeypatch.setenv(PROFILE_ENV, "/tmp/profiles")
+    assert profileDirectoryFromEnv() == "/tmp/profiles"
@@ -0,0 +1,66 @@
+# tests/test_registry.py
+
+import copy
+
+from nepse_scraper import SecurityRegistry
+from nepse_scraper.RegistryUtils import PROMOTER_SHARE_SECTOR
+
+
+def _lists(server):
+    return copy.deepcopy(server.data.companies), copy.deepcopy(server.data.securities)
+
+
+def test_scraper_keymaps_come_from_the_registry(server, nepse):
+    security_ids = nepse.getSecurityIDKeyMap()["data"]
+    assert security_ids == {s["symbol"]: s["id"] for s in server.data.securities}
+    assert nepse.getCompanyIDKeyMap()["data"] == {
+        c["symbol"]: c["id"] for c in server.data.companies
+    }
+
+    requests = server.request_count
+    nepse.getSecurityIDKeyMap()
+    nepse.getSectorScrips()
+    # a fresh registry answers without fetching the lists again
+    assert server.request_count == requests
+
+    sectors = nepse.getSectorScrips()["data"]
+    assert sorted(sum(sectors.values(), [])) == sorted(security_ids)
+
+
+def test_update_applies_only_what_changed(server):
+    companies, securities = _lists(server)
+    registry = SecurityRegistry()
+    assert len(registry.update(companies, securities)["added"]) == len(securities)
+    version = registry.version
+
+    assert registry.update(companies, securities) == {
+        "added": [],
+        "removed": [],
+        "changed": [],
+    }
+    assert registry.version == version
+
+    renamed, removed = securities[0], securities.pop(1)
+    old_symbol = renamed["symbol"]
+    renamed["symbol"] = f"{old_symbol}X"
+    changes = registry.update(companies, securities)
+    assert sorted(changes["removed"]) == sorted([old_symbol, removed["symbol"]])
+    assert changes["added"] == [renamed["symbol"]]
+    assert registry.version == version + 1
+    assert registry.getSymbol(renamed["id"]) == renamed["symbol"]
+    assert registry.getSecurityID(removed["symbol"]) is None
+    # a security without a company row is filed under the promoter share sector
+    assert registry.getSector(renamed["symbol"]) == PROMOTER_SHARE_SECTOR
+
+
+def test_saved_registry_loads_fresh(server, tmp_path):
+    companies, securities = _lists(server)
+    path = f"{tmp_path / 'registry.json'}"
+    registry = SecurityRegistry(path)
+    registry.update(companies, securities)
+
+    loaded = SecurityRegistry(path)
+    assert not loaded.isStale()
+    assert loaded.version == registry.version
+    assert loaded.getSecuritySectors() == registry.getSecuritySectors()
+    assert loaded.company_id_by_symbol == registry.company_id_by_symbol
@@ -0,0 +1,63 @@
+# tests/test_requests.py
+
+from nepse_scraper.RequestUtils import RequestBuilder, buildChain
+
+BASE_URL = "https://www.nepalstock.com"
+END_POINTS = {"security": "/api/nots/security/", "company_list": "/api/nots/company"}
+
+
+def test_builder_resolves_templates_and_ad_hoc_urls():
+    builder = RequestBuilder(BASE_URL, END_POINTS, {"Accept": "application/json"})
+    assert builder.resolve("/api/nots/company") == (
+        f"{BASE_URL}/api/nots/company",
+        "/api/nots/company",
+    )
+    assert builder.resolve("/api/nots/security/131") == (
+        f"{BASE_URL}/api/nots/security/131",
+        "/api/nots/security/{id}",
+    )
+    assert builder.resolve("http://other/x")[0] == "http://other/x"
+    assert builder.payloadBody(123) == b'{"id": 123}'
+    assert builder.payloadBody("abc") == b'{"id": "abc"}'
+
+
+def test_authorized_headers_are_rebuilt_only_for_a_new_token():
+    builder = RequestBuilder(BASE_URL, END_POINTS, {"Accept": "application/json"})
+    assert "Authorization" not in builder.headers()
+    first = builder.headers("token-a")
+    assert first["Authorization"] == "Salter token-a"
+    assert builder.headers("token-a") is first
+    assert builder.headers("token-b")["Authorization"] == "Salter token-b"
+
+
+def test_chain_runs_the_first_middleware_outermost():
+    calls = []
+
+    def middleware(name):
+        def run(request, call_next):
+            calls.append(f"{name}>")
+            result = call_next(request)
+            calls.append(f"<{name}")
+            return result
+
+        return run
+
+    chain = buildChain([middleware("a"), middleware("b")], lambda r: r * 2)
+    assert chain(21) == 42
+    assert calls == ["a>", "b>", "<b", "<a"]
+
+
+def test_added_middleware_sees_every_request(server, nepse):
+    seen = []
+
+    def record(request, call_next):
+        seen.append((request.method, request.endpoint, request.authorized))
+        return call_next(request)
+
+    nepse.addMiddleware(record)
+    nepse.getCompanyList()
+    assert ("GET", "/api/authenticate/prove", False) in seen
+    assert seen[-1] == ("GET", "/api/nots/company/list", True)
+    # copies, the shared header dicts stay untouched
+    nepse.getAuthorizationHeaders()["Authorization"] = "tampered"
+    assert nepse.getCompanyList()["meta"]["status"] == "ok"
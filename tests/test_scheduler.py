@@ -0,0 +1,110 @@
+# tests/test_scheduler.py
+
+import threading
+import time
+
+from nepse_scraper import RequestScheduler
+from nepse_scraper.SchedulerUtils import BULK, INTERACTIVE, requestPriority
+
+TOKEN_PATH = "/api/authenticate/prove"
+
+
+def _hold(scheduler, endpoint, held, release, priority=None):
+    def run():
+        if priority is None:
+            with scheduler.slot(endpoint):
+                held.append(endpoint)
+                release.wait(5)
+            return
+        with requestPriority(priority), scheduler.slot(endpoint):
+            held.append(priority)
+            release.wait(5)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def _waitFor(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_interactive_requests_overtake_queued_bulk():
+    scheduler = RequestScheduler(max_concurrency=1)
+    release = [threading.Event() for _ in range(4)]
+    admitted = []
+    first = _hold(scheduler, "/x", admitted, release[0], BULK)
+    assert _waitFor(lambda: admitted == [BULK])
+
+    waiting = [_hold(scheduler, "/x", admitted, release[1], BULK)]
+    assert _waitFor(lambda: scheduler.stats()[BULK]["queued"] == 1)
+    waiting.append(_hold(scheduler, "/x", admitted, release[2], INTERACTIVE))
+    assert _waitFor(lambda: scheduler.stats()[INTERACTIVE]["queued"] == 1)
+
+    release[0].set()
+    assert _waitFor(lambda: len(admitted) == 2)
+    assert admitted[1] == INTERACTIVE
+    release[2].set()
+    release[1].set()
+    for thread in (first, *waiting):
+        thread.join(5)
+    assert scheduler.stats()[BULK]["active"] == 0
+
+
+def test_nested_slot_passes_through():
+    scheduler = RequestScheduler(max_concurrency=1)
+    with scheduler.slot("/x") as (priority, _):
+        with scheduler.slot("/y") as nested:
+            assert nested == (None, 0.0)
+    assert priority is not None
+    assert sum(entry["active"] for entry in scheduler.stats().values()) == 0
+
+
+def test_token_refresh_does_not_wait_for_a_slot(server, nepse):
+    """Slot holders refreshing after a 401 must not wait on a token request
+    that itself queues behind them for a slot"""
+    nepse.setRequestScheduler(RequestScheduler(max_concurrency=2))
+    nepse.getMarketStatus()
+
+    route = server.route
+    in_flight = []
+    release = threading.Event()
+
+    def blocking(method, path, query, authorization):
+        if path != TOKEN_PATH:
+            in_flight.append(path)
+            release.wait(5)
+        return route(method, path, query, authorization)
+
+    server.route = blocking
+    with server._lock:
+        server.valid_tokens.clear()
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(nepse.getCompanyList()), daemon=True
+        )
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    assert _waitFor(lambda: len(in_flight) == 2)
+
+    # the third caller finds the token expired and refreshes it while both
+    # slots are taken
+    nepse.token_manager.token_time_stamp = 0
+    third = threading.Thread(
+        target=lambda: results.append(nepse.getSecurityList()), daemon=True
+    )
+    third.start()
+    time.sleep(0.2)
+    release.set()
+
+    for thread in (*threads, third):
+        thread.join(10)
+    assert not any(thread.is_alive() for thread in (*threads, third))
+    assert [result["meta"]["status"] for result in results] == ["ok"] * 3
@@ -0,0 +1,91 @@
+# tests/test_sectors.py
+
+import copy
+import math
+from collections import defaultdict
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nepse_scraper.SectorUtils import SectorAnalytics
+
+
+def _sectorOf(companies):
+    return {company["symbol"]: company["sectorName"] for company in companies}
+
+
+def test_sector_totals_match_grouped_prices(server, nepse):
+    sectors = SectorAnalytics(nepse.security_registry)
+    assert sectors.refresh(nepse) == len(server.data.securities)
+
+    sector_of = _sectorOf(server.data.companies)
+    prices = server.data.todayPrices()
+    turnover, members = defaultdict(float), defaultdict(int)
+    for price in prices:
+        turnover[sector_of[price["symbol"]]] += price["totalTradedValue"]
+        members[sector_of[price["symbol"]]] += 1
+
+    metrics = sectors.sectorMetrics()
+    assert set(metrics) == set(members)
+    for sector, values in metrics.items():
+        assert values["securities"] == members[sector]
+        assert math.isclose(values["turnover"], turnover[sector])
+    assert math.isclose(
+        sum(values["turnover_share"] for values in metrics.values()), 1.0
+    )
+
+    # a security missing from a later snapshot no longer counts
+    dropped = prices[0]
+    assert sectors.update(prices[1:]) == 1
+    sector = sector_of[dropped["symbol"]]
+    assert math.isclose(
+        sectors.sectorMetrics()[sector]["turnover"],
+        turnover[sector] - dropped["totalTradedValue"],
+    )
+
+
+def test_incremental_totals_match_a_rebuild(server, nepse):
+    sectors = SectorAnalytics(nepse.security_registry)
+    sectors.refresh(nepse)
+    prices = server.data.todayPrices()
+    for step in range(3):
+        moved = copy.deepcopy(prices)
+        for price in moved[step::4]:
+            price["closePrice"] += step + 1
+            price["totalTradedValue"] *= 2
+        sectors.update(moved)
+
+    incremental = sectors.metrics()
+    sectors.rebuild()
+    rebuilt = sectors.metrics()
+    for name in ("turnover", "quantity", "advances", "declines", "breadth"):
+        np.testing.assert_allclose(incremental[name], rebuilt[name])
+
+
+def test_sector_move_regroups_on_the_next_update(server, nepse):
+    sectors = SectorAnalytics(nepse.security_registry)
+    sectors.refresh(nepse)
+    prices = server.data.todayPrices()
+    moved = prices[0]["symbol"]
+
+    companies = copy.deepcopy(server.data.companies)
+    sector_of = _sectorOf(companies)
+    source = sector_of[moved]
+    target = next(sector for sector in set(sector_of.values()) if sector != source)
+    for company in companies:
+        if company["symbol"] == moved:
+            company["sectorName"] = target
+    registry = nepse.security_registry
+    assert registry.update(companies, server.data.securities)["changed"] == [moved]
+
+    sectors.update(prices)
+    metrics = sectors.sectorMetrics()
+    assert sectors.registry_version == registry.version
+    for sector in (source, target):
+        turnover = sum(
+            price["totalTradedValue"]
+            for price in prices
+            if _sectorOf(companies)[price["symbol"]] == sector
+        )
+        assert math.isclose(metrics[sector]["turnover"], turnover)
@@ -0,0 +1,56 @@
+# tests/test_session_pool.py
+
+from nepse_scraper import NepseScraper, NepseSessionPool
+from nepse_scraper.Errors import NepseInvalidServerResponse
+
+
+def _pool(server, size=3, **kwargs):
+    return NepseSessionPool(
+        size=size,
+        scraper_factory=lambda **options: server.attach(NepseScraper(**options)),
+        **kwargs,
+    )
+
+
+def test_each_session_builds_one_client(server, monkeypatch):
+    built = []
+    new_client = NepseScraper._new_client
+
+    def counting(self, tls_verify):
+        built.append(tls_verify)
+        return new_client(self, tls_verify)
+
+    monkeypatch.setattr(NepseScraper, "_new_client", counting)
+    with _pool(server, tls_verify=False, local_addresses=["127.0.0.1"]) as pool:
+        assert built == [False] * 3
+        assert all(not s.scraper._tls_verify for s in pool.sessions)
+        assert {s.scraper._local_address for s in pool.sessions} == {"127.0.0.1"}
+
+
+def test_pages_are_spread_over_sessions(server):
+    with _pool(server) as pool:
+        result = pool.getFloorSheet(workers=3)
+        assert len(result["data"]) == len(server.data.floorsheet)
+        assert result["meta"]["pagination"]["is_final"]
+        assert sum(session["requests"] for session in pool.stats()) >= 3
+        first = pool.sessions[0].scraper
+        assert all(
+            s.scraper.security_registry is first.security_registry
+            for s in pool.sessions
+        )
+
+
+def test_failing_session_is_quarantined(server):
+    with _pool(server, size=2, max_failures=1, quarantine_seconds=60) as pool:
+        broken = pool.sessions[0]
+
+        def call(scraper):
+            if scraper is broken.scraper:
+                raise NepseInvalidServerResponse("Bad Gateway")
+            return scraper.getMarketStatus()
+
+        assert pool.run(call)["meta"]["status"] == "ok"
+        stats = pool.stats()
+        assert not stats[0]["healthy"] and stats[1]["healthy"]
+        assert pool.getMarketStatus()["meta"]["status"] == "ok"
+        assert pool.stats()[0]["requests"] == 1
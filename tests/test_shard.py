@@ -0,0 +1,45 @@
+# tests/test_shard.py
+
+from datetime import date
+
+import pytest
+
+from nepse_scraper import ShardedScraper
+from nepse_scraper.ShardUtils import dateRanges, shard
+
+SYMBOLS = [f"SYM{number}" for number in range(200)]
+
+
+def test_shards_partition_the_items():
+    shards = [shard(SYMBOLS, index, 3) for index in range(3)]
+    assert sorted(sum(shards, [])) == sorted(SYMBOLS)
+    assert all(shards)
+    # every host computes the same assignment
+    assert shard(SYMBOLS, 1, 3) == shards[1]
+    with pytest.raises(ValueError):
+        shard(SYMBOLS, 3, 3)
+
+
+def test_date_ranges_cover_the_span_without_overlap():
+    windows = list(dateRanges("2025-01-01", "2025-12-31", step_days=90))
+    assert windows[0] == (date(2025, 1, 1), date(2025, 3, 31))
+    assert windows[-1][1] == date(2025, 12, 31)
+    for (_, end), (start, _) in zip(windows, windows[1:]):
+        assert (start - end).days == 1
+    assert list(dateRanges("2025-01-02", "2025-01-01")) == []
+
+
+def test_map_returns_failures_as_results():
+    items = ["https://a.example", "https://b.example", "https://c.example"]
+    with ShardedScraper(workers=2, shard_index=0, shard_count=2) as sharded:
+        results = list(sharded.map("setBaseURL", items))
+        failures = list(sharded.map("noSuchMethod", items))
+
+    mine = shard(items, 0, 2)
+    assert sorted(item for item, _, _ in results) == sorted(mine)
+    assert all(ok for _, ok, _ in results)
+    assert sorted(item for item, _, _ in failures) == sorted(mine)
+    for _, ok, result in failures:
+        assert not ok
+        assert result["error"].startswith("AttributeError")
+        assert result["meta"] is None
@@ -0,0 +1,112 @@
+# tests/test_snapshots.py
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nepse_scraper.SnapshotUtils import MarketSnapshots, SnapshotHistory
+
+START = datetime(2026, 1, 1, 11)
+
+
+def _poll(prices):
+    return [{"symbol": symbol, "ltp": price} for symbol, price in prices.items()]
+
+
+def _history(polls, **options):
+    history = SnapshotHistory(["ltp"], **options)
+    for minute, prices in enumerate(polls):
+        history.record(_poll(prices), START + timedelta(minutes=minute))
+    return history
+
+
+class _RecordOnRelease:
+    """Lock that records one more poll right after its next release"""
+
+    def __init__(self, history, prices, timestamp):
+        self.lock = threading.Lock()
+        self.pending = lambda: history.record(_poll(prices), timestamp)
+
+    def __enter__(self):
+        self.lock.acquire()
+
+    def __exit__(self, *_):
+        self.lock.release()
+        pending, self.pending = self.pending, None
+        if pending:
+            pending()
+
+
+def test_snapshots_record_only_changed_cells(server, nepse):
+    snapshots = MarketSnapshots(keyframe_interval=2)
+    symbol = server.data.securities[0]["symbol"]
+    other = server.data.securities[1]["symbol"]
+
+    first = snapshots.refresh(nepse, START)
+    unchanged = snapshots.refresh(nepse, START + timedelta(minutes=1))
+    server.data.base_price[server.data.securities[0]["id"]] += 10
+    moved = snapshots.refresh(nepse, START + timedelta(minutes=2))
+
+    assert first["live_market"] > 0 and first["indices"] > 0
+    assert unchanged == {"live_market": 0, "indices": 0}
+    assert moved == {"live_market": 1, "indices": 0}
+
+    _, prices = snapshots.ltp(symbol)
+    assert prices[0] == prices[1] != prices[2]
+    _, other_prices = snapshots.ltp(other)
+    assert len(set(other_prices.tolist())) == 1
+
+
+def test_frame_series_and_at_rebuild_every_poll():
+    polls = [
+        {"A": 1.0, "B": 10.0},
+        {"A": 2.0, "B": 10.0},
+        {"A": 2.0, "B": 11.0, "C": 5.0},
+        {"A": 3.0},
+        {"A": 3.0, "B": 12.0},
+    ]
+    history = _history(polls, keyframe_interval=2)
+
+    times, keys, values = history.frame("ltp")
+    assert keys == ["A", "B", "C"]
+    assert len(times) == len(polls)
+    np.testing.assert_array_equal(
+        values,
+        [
+            [1, 10, np.nan],
+            [2, 10, np.nan],
+            [2, 11, 5],
+            [3, 11, 5],
+            [3, 12, 5],
+        ],
+    )
+
+    _, series = history.series("B", "ltp", start=START + timedelta(minutes=1))
+    assert series.tolist() == [10, 11, 11, 12]
+    _, missing = history.series("Z", "ltp")
+    assert np.isnan(missing).all()
+
+    assert history.at(START + timedelta(minutes=3, seconds=30)) == {
+        "A": {"ltp": 3.0},
+        "B": {"ltp": 11.0},
+        "C": {"ltp": 5.0},
+    }
+    assert history.at(START - timedelta(minutes=1)) == {}
+
+
+def test_frame_is_unaffected_by_a_poll_recorded_after_the_lock():
+    polls = [{"A": float(poll), "B": 10.0 * poll} for poll in range(4)]
+    history = _history(polls, capacity=4, keyframe_interval=2)
+    expected = history.frame("ltp")[2].copy()
+
+    # the extra poll evicts the oldest keyframe interval and compacts the change
+    # log while frame is still reading what it took under the lock
+    history._lock = _RecordOnRelease(
+        history, {"A": 9.0, "B": 90.0}, START + timedelta(minutes=len(polls))
+    )
+    _, _, values = history.frame("ltp")
+    np.testing.assert_array_equal(values, expected)
+    assert len(history) == 3
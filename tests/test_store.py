@@ -0,0 +1,101 @@
+# tests/test_store.py
+
+import json
+
+import pytest
+
+from nepse_scraper import NepseStore
+
+FULL = {
+    "symbol": "NABIL",
+    "businessDate": "2026-01-05",
+    "securityId": 131,
+    "openPrice": 500.0,
+    "highPrice": 510.0,
+    "lowPrice": 495.0,
+    "closePrice": 505.0,
+    "totalTradedQuantity": 1000.0,
+    "totalTradedValue": 505000.0,
+    "totalTrades": 42,
+}
+# a company history row of the same day, without the intraday fields
+PARTIAL = {
+    "businessDate": "2026-01-05",
+    "closePrice": 506.0,
+    "highPrice": None,
+    "totalTradedQuantity": 1100.0,
+}
+COLUMNS = {
+    "open": "openPrice",
+    "high": "highPrice",
+    "low": "lowPrice",
+    "close": "closePrice",
+    "volume": "totalTradedQuantity",
+    "turnover": "totalTradedValue",
+    "trades": "totalTrades",
+}
+
+
+@pytest.fixture
+def store():
+    with NepseStore() as store:
+        yield store
+
+
+def _storedPrice(store):
+    row = store.connection.execute(
+        "SELECT * FROM price_history WHERE symbol = 'NABIL'"
+    ).fetchone()
+    return dict(row), json.loads(row["raw"])
+
+
+def _assertRawMatchesColumns(row, raw):
+    for column, field in COLUMNS.items():
+        assert raw.get(field) == row[column], column
+
+
+@pytest.mark.parametrize("order", ["partial_then_full", "full_then_partial"])
+def test_partial_and_full_price_upserts_merge(store, order):
+    full = lambda: store.ingestPriceVolumeHistory([FULL])  # noqa: E731
+    partial = lambda: store.ingestCompanyPriceVolumeHistory(  # noqa: E731
+        "nabil", [PARTIAL], security_id=None
+    )
+    for ingest in (partial, full) if order == "partial_then_full" else (full, partial):
+        assert ingest() == 1
+
+    row, raw = _storedPrice(store)
+    _assertRawMatchesColumns(row, raw)
+    assert row["security_id"] == 131
+    assert row["open"] == 500.0 and row["high"] == 510.0
+    latest = FULL if order == "partial_then_full" else PARTIAL
+    assert row["close"] == latest["closePrice"]
+    assert row["volume"] == latest["totalTradedQuantity"]
+    assert store.getPriceHistory("nabil")[0]["close"] == latest["closePrice"]
+
+
+def test_floorsheet_upsert_is_idempotent(store, server, nepse):
+    floorsheet = nepse.getFloorSheet()
+    assert store.ingestFloorSheet(floorsheet) == len(server.data.floorsheet)
+    store.ingestFloorSheet(floorsheet)
+
+    stored = store.getFloorSheet()
+    assert len(stored) == len(server.data.floorsheet)
+    assert [record["contractId"] for record in stored] == sorted(
+        (record["contractId"] for record in server.data.floorsheet), reverse=True
+    )
+    assert store.getStoredDates() == [f"{server.data.business_date}"]
+
+
+def test_today_prices_and_index_points(store, server, nepse):
+    prices = nepse.getPriceVolumeHistory()
+    assert store.ingestPriceVolumeHistory(prices) == len(server.data.securities)
+    stored = store.getPricesOn(server.data.business_date)
+    assert [row["symbol"] for row in stored] == sorted(
+        security["symbol"] for security in server.data.securities
+    )
+
+    graph = nepse.getDailyNepseIndexGraph()
+    assert store.ingestIndexGraph(graph) == len(graph["data"])
+    points = store.getIndexHistory(58)
+    assert len(points) == len(graph["data"])
+    assert points == sorted(points)
@@ -0,0 +1,68 @@
+# tests/test_token.py
+
+import os
+import stat
+
+import pytest
+
+from nepse_scraper import FileTokenStore, NepseScraper
+from nepse_scraper.Errors import NepseTokenExpired
+
+
+def _refreshSources(scraper):
+    sources = []
+    scraper.instrumentation.addHook(
+        "token_refresh", lambda event, fields: sources.append(fields["source"])
+    )
+    return sources
+
+
+def test_expired_token_is_refreshed_and_retried(server, nepse):
+    nepse.getMarketStatus()
+    with server._lock:
+        server.valid_tokens.clear()
+
+    result = nepse.getCompanyList()
+
+    assert result["meta"]["status"] == "ok"
+    assert result["meta"]["retry_count"] == 1
+    assert len(result["data"]) == len(server.data.companies)
+
+
+def test_token_store_shares_the_token_between_scrapers(server, nepse, tmp_path):
+    token_store = FileTokenStore(f"{tmp_path / 'token.json'}")
+    nepse.setTokenStore(token_store)
+    first_sources = _refreshSources(nepse)
+    nepse.getMarketStatus()
+
+    other = server.attach(NepseScraper())
+    try:
+        other.setTokenStore(token_store)
+        other_sources = _refreshSources(other)
+        assert other.getCompanyList()["meta"]["status"] == "ok"
+        assert other.token_manager.access_token == nepse.token_manager.access_token
+    finally:
+        other.client.close()
+
+    assert first_sources == ["network"]
+    assert other_sources == ["store"]
+    assert token_store.read() == nepse.token_manager.getState()
+    assert stat.S_IMODE(os.stat(token_store.path).st_mode) == 0o600
+
+
+def test_rejected_stored_token_is_replaced(server, nepse, tmp_path):
+    token_store = FileTokenStore(f"{tmp_path / 'token.json'}")
+    nepse.setTokenStore(token_store)
+    nepse.getMarketStatus()
+    stale = token_store.read()["access_token"]
+    with server._lock:
+        server.valid_tokens.clear()
+
+    assert nepse.getCompanyList()["meta"]["status"] == "ok"
+    assert token_store.read()["access_token"] != stale
+
+
+def test_rejected_token_handshake_raises(nepse, fail_route):
+    fail_route(lambda path, query: path == "/api/authenticate/prove", status=401)
+    with pytest.raises(NepseTokenExpired):
+        nepse.getCompanyList()